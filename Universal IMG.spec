@@ -1,4 +1,7 @@
 # -*- mode: python ; coding: utf-8 -*-
+import hashlib
+import os
+
 from kivy_deps import sdl2, glew
 
 block_cipher = None
@@ -46,3 +49,10 @@ exe = EXE(
     entitlements_file=None,
     icon='pyimgedit/icon.png'
 )
+
+# the updater checks the downloaded exe against this file, commit it together with the exe
+exe_path = os.path.join(DISTPATH, 'Universal IMG.exe')
+with open(exe_path, 'rb') as f:
+    digest = hashlib.sha256(f.read()).hexdigest()
+with open(f'{exe_path}.sha256', 'w', newline='\n') as f:
+    f.write(f'{digest}  Universal IMG.exe\n')
@@ -6,11 +6,17 @@ import os.path
 import re
 import subprocess
 import sys
+import zipfile
+from contextlib import contextmanager
+from hashlib import blake2b
+from itertools import islice
 from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, Iterable
 from urllib.error import HTTPError
 from urllib.request import urlretrieve
 
-from html_table_parser.parser import HTMLTableParser
+from pyimgedit.cache import EntryCache
 
 __author__ = 'NIKDISSV'
 __licence__ = 'MIT'
@@ -22,6 +28,7 @@ except NameError:
     it_file = sys.argv[0]
 
 PACKAGE_DIR = Path(it_file).parent
+BLOCK_SIZE = 2048
 EXECUTABLE_DOWNLOAD_URLS = (
     'https://github.com/NIKDISSV-Forever/UniversalIMG/blob/main/pyimgedit/freimgedcs.exe?raw=true',
 
@@ -45,6 +52,16 @@ def get_freimgedcs_exe() -> str:
             pass
 
 
+def user_cache_dir() -> Path:
+    """Directory for the caches of UniversalIMG (thumbnails, index)"""
+    return Path(os.environ.get('LOCALAPPDATA') or Path.home() / '.cache') / 'UniversalIMG'
+
+
+def content_hash(data: bytes | bytearray | memoryview) -> str:
+    """Hash of an entry content, used to identify it in the caches, indexes and manifests"""
+    return blake2b(data, digest_size=16).hexdigest()
+
+
 def bytes2units(bytes_size: float) -> str:
     prefixes = ('', *'kMGTPEZY')
     for p in prefixes[:-1]:
@@ -63,7 +80,16 @@ class BlocksBytes:
         blocks, bytes = bb.split('/', 1)
         self.__blocks = int(blocks)
         self.__bytes = int(bytes)
-        self.__as_str = self.get_string()
+        self.__as_str = None
+
+    @classmethod
+    def from_blocks(cls, blocks: int) -> BlocksBytes:
+        """[blocks] whole blocks, without formatting and parsing the Block/Size string"""
+        self = cls.__new__(cls)
+        self.__blocks = blocks
+        self.__bytes = blocks * BLOCK_SIZE
+        self.__as_str = None
+        return self
 
     @property
     def blocks(self) -> int:
@@ -76,14 +102,16 @@ class BlocksBytes:
     @blocks.setter
     def blocks(self, value):
         self.__blocks = int(value)
-        self.__as_str = self.get_string()
+        self.__as_str = None
 
     @bytes.setter
     def bytes(self, value):
         self.__bytes = int(value)
-        self.__as_str = self.get_string()
+        self.__as_str = None
 
     def __str__(self):
+        if self.__as_str is None:  # formatted when it is shown, not for every entry of the directory
+            self.__as_str = self.get_string()
         return self.__as_str
 
     def __lt__(self, other):
@@ -102,33 +130,152 @@ class ArchiveContent:
         self.size = BlocksBytes(size)
         self.name = name
 
+    @classmethod
+    def from_blocks(cls, offset: int, size: int, name: str) -> ArchiveContent:
+        """Creates an entry from the offset and size in blocks, as they are stored in the archive directory"""
+        self = cls.__new__(cls)
+        self.offset = BlocksBytes.from_blocks(offset)
+        self.size = BlocksBytes.from_blocks(size)
+        self.name = name
+        return self
+
     def __repr__(self) -> str:
         return f'<{self.name!r} ({self.size}) {self.offset}>'
 
 
+class DirectoryChange:
+    """One change of the archive directory: an entry was added, updated (moved/resized), removed or renamed"""
+    __slots__ = ('kind', 'entry', 'old_name')
+    KINDS = ('add', 'update', 'remove', 'rename')
+
+    def __init__(self, kind: str, entry: ArchiveContent, old_name: str = None):
+        self.kind = kind
+        self.entry = entry
+        self.old_name = entry.name if old_name is None else old_name
+
+    def __repr__(self) -> str:
+        if self.kind == 'rename':
+            return f'<{self.kind} {self.old_name!r} -> {self.entry!r}>'
+        return f'<{self.kind} {self.entry!r}>'
+
+
+class OperationResult(dict):
+    """
+    Header of an operation (key: value lines for the log) with the directory changes it made,
+    changes is None if they are unknown (freimgedcs.exe), then the archive must be listed again
+    """
+    __slots__ = ('changes',)
+
+    def __init__(self, header=(), changes: list[DirectoryChange] = None):
+        super().__init__(header)
+        self.changes = changes
+
+
 class IMGArchive:
-    """API for freimgedcs.exe"""
+    """API for .img archives: native for the III / VC / SA formats, through freimgedcs.exe otherwise"""
     DATA_TEMPLATE = re.compile(r'>\s*([\w\s]+?)\s+\.+\s+(.+)')
 
     def __init__(self, imgname: str | Path,
-                 freimgedcs_path: str = get_freimgedcs_exe()):
+                 freimgedcs_path: str = get_freimgedcs_exe(),
+                 entry_cache: EntryCache = None):
         self.imgname = Path(imgname)
         self.executable = freimgedcs_path
+        self.entry_cache = EntryCache() if entry_cache is None else entry_cache
+        self._reader = None
+        self._reader_lock = Lock()
+        self._rw_index = None
+        self._snapshots = None
+        self._writes = 0
+        self._write_generation = 0
+        self._writes_lock = Lock()
 
-    def _call(self, key: str, imgname: str | Path, filename: str = '', filename2: str = ''):
-        cwd = os.getcwd()
-        parent = None
+    @property
+    def cache_identity(self) -> str:
+        """Identity of the archive in entry_cache, the same for the .img and the .dir path"""
+        img = self.imgname.with_suffix('.img') if self.imgname.suffix.lower() == '.dir' else self.imgname
+        return os.path.normcase(os.path.realpath(img))
+
+    def _changed(self, names: Iterable[str] = None):
+        """Forgets the cached directory and contents after the archive was changed"""
+        self._close_readers()
+        if names is not None:
+            names = [*names]
+        self.entry_cache.invalidate(self.cache_identity, names)
+        if self._rw_index is not None:
+            self._rw_index.invalidate(names)
+
+    def _begin_change(self, names: list[str] = None):
+        with self._writes_lock:
+            self._writes += 1
+        self._changed(names)
+
+    def _end_change(self, names: list[str] = None):
+        with self._writes_lock:
+            self._writes -= 1
+            self._write_generation += 1
+        self._changed(names)
+
+    @contextmanager
+    def _changing(self, names: Iterable[str] = None):
+        """
+        Forgets the cached directory and contents before and after the archive is changed,
+        the contents read meanwhile are not cached (they may be the old or the new ones)
+        """
+        if names is not None:
+            names = [*names]
+        self._begin_change(names)
         try:
-            os.chdir(parent := imgname.parent)
-            imgname = imgname.name
-        except OSError:
-            pass
-        command = [self.executable, f'-{key}', imgname]
+            yield
+        finally:
+            self._end_change(names)
+
+    def _close_readers(self):
+        """Closes the directories opened for reading, the next reads open the current one"""
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+        if self._rw_index is not None:
+            self._rw_index.invalidate(())
+
+    @property
+    def rw_index(self):
+        """Lazily built RenderWare metadata (chunk type, version, textures, geometries) of the TXD and DFF files"""
+        if self._rw_index is None:
+            from pyimgedit.renderware import RWIndex
+            self._rw_index = RWIndex(self)
+        return self._rw_index
+
+    def read(self, filename: str) -> bytes:
+        """Returns the content of file [filename] (padded to whole blocks), cached in entry_cache"""
+        if self._snapshots is not None:  # a snapshot per read, a kept one would keep the old blocks forever
+            with self.snapshot() as snapshot:
+                return self._read_cached(snapshot, filename)
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = self.open()
+            return self._read_cached(self._reader, filename)
+
+    def _read_cached(self, reader, filename: str) -> bytes:
+        entry = reader.find(filename)
+        key = (self.cache_identity, entry.name.casefold(), entry.offset.blocks, entry.size.blocks)
+        if (content := self.entry_cache.get(key)) is None:
+            generation = self._write_generation
+            content = reader.read(entry)
+            if not self._writes and generation == self._write_generation:
+                self.entry_cache.put(key, content)
+        return content
+
+    def _call(self, key: str, imgname: str | Path, filename: str = '', filename2: str = ''):
+        """freimgedcs.exe runs in the folder of the archive, the working directory of Python is not changed"""
+        imgname = Path(imgname).absolute()
+        parent = imgname.parent
+        command = [self.executable, f'-{key}', imgname.name]
         if filename:
             command.append(self._rel_fn(filename, parent))
         if filename2:
             command.append(self._rel_fn(filename2, parent))
-        proc = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, shell=True)
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, shell=True, cwd=parent)
         yield proc
         while True:
             for line in proc.stdout:
@@ -138,14 +285,14 @@ class IMGArchive:
                 yield line
             else:
                 break
-        os.chdir(cwd)
 
     @staticmethod
     def _rel_fn(fn: str, parent: Path) -> str:
+        path = Path(fn).absolute()
         try:
-            return str(Path(fn).relative_to(parent))
+            return str(path.relative_to(parent))
         except ValueError:
-            return fn
+            return str(path)
 
     def call(self, key: str, filename: str = '', filename2: str = ''):
         processor = self._call(key, self.imgname, filename, filename2)
@@ -175,58 +322,314 @@ class IMGArchive:
 
     def rebuild(self):
         """Rebuild archive (imgname)"""
-        return self.check_call('rbd', to_end=False)
-
-    def _list(self, *, delete_html_file: bool = False):
-        header = self.check_call('lst')
-        p = HTMLTableParser()
-        html_file = f'{self.imgname}.html'
-        if not os.path.isfile(html_file):
-            archive_info = (('File name', str(self.imgname)),)
-            if os.path.isfile(self.imgname):
-                archive_info += ('File size', f'{bytes2units(os.stat(self.imgname).st_size)}'),
-            return header, archive_info, (('Offset (in blocks / bytes)', 'Size (in blocks / bytes)', 'Name'),)
-
-        with open(html_file) as table_file:
-            p.feed(table_file.read())
-        if delete_html_file:
-            os.remove(html_file)
-        information_about_img_archive, contents = [*p.tables, [], []][:2]
-        information_about_img_archive = dict(information_about_img_archive)
-        if 'File name' not in information_about_img_archive:
-            information_about_img_archive['File name'] = str(self.imgname)
-        if 'File size' not in information_about_img_archive and os.path.isfile(self.imgname):
-            information_about_img_archive['File size'] = f'{bytes2units(os.stat(self.imgname).st_size)}'
-
-        for k, v in information_about_img_archive.copy().items():
+        if (img := self._open_native(True)) is None:
+            self._changed()
+            return self.check_call('rbd', to_end=False)
+        header = {'Operation': 'Rebuild', 'File name': str(img.img_path), 'Files': str(len(img))}
+        return None, header, self._native_rebuild(img)
+
+    def _native_rebuild(self, img):
+        self._begin_change()
+        try:
+            with img:
+                yield from img.rebuild()
+        finally:
+            self._end_change()
+
+    def _listing_info(self, info: dict[str, str]) -> dict[str, str]:
+        if 'File name' not in info:
+            info['File name'] = str(self.imgname)
+        if 'File size' not in info and os.path.isfile(self.imgname):
+            info['File size'] = f'{bytes2units(os.stat(self.imgname).st_size)}'
+        for k, v in info.copy().items():
             if v.endswith('bytes'):
                 v = v.removesuffix('bytes').strip()
                 if v.isdigit():
-                    information_about_img_archive[k] = bytes2units(int(v))
-        return header, information_about_img_archive, contents
+                    info[k] = bytes2units(int(v))
+        return info
+
+    def _iter_listing(self, *, delete_html_file: bool = False):
+        """
+        Lists the archive with freimgedcs.exe: yields the header and the information about the archive,
+        then the files (ArchiveContent) as the HTML listing is parsed, in chunks
+        """
+        from pyimgedit.listing import parse_listing, read_chunks
+        html_file = f'{self.imgname}.html'
+        header = self.check_call('lst')
+        if not os.path.isfile(html_file):
+            yield header, self._listing_info({})
+            return
+        try:
+            with open(html_file) as table_file:
+                listing = parse_listing(read_chunks(table_file))
+                yield header, self._listing_info(next(listing))
+                yield from listing
+        finally:
+            if delete_html_file:
+                os.remove(html_file)
 
     def list(self, *, delete_html_file: bool = False):
         """
         Returns the header of the opened archive, information about it, and a list of files of the class ArchiveContent
         """
-        header, info, files = self._list(delete_html_file=delete_html_file)
-        return header, info, [ArchiveContent(offset, size, name) for offset, size, name in files[1:]]
+        listing = self._iter_listing(delete_html_file=delete_html_file)
+        header, info = next(listing)
+        return header, info, [*listing]
+
+    def iter_list(self, chunk_size: int = 500):
+        """
+        Same as list, but yields the header and information first and then the files in lists of [chunk_size],
+        so the first files can be shown before the whole directory is decoded
+        """
+        from pyimgedit.imgfile import archive_paths, iter_entries
+        try:
+            img_path, dir_path, version = archive_paths(self.imgname)
+        except (OSError, ValueError):
+            listing = self._iter_listing()
+            yield next(listing)
+            while chunk := [*islice(listing, chunk_size)]:
+                yield chunk
+            return
+        size = os.path.getsize(img_path) + (0 if dir_path is None else os.path.getsize(dir_path))
+        yield ({'Operation': 'List', 'File name': str(self.imgname)},
+               {'File name': str(img_path), 'File size': bytes2units(size),
+                'Version': 'VER2 (SA)' if version == 2 else '.dir + .img (III / VC)'})
+        entries = iter_entries(self.imgname)
+        if self._snapshots is not None:
+            with self.snapshot() as snapshot:
+                entries = snapshot.entries
+        chunk = []
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @classmethod
+    def pack(cls, src_dir: str | Path, out_img: str | Path, version: int = 2, workers: int = None) -> IMGArchive:
+        """
+        Create archive [out_img] (version 1: .dir + .img, 2: VER2) from the loose files of [src_dir] and its subfolders.
+        The files are sorted by name, so the same files always give the same archive.
+        The archive has no folders: two files with the same name in different folders raise ValueError
+        """
+        from pyimgedit.imgwriter import pack
+        pack(src_dir, out_img, version, workers)
+        return cls(out_img)
+
+    def convert(self, target_version: int, out_img: str | Path = None) -> IMGArchive:
+        """
+        Convert archive (imgname) to [target_version] (1: III / VC .dir + .img, 2: SA VER2)
+        in place or into [out_img], copying the data without extracting it
+        """
+        from pyimgedit.imgwriter import convert
+        with self._changing():
+            converted = convert(self.imgname, target_version, out_img)
+            if out_img is not None:
+                return IMGArchive(converted, self.executable, self.entry_cache)
+            self.imgname = converted
+        return self
+
+    def split(self, max_entries: int = None, max_bytes: int = None, key=None,
+              out_dir: str | Path = None) -> list[IMGArchive]:
+        """
+        Split archive (imgname) into archives <name>_<n>.img of at most [max_entries] files and [max_bytes] bytes.
+        Files with the same [key] ('extension', 'prefix' or a function of ArchiveContent) stay together
+        """
+        from pyimgedit.imgwriter import split
+        return [IMGArchive(shard, self.executable, self.entry_cache)
+                for shard in split(self.imgname, max_entries, max_bytes, key, out_dir)]
+
+    def open(self, writable: bool = False):
+        """
+        Opens the archive (imgname) natively, without freimgedcs.exe.
+        After use_snapshots, the readers get a snapshot and the writer writes copy-on-write
+        """
+        if self._snapshots is not None:
+            return self._snapshots.writer() if writable else self._snapshots.snapshot()
+        from pyimgedit.imgfile import IMGFile
+        return IMGFile(self.imgname, writable)
+
+    def use_snapshots(self):
+        """
+        From now on the readers of archive (imgname) read snapshots (snapshots.SnapshotStore): extract, read, export,
+        listing and serve keep a consistent view while add, delete or rebuild run in another thread of this process.
+        The writes append the data instead of overwriting it, the old blocks are reclaimed by rebuild
+        """
+        if self._snapshots is None:
+            from pyimgedit.snapshots import SnapshotStore
+            self._snapshots = SnapshotStore(self)
+        return self._snapshots
+
+    def snapshot(self):
+        """Consistent read-only view of archive (imgname) that the writes do not change until it is closed"""
+        return self.use_snapshots().snapshot()
+
+    def plan(self, operations):
+        """
+        Plan [operations] (planner.Operation: add, delete, rename, extract, rebuild) on archive (imgname):
+        they are reordered and fused, see Plan.explain() for a dry run and Plan.execute()
+        """
+        from pyimgedit.planner import Plan
+        return Plan(self, operations)
+
+    def share(self):
+        """
+        Publish the directory of archive (imgname) in shared memory.
+        Pass .handle to the worker processes, they attach() to it without listing the archive
+        """
+        from pyimgedit.shared_directory import SharedDirectory
+        return SharedDirectory(self)
+
+    def _open_native(self, writable: bool = False):
+        """Same as open, but returns None if the archive can only be handled by freimgedcs.exe"""
+        try:
+            return self.open(writable)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _native_header(operation: str, entry: ArchiveContent, img=None, since: int = 0) -> OperationResult:
+        return OperationResult(
+            {'Operation': operation, 'File name': entry.name, 'Offset': str(entry.offset), 'Size': str(entry.size)},
+            [] if img is None else img.changes[since:]
+        )
 
     def add(self, filename: str):
         """Add/replace file [filename] to/in archive (imgname)"""
-        return self.check_call('add', filename)
+        with self._changing((Path(filename).name,)):
+            if (img := self._open_native(True)) is None:
+                return OperationResult(self.check_call('add', filename))
+            with img:
+                return self._native_header('Add', img.write_file(Path(filename).name, filename), img)
+
+    def add_many(self, filenames: Iterable[str | Path]):
+        """
+        Add/replace files [filenames] to/in archive (imgname) in one session, the directory is written once.
+        Yields a header for every added file
+        """
+        filenames = [*filenames]
+        with self._changing([Path(filename).name for filename in filenames]):
+            if (img := self._open_native(True)) is None:
+                for filename in filenames:
+                    yield OperationResult(self.check_call('add', filename))
+                return
+            with img:
+                for filename in filenames:
+                    since = len(img.changes)
+                    yield self._native_header('Add', img.write_file(Path(filename).name, filename), img, since)
+
+    def delete_many(self, filenames: Iterable[str]):
+        """
+        Delete files [filenames] from archive (imgname) in one session, the directory is written once.
+        Yields a header for every deleted file
+        """
+        filenames = [*filenames]
+        with self._changing(filenames):
+            if (img := self._open_native(True)) is None:
+                for filename in filenames:
+                    yield OperationResult(self.check_call('del', filename))
+                return
+            with img:
+                for filename in filenames:
+                    since = len(img.changes)
+                    yield self._native_header('Delete', img.delete(filename), img, since)
+
+    def update(self, add: Iterable[str | Path] = (), delete: Iterable[str] = ()):
+        """Add/replace files [add] and delete files [delete] in one batch, the directory is written once"""
+        add, delete = [*add], [*delete]
+        header = {'Operation': 'Update', 'Added': str(len(add)), 'Deleted': str(len(delete))}
+        with self._changing([*(Path(filename).name for filename in add), *delete]):
+            if (img := self._open_native(True)) is None:
+                for filename in add:
+                    self.check_call('add', filename)
+                for filename in delete:
+                    self.check_call('del', filename)
+                return OperationResult(header)
+            with img:
+                for filename in add:
+                    img.write_file(Path(filename).name, filename)
+                for filename in delete:
+                    img.delete(filename)
+                return OperationResult(header, img.changes)
+
+    def add_bytes(self, name: str, data: bytes | bytearray | memoryview):
+        """Add/replace file [name] to/in archive (imgname) with content [data], without a temporary file"""
+        with self._changing((name,)), self.open(True) as img:
+            return self._native_header('Add', img.write(name, data), img)
+
+    def add_stream(self, name: str, chunks: Iterable[bytes], size: int = None):
+        """
+        Add/replace file [name] to/in archive (imgname) with content from the iterable of byte [chunks].
+        The old content of the file is replaced only once all of [chunks] were written
+        """
+        with self._changing((name,)), self.open(True) as img:
+            return self._native_header('Add', img.write_stream(name, chunks, size), img)
 
     def extract(self, filename: str, filename2: str):
         """Extract file [filename] from archive (imgname) to file [filename2]"""
-        return self.check_call('xtr', filename, filename2)
+        if (img := self._open_native()) is None:
+            return self.check_call('xtr', filename, filename2)
+        with img:
+            entry = img.find(filename)
+            img.extract(entry, filename2)
+            return self._native_header('Extract', entry)
+
+    def extract_many(self, filenames: Iterable[str], directory: str | Path):
+        """
+        Extract files [filenames] from archive (imgname) to [directory],
+        merging the reads of adjacent files. Yields a header for every extracted file
+        """
+        if (img := self._open_native()) is None:
+            for filename in filenames:
+                yield self.extract(filename, os.path.join(directory, filename))
+            return
+        with img:
+            for entry in img.extract_many(filenames, directory):
+                yield self._native_header('Extract', entry)
+
+    def export_tar(self, fileobj: BinaryIO, compression: str = '') -> int:
+        """Write all the files of archive (imgname) to the tar stream [fileobj], without temporary files"""
+        from pyimgedit.containers import export_tar
+        with self.open() as img:
+            return export_tar(img, fileobj, compression)
+
+    def export_zip(self, fileobj: BinaryIO, compression: int = zipfile.ZIP_STORED) -> int:
+        """Write all the files of archive (imgname) to the zip stream [fileobj], without temporary files"""
+        from pyimgedit.containers import export_zip
+        with self.open() as img:
+            return export_zip(img, fileobj, compression)
+
+    def import_tar(self, fileobj: BinaryIO):
+        """Add/replace the files of the tar stream [fileobj] to/in archive (imgname), without temporary files"""
+        from pyimgedit.containers import import_tar
+        with self._changing(), self.open(True) as img:
+            added = import_tar(img, fileobj)
+            return OperationResult({'Operation': 'Import', 'Files': str(len(added))}, img.changes)
+
+    def import_zip(self, fileobj: BinaryIO):
+        """Add/replace the files of the zip file [fileobj] to/in archive (imgname), without temporary files"""
+        from pyimgedit.containers import import_zip
+        with self._changing(), self.open(True) as img:
+            added = import_zip(img, fileobj)
+            return OperationResult({'Operation': 'Import', 'Files': str(len(added))}, img.changes)
 
     def rename(self, filename: str, filename2: str):
         """Rename file [filename] in archive (imgname) to file [filename2]"""
-        return self.check_call('rnm', filename, filename2)
+        with self._changing((filename, filename2)):
+            if (img := self._open_native(True)) is None:
+                return OperationResult(self.check_call('rnm', filename, filename2))
+            with img:
+                return self._native_header('Rename', img.rename(filename, filename2), img)
 
     def delete(self, filename: str):
         """Delete file [filename] from archive (imgname)"""
-        return self.check_call('del', filename)
+        with self._changing((filename,)):
+            if (img := self._open_native(True)) is None:
+                return OperationResult(self.check_call('del', filename))
+            with img:
+                return self._native_header('Delete', img.delete(filename), img)
 
 
 class StreamHandler(logging.StreamHandler):
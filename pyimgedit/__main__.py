@@ -1,4 +1,11 @@
-from pyimgedit.gui import run
+import sys
+
+from pyimgedit.cli import COMMANDS, main
 
 if __name__ == '__main__':
-    run()
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        main(sys.argv[1:])
+    else:
+        from pyimgedit.gui import run
+
+        run()
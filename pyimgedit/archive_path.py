@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import io
+import os
+import stat
+from fnmatch import fnmatch
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, Iterator
+
+from pyimgedit import ArchiveContent, IMGArchive
+from pyimgedit.imgfile import archive_signature
+
+
+class EntryIO(io.RawIOBase):
+    """Read-only raw file over the range of the .img file occupied by one entry"""
+
+    def __init__(self, img_path: str | Path, entry: ArchiveContent):
+        super().__init__()
+        self.entry = entry
+        self.name = entry.name
+        self._file = open(img_path, 'rb', buffering=0)
+        self._start = entry.offset.bytes
+        self._size = entry.size.bytes
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f'Invalid whence {whence!r}')
+        if offset < 0:
+            raise ValueError(f'Negative seek position {offset}')
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        view = view[:max(0, min(view.nbytes, self._size - self._position))]
+        if not view:
+            return 0
+        if hasattr(os, 'preadv'):
+            got = os.preadv(self._file.fileno(), (view,), self._start + self._position)
+        else:
+            self._file.seek(self._start + self._position)
+            got = self._file.readinto(view) or 0
+        self._position += got
+        return got
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+def open_entry(img_path: str | Path, entry: ArchiveContent, buffering: int = -1) -> BinaryIO:
+    """Opens [entry] of archive [img_path] for reading in place"""
+    raw = EntryIO(img_path, entry)
+    if buffering == 0:
+        return raw
+    return io.BufferedReader(raw, io.DEFAULT_BUFFER_SIZE if buffering < 0 else buffering)
+
+
+class ArchiveListing:
+    """Directory of an archive, read again only when the archive files change"""
+    __slots__ = ('archive', '_signature', '_entries', '_img_path', '_lock')
+
+    def __init__(self, archive: str | Path | IMGArchive):
+        self.archive = archive if isinstance(archive, IMGArchive) else IMGArchive(archive)
+        self._signature = None
+        self._entries: dict[str, ArchiveContent] = {}
+        self._img_path: Path | None = None
+        self._lock = Lock()
+
+    def _refresh(self):
+        with self._lock:
+            if (signature := archive_signature(self.archive.imgname)) != self._signature:
+                with self.archive.open() as img:
+                    self._entries = {e.name.casefold(): e for e in img}
+                    self._img_path = img.img_path
+                self._signature = signature
+
+    @property
+    def entries(self) -> dict[str, ArchiveContent]:
+        """Entries by case-folded name, in the directory order"""
+        self._refresh()
+        return self._entries
+
+    @property
+    def img_path(self) -> Path:
+        self._refresh()
+        return self._img_path
+
+    @property
+    def signature(self) -> tuple[int, int]:
+        """archive_signature of the archive when the directory was read"""
+        self._refresh()
+        return self._signature
+
+    def find(self, name: str) -> ArchiveContent:
+        try:
+            return self.entries[name.casefold()]
+        except KeyError:
+            raise FileNotFoundError(name) from None
+
+    def stat(self, entry: ArchiveContent | None = None) -> os.stat_result:
+        """stat of the archive with the size of [entry] and read-only file mode, or of the archive as a directory"""
+        st = os.stat(self.img_path)
+        if entry is None:
+            mode, size = stat.S_IFDIR | 0o555, st.st_size
+        else:
+            mode, size = stat.S_IFREG | 0o444, entry.size.bytes
+        return os.stat_result((mode, 0, st.st_dev, 1, st.st_uid, st.st_gid, size,
+                               st.st_atime, st.st_mtime, st.st_ctime))
+
+    def open(self, name: str, buffering: int = -1) -> BinaryIO:
+        return open_entry(self.img_path, self.find(name), buffering)
+
+
+class ArchivePath:
+    """
+    pathlib.Path-like read-only view of an archive (the root, a directory) and of its entries.
+    The entries are read in place, with random access
+    """
+    __slots__ = ('listing', 'name')
+
+    def __init__(self, archive: str | Path | IMGArchive | ArchiveListing, name: str = ''):
+        self.listing = archive if isinstance(archive, ArchiveListing) else ArchiveListing(archive)
+        self.name = name
+
+    def __truediv__(self, name: str) -> ArchivePath:
+        if self.name:
+            raise NotADirectoryError(str(self))
+        return ArchivePath(self.listing, name)
+
+    def joinpath(self, name: str) -> ArchivePath:
+        return self / name
+
+    def __str__(self) -> str:
+        root = str(self.listing.archive.imgname)
+        return f'{root}/{self.name}' if self.name else root
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({str(self)!r})'
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, ArchivePath) and self.listing.archive.cache_identity ==
+                other.listing.archive.cache_identity and self.name.casefold() == other.name.casefold())
+
+    def __hash__(self) -> int:
+        return hash((self.listing.archive.cache_identity, self.name.casefold()))
+
+    @property
+    def parent(self) -> ArchivePath:
+        return ArchivePath(self.listing) if self.name else self
+
+    @property
+    def suffix(self) -> str:
+        return os.path.splitext(self.name)[1]
+
+    @property
+    def stem(self) -> str:
+        return os.path.splitext(self.name)[0]
+
+    @property
+    def entry(self) -> ArchiveContent:
+        return self.listing.find(self.name)
+
+    def exists(self) -> bool:
+        return not self.name or self.name.casefold() in self.listing.entries
+
+    def is_dir(self) -> bool:
+        return not self.name
+
+    def is_file(self) -> bool:
+        return bool(self.name) and self.exists()
+
+    def iterdir(self) -> Iterator[ArchivePath]:
+        if self.name:
+            raise NotADirectoryError(str(self))
+        for entry in [*self.listing.entries.values()]:
+            yield ArchivePath(self.listing, entry.name)
+
+    def glob(self, pattern: str) -> Iterator[ArchivePath]:
+        """Yields the entries whose name matches [pattern], case-insensitively"""
+        pattern = pattern.removeprefix('**/').casefold()
+        return (path for path in self.iterdir() if fnmatch(path.name.casefold(), pattern))
+
+    rglob = glob
+
+    def match(self, pattern: str) -> bool:
+        return fnmatch(self.name.casefold(), pattern.casefold())
+
+    def stat(self) -> os.stat_result:
+        return self.listing.stat(self.entry if self.name else None)
+
+    def open(self, mode: str = 'rb', buffering: int = -1, encoding: str = None, errors: str = None,
+             newline: str = None):
+        """Opens the entry for reading ('rb' or 'r'), the archive can't be changed through the path"""
+        if set(mode) - {'r', 'b', 't'}:
+            raise PermissionError(f'{self} is read-only')
+        if not self.name:
+            raise IsADirectoryError(str(self))
+        file = self.listing.open(self.name, buffering if 'b' in mode else -1)
+        if 'b' in mode:
+            return file
+        return io.TextIOWrapper(file, encoding, errors, newline)
+
+    def read_bytes(self) -> bytes:
+        with self.open('rb', 0) as f:
+            return f.read()
+
+    def read_text(self, encoding: str = None, errors: str = None) -> str:
+        with self.open('r', encoding=encoding, errors=errors) as f:
+            return f.read()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Iterable
+
+from pyimgedit import IMGArchive
+
+OPERATIONS = frozenset({'add', 'extract', 'extract_many', 'rename', 'delete', 'rebuild', 'convert', 'split'})
+
+
+class Job:
+    """One operation of a manifest: IMGArchive([archive]).[op](*[args], **[kwargs])"""
+    __slots__ = ('index', 'archive', 'op', 'args', 'kwargs')
+
+    def __init__(self, index: int, archive: str, op: str, args: Iterable = (), kwargs: dict[str, Any] = None):
+        if op not in OPERATIONS:
+            raise ValueError(f'Job {index}: unknown operation {op!r}, one of {", ".join(sorted(OPERATIONS))} expected')
+        self.index = index
+        self.archive = archive
+        self.op = op
+        self.args = [*args]
+        self.kwargs = kwargs or {}
+
+    @classmethod
+    def from_dict(cls, index: int, job: dict[str, Any]) -> Job:
+        try:
+            return cls(index, job['archive'], job['op'], job.get('args', ()), job.get('kwargs'))
+        except KeyError as e:
+            raise ValueError(f'Job {index}: {e.args[0]!r} is required') from None
+
+    def __repr__(self) -> str:
+        return f'<Job {self.index}: {self.op} {self.archive} {self.args}>'
+
+
+class JobResult:
+    __slots__ = ('job', 'ok', 'seconds', 'attempts', 'error')
+
+    def __init__(self, job: Job, ok: bool, seconds: float = 0., attempts: int = 0, error: str = None):
+        self.job = job
+        self.ok = ok
+        self.seconds = seconds
+        self.attempts = attempts
+        self.error = error
+
+    def __repr__(self) -> str:
+        status = 'ok' if self.ok else f'failed: {self.error}' if self.attempts else f'skipped: {self.error}'
+        return f'<JobResult {self.job.index} {self.job.op} {self.job.archive} ({self.seconds:.3f}s) {status}>'
+
+
+def load_manifest(path: str | Path) -> list[Job]:
+    """
+    Reads the jobs of a JSON or YAML (needs PyYAML) manifest: a list of
+    {"archive": ..., "op": ..., "args": [...], "kwargs": {...}} or {"jobs": [...]}
+    """
+    path = Path(path)
+    with open(path, encoding='UTF-8') as f:
+        if path.suffix.lower() in ('.yml', '.yaml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError('PyYAML is needed for the YAML manifests: pip install pyyaml') from None
+            manifest = yaml.safe_load(f)
+        else:
+            manifest = json.load(f)
+    if isinstance(manifest, dict):
+        manifest = manifest.get('jobs', ())
+    return [Job.from_dict(i, job) for i, job in enumerate(manifest)]
+
+
+def run_operation(archive: IMGArchive, op: str, args: list, kwargs: dict[str, Any]):
+    """Runs one operation to the end (the generators of rebuild and extract_many are exhausted)"""
+    if op == 'rebuild':
+        process, _, progress = archive.rebuild(*args, **kwargs)
+        for _ in progress:
+            pass
+        if process is not None:
+            process.wait()
+        return
+    result = getattr(archive, op)(*args, **kwargs)
+    if op == 'extract_many':
+        for _ in result:
+            pass
+
+
+def run_archive_jobs(jobs: list[Job], retries: int = 0, keep_going: bool = False) -> list[JobResult]:
+    """
+    Runs [jobs] of one archive in order, retrying a failed one up to [retries] times
+    (runs in the worker processes)
+    """
+    results = []
+    failed = None
+    for job in jobs:
+        if failed is not None and not keep_going:
+            results.append(JobResult(job, False, error=f'job {failed.index} failed'))
+            continue
+        start = perf_counter()
+        for attempt in range(1, retries + 2):
+            try:
+                run_operation(IMGArchive(job.archive), job.op, job.args, job.kwargs)
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+            else:
+                results.append(JobResult(job, True, perf_counter() - start, attempt))
+                break
+        else:
+            results.append(JobResult(job, False, perf_counter() - start, retries + 1, error))
+            failed = job
+    return results
+
+
+def archive_key(archive: str | Path) -> str:
+    """The same key for the .img and the .dir of an archive"""
+    path = Path(archive)
+    if path.suffix.lower() == '.dir':
+        path = path.with_suffix('.img')
+    return os.path.normcase(os.path.realpath(path))
+
+
+def run_batch(jobs: Iterable[Job], workers: int = None, retries: int = 0, keep_going: bool = False,
+              base_dir: str | Path = None) -> list[JobResult]:
+    """
+    Runs [jobs] grouped by archive: the archives are processed in parallel processes,
+    the jobs of one archive in the manifest order. The relative paths are relative to [base_dir].
+    Returns the results in the manifest order
+    """
+    groups: dict[str, list[Job]] = {}
+    for job in jobs:
+        path = job.archive if base_dir is None else os.path.join(base_dir, job.archive)
+        groups.setdefault(archive_key(path), []).append(job)
+    results = []
+    if groups:
+        with ProcessPoolExecutor(workers, initializer=None if base_dir is None else os.chdir,
+                                 initargs=() if base_dir is None else (str(base_dir),)) as pool:
+            futures = [pool.submit(run_archive_jobs, group, retries, keep_going) for group in groups.values()]
+            for future in as_completed(futures):
+                results.extend(future.result())
+    return sorted(results, key=lambda r: r.job.index)
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Collection, Hashable
+
+DEFAULT_CACHE_BYTES = 256 << 20
+
+
+class EntryCache:
+    """LRU cache of entry contents limited by the total size of the cached contents"""
+    __slots__ = ('max_bytes', 'hits', 'misses', '_size', '_items', '_lock')
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._items: OrderedDict[tuple[Hashable, str, int, int], bytes] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached contents in bytes"""
+        return self._size
+
+    def get(self, key: tuple[Hashable, str, int, int]) -> bytes | None:
+        """Returns the content cached for key (archive identity, name, offset, size) or None"""
+        with self._lock:
+            try:
+                self._items.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._items[key]
+
+    def put(self, key: tuple[Hashable, str, int, int], content: bytes):
+        """Caches [content], evicting the least recently used contents over the budget"""
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            if (old := self._items.pop(key, None)) is not None:
+                self._size -= len(old)
+            self._items[key] = content
+            self._size += len(content)
+            while self._size > self.max_bytes:
+                self._size -= len(self._items.popitem(last=False)[1])
+
+    def invalidate(self, archive: Hashable, names: Collection[str] = None):
+        """Drops the contents of [archive] (only of the entries [names] if given)"""
+        if names is not None:
+            names = {name.casefold() for name in names}
+        with self._lock:
+            for key in [*self._items]:
+                if key[0] == archive and (names is None or key[1] in names):
+                    self._size -= len(self._items.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._items), 'bytes': self._size}
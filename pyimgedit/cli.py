@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from pyimgedit import __version__
+
+
+def _index_build(args: argparse.Namespace):
+    from pyimgedit.index import ArchiveIndex
+    with ArchiveIndex(args.db) as index:
+        stats = index.build(args.game_dir, args.workers)
+    print(', '.join(f'{k}: {v}' for k, v in stats.items()))
+
+
+def _index_find(args: argparse.Namespace):
+    from pyimgedit.index import ArchiveIndex
+    with ArchiveIndex(args.db) as index:
+        for path, entry, digest in index.find(args.pattern, args.limit):
+            print(f'{path}\t{entry.name}\t{entry.offset.blocks}\t{entry.size.blocks}\t{digest}')
+
+
+def _batch(args: argparse.Namespace):
+    from pyimgedit.batch import load_manifest, run_batch
+    start = perf_counter()
+    results = run_batch(load_manifest(args.manifest), args.workers, args.retries, args.keep_going,
+                        Path(args.manifest).parent)
+    for result in results:
+        print(result)
+    failed = sum(not r.ok for r in results)
+    print(f'{len(results) - failed}/{len(results)} jobs done in {perf_counter() - start:.3f}s')
+    if failed:
+        sys.exit(1)
+
+
+def _serve(args: argparse.Namespace):
+    from pyimgedit.server import serve
+    serve(args.archive, args.host, args.port)
+
+
+def _sync(args: argparse.Namespace):
+    from pyimgedit.sync import DirectorySync
+    sync = DirectorySync(args.directory, args.archive, args.manifest)
+    if not args.watch:
+        print(sync.sync() or 'Up to date')
+        return
+    try:
+        for result in sync.watch(args.debounce, args.interval):
+            print(', '.join(f'{k}: {v}' for k, v in result.items()))
+    except KeyboardInterrupt:
+        pass
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='pyimgedit', description='Open & edit .img files for gta III / VC / SA')
+    parser.add_argument('--version', action='version', version='.'.join(str(i) for i in __version__))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index = commands.add_parser('index', help='search index of all the archives of a game install')
+    index_commands = index.add_subparsers(dest='index_command', required=True)
+    build = index_commands.add_parser('build', help='index (or refresh the index of) the archives under a directory')
+    build.add_argument('game_dir')
+    build.add_argument('--workers', type=int, default=None, help='number of scanning processes')
+    build.set_defaults(handler=_index_build)
+    find = index_commands.add_parser('find', help='find entries by a glob pattern, e.g. "vehicle*.txd"')
+    find.add_argument('pattern')
+    find.add_argument('--limit', type=int, default=None)
+    find.set_defaults(handler=_index_find)
+    for command in (build, find):
+        command.add_argument('--db', default=None, help='index database (in the user cache directory by default)')
+
+    batch = commands.add_parser('batch', help='run a JSON / YAML manifest of operations on many archives')
+    batch.add_argument('manifest')
+    batch.add_argument('--workers', type=int, default=None, help='number of archives processed in parallel')
+    batch.add_argument('--retries', type=int, default=0, help='retries of a failed operation')
+    batch.add_argument('--keep-going', action='store_true',
+                       help="don't skip the next operations on an archive after a failed one")
+    batch.set_defaults(handler=_batch)
+
+    serve = commands.add_parser('serve', help='serve the entries of an archive over HTTP (with Range and ETag)')
+    serve.add_argument('archive')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+    serve.set_defaults(handler=_serve)
+
+    sync = commands.add_parser('sync', help='mirror the loose files of a directory into an archive')
+    sync.add_argument('directory')
+    sync.add_argument('archive')
+    sync.add_argument('--watch', action='store_true', help='keep syncing the changes of the directory')
+    sync.add_argument('--debounce', type=float, default=.3,
+                      help='seconds without changes after which a burst of changes is synced')
+    sync.add_argument('--interval', type=float, default=1., help='seconds between the scans when polling')
+    sync.add_argument('--manifest', default=None, help='manifest file (<archive>.sync.json by default)')
+    sync.set_defaults(handler=_sync)
+
+    return parser
+
+
+COMMANDS = frozenset({'index', 'batch', 'serve', 'sync'})
+
+
+def main(argv: list[str] = None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
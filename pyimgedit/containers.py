@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import os
+import tarfile
+import time
+import zipfile
+from contextlib import contextmanager
+from functools import partial
+from pathlib import PurePosixPath
+from typing import BinaryIO, Iterator
+
+from pyimgedit import ArchiveContent
+from pyimgedit.fastcopy import COPY_BUFFER_SIZE
+from pyimgedit.imgfile import IMGFile, _encode_name
+
+
+class _EntryReader:
+    """read() of one entry of an opened IMGFile, for the copy loops of tarfile"""
+    __slots__ = ('img', 'entry', 'position')
+
+    def __init__(self, img: IMGFile, entry: ArchiveContent):
+        self.img = img
+        self.entry = entry
+        self.position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.entry.size.bytes - self.position
+        data = self.img.read_range(self.entry, self.position, size)
+        self.position += len(data)
+        return data
+
+
+def _in_archive_order(img: IMGFile) -> list[ArchiveContent]:
+    return sorted(img, key=lambda e: e.offset.blocks)
+
+
+def _chunks(source) -> Iterator[bytes]:
+    return iter(partial(source.read, COPY_BUFFER_SIZE), b'')
+
+
+def export_tar(img: IMGFile, fileobj: BinaryIO, compression: str = '') -> int:
+    """
+    Writes all the entries of [img] to the tar stream [fileobj] ([compression]: '', 'gz', 'bz2' or 'xz').
+    The entries are read in chunks in the order of the archive. Returns the number of entries
+    """
+    mtime = os.stat(img.img_path).st_mtime
+    entries = _in_archive_order(img)
+    with tarfile.open(fileobj=fileobj, mode=f'w|{compression}', copybufsize=COPY_BUFFER_SIZE) as tar:
+        for entry in entries:
+            info = tarfile.TarInfo(entry.name)
+            info.size = entry.size.bytes
+            info.mtime = mtime
+            info.mode = 0o644
+            tar.addfile(info, _EntryReader(img, entry))
+    return len(entries)
+
+
+def export_zip(img: IMGFile, fileobj: BinaryIO, compression: int = zipfile.ZIP_STORED) -> int:
+    """
+    Writes all the entries of [img] to the zip stream [fileobj] (which may be not seekable).
+    The entries are read in chunks in the order of the archive. Returns the number of entries
+    """
+    date_time = time.localtime(os.stat(img.img_path).st_mtime)[:6]
+    entries = _in_archive_order(img)
+    with zipfile.ZipFile(fileobj, 'w', compression) as zip_file:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry.name, date_time)
+            info.compress_type = compression
+            info.file_size = entry.size.bytes
+            with zip_file.open(info, 'w') as out:
+                for chunk in img.iter_chunks(entry):
+                    out.write(chunk)
+    return len(entries)
+
+
+def _entry_name(path: str, seen: dict[str, str]) -> str:
+    """
+    The entry name of member [path]: an archive has no folders, only the file name is kept.
+    Raises ValueError if it is not a valid entry name or another member of [seen] (case-folded name: path) has it
+    """
+    name = PurePosixPath(path).name
+    _encode_name(name)
+    if (other := seen.setdefault(name.casefold(), path)) != path:
+        raise ValueError(f'{other} and {path} would both be the entry {name!r}')
+    return name
+
+
+@contextmanager
+def _all_or_nothing(img: IMGFile):
+    """If the import fails, the directory of [img] is left as it was before it"""
+    state = img._save_state()
+    try:
+        yield
+    except BaseException:
+        img._restore_state(state)
+        raise
+
+
+def import_tar(img: IMGFile, fileobj: BinaryIO) -> list[ArchiveContent]:
+    """
+    Adds/replaces the regular files of the (possibly compressed) tar stream [fileobj] in [img].
+    All or nothing: an invalid name, two members of the same name in different folders or a broken stream
+    raise ValueError / tarfile.TarError and leave the directory unchanged
+    """
+    added = []
+    seen = {}
+    with _all_or_nothing(img), tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for member in tar:
+            if member.isfile():
+                name = _entry_name(member.name, seen)
+                added.append(img.write_stream(name, _chunks(tar.extractfile(member)), member.size))
+    return added
+
+
+def import_zip(img: IMGFile, fileobj: BinaryIO) -> list[ArchiveContent]:
+    """
+    Adds/replaces the files of the zip file [fileobj] (must be seekable) in [img].
+    The names of all the members are checked before anything is written (see import_tar)
+    """
+    added = []
+    seen = {}
+    with _all_or_nothing(img), zipfile.ZipFile(fileobj) as zip_file:
+        members = [(_entry_name(info.filename, seen), info) for info in zip_file.infolist() if not info.is_dir()]
+        for name, info in members:
+            with zip_file.open(info) as source:
+                added.append(img.write_stream(name, _chunks(source), info.file_size))
+    return added
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import errno
+import os
+import sys
+from typing import BinaryIO
+
+COPY_BUFFER_SIZE = 1 << 20
+KERNEL_COPY = sys.platform.startswith('linux')
+_FALLBACK_ERRORS = frozenset({errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF, errno.EPERM,
+                              getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP)})
+
+
+def write_all(file: BinaryIO, data: bytes | bytearray | memoryview) -> int:
+    """Writes all of [data] to the (possibly unbuffered) [file]"""
+    data = memoryview(data).cast('B')
+    written = 0
+    while written < data.nbytes:
+        written += file.write(data[written:]) or 0
+    return written
+
+
+def _kernel_copy(source: int, destination: int, length: int, source_offset: int, destination_offset: int) -> int:
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < length:
+                done = os.copy_file_range(source, destination, length - copied,
+                                          source_offset + copied, destination_offset + copied)
+                if not done:
+                    return copied
+                copied += done
+            return copied
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRORS:
+                raise
+    if hasattr(os, 'sendfile'):
+        try:
+            os.lseek(destination, destination_offset + copied, os.SEEK_SET)
+            while copied < length:
+                done = os.sendfile(destination, source, source_offset + copied, length - copied)
+                if not done:
+                    break
+                copied += done
+        except OSError as e:
+            if e.errno not in _FALLBACK_ERRORS:
+                raise
+    return copied
+
+
+def copy_range(source: BinaryIO, destination: BinaryIO, length: int,
+               source_offset: int, destination_offset: int, buffer: bytearray = None) -> int:
+    """
+    Copies [length] bytes from [source] at [source_offset] to [destination] at [destination_offset].
+    On Linux the data is copied by the kernel (copy_file_range, then sendfile),
+    otherwise through [buffer] with readinto, so it never becomes Python bytes objects.
+    Both files must be unbuffered (opened with buffering=0). Returns the number of bytes copied
+    """
+    copied = 0
+    if KERNEL_COPY and length > 0:
+        copied = _kernel_copy(source.fileno(), destination.fileno(), length, source_offset, destination_offset)
+    if copied >= length:
+        return copied
+    if buffer is None:
+        buffer = bytearray(min(COPY_BUFFER_SIZE, length - copied))
+    view = memoryview(buffer)
+    while copied < length:
+        source.seek(source_offset + copied)
+        got = source.readinto(view[:min(len(view), length - copied)])
+        if not got:
+            break
+        destination.seek(destination_offset + copied)
+        write_all(destination, view[:got])
+        copied += got
+    return copied
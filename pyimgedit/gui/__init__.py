@@ -10,10 +10,11 @@ from time import perf_counter
 from tkinter.filedialog import (
     askdirectory,
     askopenfilename,
-    askopenfilenames
+    askopenfilenames,
+    asksaveasfilename
 )
 from tkinter.messagebox import showerror
-from typing import Callable, Sized, TypeVar
+from typing import Callable, Iterable, Sized, TypeVar
 from urllib.error import URLError
 from urllib.request import urlopen
 
@@ -33,15 +34,20 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.progressbar import MDProgressBar
 from kivymd.uix.textfield import MDTextField
 
-from pyimgedit import IMGArchive, PACKAGE_DIR, __version__, bytes2units, it_file
+from pyimgedit import IMGArchive, OperationResult, PACKAGE_DIR, __version__, bytes2units, it_file
 from pyimgedit.gui.archive_data_view import ArchiveDataView, SELECTED_ICON_PADDING, get_item
 from pyimgedit.gui.archive_info_view import ArchiveInfoView
 from pyimgedit.gui.archive_log_view import ArchiveLogView
 from pyimgedit.gui.custom_widgets import ActionIconButton, ThemeLightbulb
+from pyimgedit.gui.event_bus import EventBus
+from pyimgedit.gui.texture_preview import TexturePreviewLoader
+from pyimgedit.updater import download, fetch_sha256
 
 T = TypeVar('T')
 T2 = TypeVar('T2')
 EXE_URL = 'https://github.com/NIKDISSV-Forever/UniversalIMG/blob/main/dist/Universal%20IMG.exe?raw=true'
+EXE_SHA256_URL = 'https://github.com/NIKDISSV-Forever/UniversalIMG/blob/main/dist/Universal%20IMG.exe.sha256?raw=true'
+LISTING_CHUNK_SIZE = 500
 toast_mainthread = mainthread(toast)
 
 
@@ -64,49 +70,44 @@ def version_check_message() -> str:
 def ask_update(new_version: tuple[int]):
     @new_thread
     def init_download(button: BaseButton):
-        popup.auto_dismiss = False
-        text.text = text.text.removesuffix('Esc to cancel.\n')
-        button.disabled = True
-
+        set_state(button, False)
         out_file = Path(it_file)
         out_file = out_file.with_suffix(f'.upd{out_file.suffix}')
-        with (open(out_file, 'wb') as out,
-              urlopen(EXE_URL) as download):
-            download: HTTPResponse
-            content_len = int(download.getheader('Content-Length', 0))
-
-            _download_start = perf_counter() - 1
-            total = 0
-            if not content_len:
-                info.text = 'unable to get file size'
-                bar.type = 'indeterminate'
-                bar.start()
-
-                def update_text(download_len: int):
-                    nonlocal total
-                    total += download_len
-                    download_time = perf_counter() - _download_start
-                    info.text = (f'Time: {download_time:.0f}s | {bytes2units(total / download_time)}/s\n'
-                                 f'Downloaded: {bytes2units(total)} | +{bytes2units(download_len)}')
-            else:
-                content_len_s = bytes2units(content_len)
-                bar.max = content_len
-
-                def update_text(download_len):
-                    nonlocal total
-                    total += download_len
-                    bar.value = total
-                    download_time = perf_counter() - _download_start
-                    speed = total / download_time
-                    eta = (content_len - total) / speed
-                    info.text = (f'Time: {download_time:.0f}s | {bytes2units(speed)}/s\n'
-                                 f'ETA: {eta:.0f}s\n'
-                                 f'Downloaded: {total / content_len:.1%} {bytes2units(total)}/{content_len_s}')
-
-            for bytes in download:
-                update_text(out.write(bytes))
-            os.startfile(out_file.parent)
-            popup.dismiss()
+        _download_start = perf_counter() - 1
+
+        @mainthread
+        def update_text(downloaded: int, total: int):
+            download_time = perf_counter() - _download_start
+            speed = downloaded / download_time
+            if not total:
+                info.text = (f'Time: {download_time:.0f}s | {bytes2units(speed)}/s\n'
+                             f'Downloaded: {bytes2units(downloaded)}')
+                return
+            bar.max = total
+            bar.value = downloaded
+            info.text = (f'Time: {download_time:.0f}s | {bytes2units(speed)}/s\n'
+                         f'ETA: {(total - downloaded) / speed:.0f}s\n'
+                         f'Downloaded: {downloaded / total:.1%} {bytes2units(downloaded)}/{bytes2units(total)}')
+
+        try:  # a failed checksum request is not an unpublished checksum: nothing is downloaded unverified then
+            sha256 = fetch_sha256(EXE_SHA256_URL)
+            download(EXE_URL, out_file, sha256, update_text)
+        except BaseException:
+            set_state(button, True)
+            raise
+        if sha256 is None:
+            toast_mainthread('The checksum of the update is not published, it was not verified')
+        os.startfile(out_file.parent)
+        mainthread(popup.dismiss)()
+
+    @mainthread
+    def set_state(button: BaseButton, idle: bool):
+        popup.auto_dismiss = idle
+        button.disabled = not idle
+        if idle:
+            info.text = 'Download interrupted, Update continues it.'
+        else:
+            text.text = text.text.removesuffix('Esc to cancel.\n')
 
     popup = Popup(title='New version exist',
                   size_hint=(.5, .5),
@@ -129,7 +130,12 @@ def ask_update(new_version: tuple[int]):
     popup.open()
 
 
-def _disable_brothers(func: Callable[[T], T2]):
+def _disable_brothers(func: Callable[[T], T2], writes: bool = True):
+    """
+    Disables the buttons of all the actions while [func] runs. With snapshots, only the button of [func]
+    if it does not write and the writing ones if it writes: the reading ones (reading_buttons) can run meanwhile
+    """
+
     @wraps(func)
     def handler(self: T, btn: BaseButton) -> T2:
         reset = {*()}
@@ -137,6 +143,8 @@ def _disable_brothers(func: Callable[[T], T2]):
             if not isinstance(child, ActionIconButton):
                 continue
             button = child.button
+            if button is not btn and self.snapshots and (not writes or button in self.reading_buttons):
+                continue
             button.disabled = True
             reset.add(button)
         try:
@@ -148,8 +156,10 @@ def _disable_brothers(func: Callable[[T], T2]):
     return handler
 
 
-def _act_button_process(func: Callable[[T], T2]):
-    return _disable_brothers(func)
+def _act_button_process(func: Callable[[T], T2] = None, *, writes: bool = True):
+    if func is None:
+        return partial(_disable_brothers, writes=writes)
+    return _disable_brothers(func, writes)
 
 
 def askstring(title: str, prompt: str, *, initialvalue: str, on_validate: Callable[[str], None] = None):
@@ -203,6 +213,7 @@ class UniversalIMGApp(MDApp):
 
     icon = str(PACKAGE_DIR / 'icon.png')
     _version_verdict = StringProperty('')
+    snapshots = BooleanProperty(False)  # see IMGArchive.use_snapshots, the writes grow the archive until a rebuild
 
     def build(self):
         MDLabel.font_size = BaseButton.font_size = dp(18)
@@ -212,11 +223,17 @@ class UniversalIMGApp(MDApp):
 
         self.archive_data_view = ArchiveDataView(size_hint_x=.75)
         self.archive_data_view.get_item = partial(get_item, on_release=self.rename_file)
+        self.archive_data_view.preview_loader = TexturePreviewLoader(lambda: self._opened_archive)
         self.log_view = ArchiveLogView()
 
         self.opened_info_view = ArchiveLogView()
         self.progress_bar = MDProgressBar(value=100)
 
+        self.bus = EventBus()
+        self.bus.subscribe_latest('progress', partial(setattr, self.progress_bar, 'value'))
+        self.bus.subscribe_latest('log_text', self.log_view.set_text_mainthread)
+        self.bus.subscribe_tail('log', self.log_view.set_logs, bounded=False)  # the whole log can be saved
+
         self.archive_info_view = MDBoxLayout(
             self.log_view,
             self.progress_bar,
@@ -230,6 +247,7 @@ class UniversalIMGApp(MDApp):
         self.delete_files = new_thread(self.delete_files)
         self.reload_list = new_thread(self.reload_list)
         self.rebuild_archive = new_thread(self.rebuild_archive)
+        self._rename_file = new_thread(self._rename_file)
 
         layout = MDBoxLayout(
             MDBoxLayout(
@@ -298,6 +316,7 @@ class UniversalIMGApp(MDApp):
         self.reload_list_button = reload_list_button.button
         self.rebuild_archive_button = rebuild_archive_button.button
         self.set_theme_button = set_theme_button
+        self.reading_buttons = {self.extract_files_button, self.reload_list_button}
 
         return layout
 
@@ -344,8 +363,12 @@ class UniversalIMGApp(MDApp):
                         self.rebuild_archive(self.rebuild_archive_button)
                     else:
                         self.reload_list(self.reload_list_button)
+                case 105:  # I
+                    self.archive_data_view.invert_selection()
                 case 108:  # L
                     self.set_theme()
+                case 115:  # S
+                    self.save_log()
         else:
             match keycode:
                 case 283:  # F2
@@ -363,17 +386,67 @@ class UniversalIMGApp(MDApp):
 
     def open_archive(self):
         self._opened_archive = IMGArchive(self.open_archive_filename)
+        if self.snapshots:
+            self._opened_archive.use_snapshots()
         self.reload_views()
 
-    @mainthread
     def reload_views(self):
-        open_header, archive_info, archive_files = self._opened_archive.list()
+        """
+        Lists the archive in a background thread, the files are shown chunk by chunk as they are decoded.
+        A listing that is still running when the archive is listed again is cancelled
+        """
+        self._listing_generation += 1
+        Thread(target=self._list_archive, args=(self._opened_archive, self._listing_generation), daemon=True).start()
+
+    def _list_archive(self, archive: IMGArchive, generation: int):
+        listing = archive.iter_list(LISTING_CHUNK_SIZE)
+        try:
+            open_header, archive_info = next(listing)
+            self._begin_listing(generation, open_header, archive_info)
+            for files in listing:
+                if generation != self._listing_generation:
+                    return
+                self._extend_listing(generation, files)
+            self._end_listing(generation)
+        except Exception as e:
+            if generation == self._listing_generation:
+                showerror(f'{e.__class__.__name__} (list)', str(e))
+        finally:
+            listing.close()
+
+    @mainthread
+    def _begin_listing(self, generation: int, open_header: dict, archive_info: dict):
+        if generation != self._listing_generation:
+            return
         self.log_view.set_log(open_header)
         self.opened_info_view.set_log(archive_info)
-        self.archive_data_view.update_data(archive_files)
+        self.archive_data_view.begin_data()
+
+    @mainthread
+    def _extend_listing(self, generation: int, files: list):
+        if generation == self._listing_generation:
+            self.archive_data_view.extend_data(files)
+
+    @mainthread
+    def _end_listing(self, generation: int):
+        if generation == self._listing_generation:
+            self.archive_data_view.end_data()
+
+    def apply_results(self, results: Iterable[OperationResult]):
+        """
+        Updates the views with the directory changes of the operations, lists the archive again if they are unknown
+        """
+        changes = []
+        for result in results:
+            if result.changes is None:
+                self.reload_views()
+                return
+            changes += result.changes
+        self.archive_data_view.apply_changes(changes)
 
     open_archive_filename = StringProperty('')
     _opened_archive = ObjectProperty()
+    _listing_generation = 0
 
     def open_new_file(self, _=None):
         if filename := askopenfilename(
@@ -387,7 +460,7 @@ class UniversalIMGApp(MDApp):
             self.open_archive()
         self.retitle()
 
-    @_act_button_process
+    @_act_button_process(writes=False)
     def reload_list(self):
         self.reload_views()
 
@@ -399,24 +472,26 @@ class UniversalIMGApp(MDApp):
         ))
         if not filenames:
             return
-        for filename in self.progress_loop(filenames):
-            result = self._opened_archive.add(filename)
-            self.log_view.set_log(result)
-        self.reload_views()
+        results = []
+        for result in self.progress_loop(self._opened_archive.add_many(filenames), len(filenames)):
+            self.bus.append('log', result)
+            results.append(result)
+        self.apply_results(results)
 
     @_act_button_process
     def delete_files(self):
-        if not self.archive_data_view.selected_filenames:
+        if not (filenames := self.archive_data_view.selected_filenames):  # the rows stay clickable meanwhile
             toast_mainthread("You didn't choose anything.")
             return
-        for filename in self.progress_loop(self.archive_data_view.selected_filenames.copy()):
-            header = self._opened_archive.delete(filename)
-            self.log_view.set_log(header)
-        self.reload_views()
+        results = []  # one session: the directory is read and written once, not for every file
+        for header in self.progress_loop(self._opened_archive.delete_many(filenames), len(filenames)):
+            self.bus.append('log', header)
+            results.append(header)
+        self.apply_results(results)
 
-    @_act_button_process
+    @_act_button_process(writes=False)
     def extract_files(self):
-        if not self.archive_data_view.selected_filenames:
+        if not (filenames := self.archive_data_view.selected_filenames):
             toast_mainthread("You didn't choose anything.")
             return
         my_dir = f'{self._opened_archive.imgname}_archive'
@@ -424,15 +499,13 @@ class UniversalIMGApp(MDApp):
         save_dir = askdirectory(initialdir=my_dir)
         if not save_dir:
             return
-        for filename in self.progress_loop(self.archive_data_view.selected_filenames.copy()):
-            header = self._opened_archive.extract(filename, os.path.join(save_dir, filename))
-            self.log_view.set_log(header)
+        for header in self.progress_loop(self._opened_archive.extract_many(filenames, save_dir), len(filenames)):
+            self.bus.append('log', header)
 
     def _rename_file(self, filename: str, filename2: str):
-        self.log_view.set_log(
-            self._opened_archive.rename(filename, filename2)
-        )
-        self.reload_views()
+        result = self._opened_archive.rename(filename, filename2)
+        self.bus.append('log', result)
+        self.apply_results((result,))
 
     def rename_file(self, button: BaseButton):
         name = button.text
@@ -446,8 +519,8 @@ class UniversalIMGApp(MDApp):
         _, header, executor = self._opened_archive.rebuild()
         header = self.log_view.form_string(header)
         for name, progress in executor:
-            self.progress_bar.value = self._get_rebuild_progress(progress)
-            self.log_view.set_text_mainthread(f'{header}\n\n{name}: {progress}')
+            self.bus.publish('progress', self._get_rebuild_progress(progress))
+            self.bus.publish('log_text', f'{header}\n\n{name}: {progress}')
 
     @staticmethod
     def _get_rebuild_progress(progress_line: str):
@@ -461,9 +534,15 @@ class UniversalIMGApp(MDApp):
         if length is None:
             length = len(iters) if isinstance(iters, Sized) else 100
         for i, v in enumerate(iters, 1):
-            self.progress_bar.value = i / length * 100.
+            self.bus.publish('progress', i / length * 100.)
             yield v
 
+    def save_log(self):
+        if filename := asksaveasfilename(defaultextension='.log',
+                                         filetypes=(('Log', '*.log;*.txt'), ('Any', '*'))):
+            with open(filename, 'w', encoding='UTF-8') as log_file:
+                self.log_view.dump(log_file)
+
     def set_theme(self, button: ThemeLightbulb = None):
         if button is None:
             button = self.set_theme_button
@@ -516,5 +595,6 @@ def run():
     if hasattr(sys, '_MEIPASS'):
         resource_add_path(os.path.join(sys._MEIPASS))
     UniversalIMGApp(
-        open_archive_filename=sys.argv[-1] if len(sys.argv) > 1 else ''
+        open_archive_filename=sys.argv[-1] if len(sys.argv) > 1 else '',
+        snapshots=os.environ.get('UNIVERSALIMG_SNAPSHOTS', '') == '1'
     ).run()
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import functools
 import math
-from typing import SupportsInt
+from typing import Callable, Iterator, SupportsInt
 
 from kivy.clock import mainthread
+from kivy.core.window import Window
 from kivy.graphics import Color
 from kivy.input.providers.mouse import MouseMotionEvent
 from kivy.metrics import dp
@@ -12,6 +13,7 @@ from kivy.properties import (AliasProperty, BooleanProperty,
                              ListProperty, NumericProperty,
                              ObjectProperty, OptionProperty)
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.image import Image
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.button import BaseButton, MDIconButton
 from kivymd.uix.button import MDRectangleFlatButton
@@ -21,7 +23,8 @@ from kivymd.uix.selection import MDSelectionList
 from kivymd.uix.selection import selection
 from kivymd.uix.textfield import MDTextField
 
-from pyimgedit import ArchiveContent
+from pyimgedit import ArchiveContent, DirectoryChange
+from pyimgedit.gui.selection_model import RowSelection
 
 SELECTED_ICON_PADDING = (dp(65.), 0, 0, 0)
 SORT_DIRECTION = (' (+)', ' (-)')
@@ -48,10 +51,14 @@ def aoi(value: str | SupportsInt) -> int | None:
         return
 
 
-def get_item(file: ArchiveContent, **kwargs) -> MDBoxLayout:
+def get_item(file: ArchiveContent, *, preview: Callable[[ArchiveContent, Image], None] = None,
+             **kwargs) -> MDBoxLayout:
     fn_box = BoxLayout(
         padding=SELECTED_ICON_PADDING,
     )
+    if preview is not None and file.name.casefold().endswith('.txd'):
+        fn_box.add_widget(image := Image(size_hint_x=None, width=dp(48)))
+        preview(file, image)
     fn_box.add_widget(
         MDRectangleFlatButton(
             text=file.name,
@@ -83,7 +90,7 @@ class ArchiveDataView(BoxLayout):
     rows = ListProperty([])
 
     showed_rows = ListProperty([])
-    selected_filenames = ListProperty([])
+    selection = ObjectProperty()
     row_items = ListProperty([])
     scroll_direction = OptionProperty('nope', options=['up', 'nope', 'down'])
 
@@ -91,6 +98,8 @@ class ArchiveDataView(BoxLayout):
 
     select_list = ObjectProperty()
     search_field = ObjectProperty()
+    preview_loader = ObjectProperty(None, allownone=True)
+    _sort = ObjectProperty(None, allownone=True)
     _last_page = NumericProperty(-1)
 
     @staticmethod
@@ -130,6 +139,10 @@ class ArchiveDataView(BoxLayout):
                         icon='select-all',
                         on_press=self.select_all
                     ),
+                    MDIconButton(
+                        icon='select-inverse',
+                        on_press=self.invert_selection
+                    ),
                     *self._COLUMN_LABELS,
                     size_hint_y=.1,
                 ),
@@ -204,6 +217,14 @@ class ArchiveDataView(BoxLayout):
             )
         )
 
+        self.selection = RowSelection()
+        self.selection.bind(on_selection=self._on_selection)
+        self._showed_indices: range | list[int] = range(0)
+        self._page_indices: range | list[int] = range(0)
+        self._page_start = 0
+        self._anchor: int | None = None
+        self._reselecting = False
+
         select_list.on_selected = self.on_select
         select_list.on_unselected = self.on_unselect
         self.get_item = functools.partial(get_item, on_press=self._on_name_button_press)
@@ -244,19 +265,29 @@ class ArchiveDataView(BoxLayout):
 
         for child in self.select_list.children.copy():
             self.select_list.remove_widget(child)
-
-        showed_rows = self.rows
+        preview = None
+        if self.preview_loader is not None:
+            self.preview_loader.cancel()
+            preview = self.preview_loader.request
+
+        rows = self.rows
+        showed_rows = rows
+        showed_indices = range(len(rows))
         row: ArchiveContent
 
         if text := self.search_field.text.strip():
             fnmatch_func = self._get_fnmatch(text)
-            showed_rows = [row for row in showed_rows if fnmatch_func(row.name)]
+            showed_indices = [i for i, row in enumerate(rows) if fnmatch_func(row.name)]
+            showed_rows = [rows[i] for i in showed_indices]
 
-        for row in showed_rows[start:start + self.page_size]:
+        self._page_start = start
+        self._page_indices = showed_indices[start:start + self.page_size]
+        for i in self._page_indices:
             self.select_list.add_widget(
-                self.get_item(row)
+                self.get_item(rows[i], preview=preview)
             )
 
+        self._showed_indices = showed_indices
         self.showed_rows = showed_rows
         self._last_page = self.page
         self.reselect()
@@ -286,42 +317,157 @@ class ArchiveDataView(BoxLayout):
             if lab.text.endswith(SORT_DIRECTION):
                 lab.text = lab.text.removesuffix(SORT_DIRECTION[0]).removesuffix(SORT_DIRECTION[1])
         label.text += SORT_DIRECTION[reverse]
-        self.rows.sort(key=lambda f: getattr(f, attr, -1), reverse=reverse)
+        self._sort = attr, reverse
+        rows = self.rows
+        order = sorted(range(len(rows)), key=lambda i: getattr(rows[i], attr, -1), reverse=reverse)
+        self.rows = [rows[i] for i in order]
+        self.selection.permute(order)
+        self._anchor = None
+        self.reform_table()
+
+    @mainthread
+    def apply_changes(self, changes: list[DirectoryChange]):
+        """Applies the directory changes of edit operations, keeping the sort order, search, page and selection"""
+        if not changes:
+            return
+        rows = self.rows.copy()
+        selected = {row.name.casefold() for row in self.selection.selected(rows)}
+        positions = {row.name.casefold(): i for i, row in enumerate(rows)}
+        removed = set()
+        for change in changes:
+            key = change.old_name.casefold()
+            match change.kind:
+                case 'add' | 'update' if (i := positions.get(key)) is not None:
+                    rows[i] = change.entry
+                case 'add' | 'update':
+                    positions[key] = len(rows)
+                    rows.append(change.entry)
+                case 'remove' if (i := positions.pop(key, None)) is not None:
+                    removed.add(i)
+                    selected.discard(key)
+                case 'rename' if (i := positions.pop(key, None)) is not None:
+                    rows[i] = change.entry
+                    positions[change.entry.name.casefold()] = i
+                    if key in selected:  # the selection moves to the new name
+                        selected.discard(key)
+                        selected.add(change.entry.name.casefold())
+        if removed:
+            rows = [row for i, row in enumerate(rows) if i not in removed]
+        if self._sort is not None:
+            attr, reverse = self._sort
+            rows.sort(key=lambda f: getattr(f, attr, -1), reverse=reverse)
+        self.selection.reset(len(rows))
+        if selected:
+            self.selection.select_all(i for i, row in enumerate(rows) if row.name.casefold() in selected)
+        self._anchor = None
+        self.rows = rows
         self.reform_table()
 
     def update_data(self, new_data):
         self.rows = new_data
-        self.selected_filenames.clear()
+        self.selection.reset(len(new_data))
+        self._anchor = None
+        self.reform_table()
+
+    def begin_data(self):
+        """
+        Starts a progressive listing: the rows come by extend_data, the first page is shown as soon as it is filled
+        """
+        self.update_data([])
+
+    def extend_data(self, new_rows: list[ArchiveContent]):
+        """Appends [new_rows], the page is formed again only while it is not full or a search is active"""
+        showed = len(self._showed_indices)
+        self.rows.extend(new_rows)
+        self.selection.extend(len(new_rows))
+        if showed < self._page_start + self.page_size or self.search_field.text.strip():
+            self.reform_table()
+            return
+        self._showed_indices = range(len(self.rows))
+        self.showed_rows = self.rows
+        self.set_page()
+
+    def end_data(self):
+        """Ends a progressive listing, the rows are sorted if a sort order was chosen"""
+        if self._sort is None:
+            return
+        attr, reverse = self._sort
+        rows = self.rows
+        order = sorted(range(len(rows)), key=lambda i: getattr(rows[i], attr, -1), reverse=reverse)
+        self.rows = [rows[i] for i in order]
+        self.selection.permute(order)
+        self._anchor = None
         self.reform_table()
 
+    @property
+    def selected_filenames(self) -> list[str]:
+        """The names of the selected rows at this moment, the later clicks do not change the list"""
+        return [*self.selected_names()]
+
+    def selected_names(self) -> Iterator[str]:
+        """Yields the names of the selected rows, reading the live selection (see selected_filenames)"""
+        return (row.name for row in self.selection.selected(self.rows))
+
+    def _filtered_indices(self) -> list[int] | None:
+        """Indices of the rows that pass the search, None if there is no search"""
+        return None if isinstance(self._showed_indices, range) else self._showed_indices
+
+    def _on_selection(self, _: RowSelection):
+        self.reselect()
+        self.select_all_button.icon = ('select-all', 'select')[self.selection.count > 0]
+
     def reselect(self):
-        need_select = self.selected_filenames.copy()
-        self.select_list.unselected_all()
-        for item in self.select_list.children:
-            name = self.get_filename_from_item(item)
-            if name in need_select:
-                item.do_selected_item()
+        self._reselecting = True
+        try:
+            self.select_list.unselected_all()
+            for i, item in zip(self._page_indices, reversed(self.select_list.children)):
+                if i in self.selection:
+                    item.do_selected_item()
+        finally:
+            self._reselecting = False
 
     @mainthread
     def select_all(self, button_instance: MDIconButton = None):
         self.all_selected = not self.all_selected
         if self.all_selected:
-            self.selected_filenames = [file.name for file in self.showed_rows]
+            self.selection.select_all(self._filtered_indices())
         else:
-            self.selected_filenames.clear()
-        self.reselect()
-        (button_instance or self.select_all_button).icon = ('select-all', 'select')[self.select_list.get_selected()]
+            self.selection.clear()
 
-    def on_select(self, item: selection.SelectionItem):
-        if (name := self.get_filename_from_item(item)) not in self.selected_filenames:
-            self.selected_filenames.append(name)
+    def invert_selection(self, _=None):
+        """Inverts the selection of the rows that pass the search"""
+        self.selection.invert(self._filtered_indices())
+
+    def select_by(self, predicate: Callable[[ArchiveContent], bool], value: bool = True):
+        """Selects (or unselects) all the rows for which [predicate] is true"""
+        self.selection.set_indices((i for i, row in enumerate(self.rows) if predicate(row)), value)
 
+    def _showed_position(self, item: selection.SelectionItem) -> int:
+        children = self.select_list.children
+        return self._page_start + len(children) - 1 - children.index(item)
+
+    def on_select(self, item: selection.SelectionItem):
         item.selected = True
+        if self._reselecting:
+            return
+        position = self._showed_position(item)
+        if self._anchor is not None and 'shift' in Window.modifiers:
+            start, stop = sorted((self._anchor, position))
+            if isinstance(self._showed_indices, range):
+                self.selection.set_range(self._showed_indices[start], self._showed_indices[stop] + 1)
+            else:
+                self.selection.set_indices(self._showed_indices[start:stop + 1])
+        else:
+            self.selection.set(self._showed_indices[position])
+        self._anchor = position
 
     def on_unselect(self, item: selection.SelectionItem):
-        if (name := self.get_filename_from_item(item)) in self.selected_filenames:
-            self.selected_filenames.remove(name)
         item.selected = False
+        if self._reselecting:
+            return
+        position = self._showed_position(item)
+        self.selection.set(self._showed_indices[position], False)
+        self._anchor = position
 
     def set_page_size_event(self, field: MDTextField):
         self.set_page_size(field.text)
@@ -1,19 +1,50 @@
 from __future__ import annotations
 
-from functools import cache
+import shutil
+import tempfile
+from collections import deque
+from functools import lru_cache
+from typing import TextIO
 
-from kivy.clock import mainthread
-from kivy.properties import ListProperty, NumericProperty
+from kivy.clock import Clock, mainthread
+from kivy.properties import NumericProperty
 from kivymd.uix.textfield import MDTextFieldRect
 
+FORM_CACHE_SIZE = 256
+
 
 class ArchiveLogView(MDTextFieldRect):
+    """
+    Log kept in a ring buffer of [capacity] entries, the older ones are moved to a temporary file for dump.
+    Only the window of entries that fits into the widget is rendered: the newest ones,
+    or older ones when the log is scrolled back with the mouse wheel (scrolled_back entries)
+    """
     readonly = True
-    save_last_count = NumericProperty(2)
-    _saves = ListProperty([])
+    capacity = NumericProperty(1000)
+    scrolled_back = NumericProperty(0)
+    _spill: TextIO | None = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._saves: deque[str] = deque(maxlen=int(self.capacity))
+        self._render_trigger = Clock.create_trigger(self._render)
+        self.bind(height=self._render_trigger, scrolled_back=self._render_trigger)
+
+    def on_capacity(self, _, capacity):
+        saves = getattr(self, '_saves', deque())
+        while len(saves) > capacity:
+            self._spill_entry(saves.popleft())
+        self._saves = deque(saves, maxlen=int(capacity))
+
+    def _spill_entry(self, text: str):
+        """Appends an entry that leaves the ring buffer to the temporary file"""
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile('w+', encoding='UTF-8')
+        self._spill.write(text)
+        self._spill.write('\n\n')
 
     @staticmethod
-    @cache
+    @lru_cache(maxsize=FORM_CACHE_SIZE)
     def _form_string(value):
         return f'\n'.join(f'{k}: {v}' for k, v in value)
 
@@ -23,13 +54,65 @@ class ArchiveLogView(MDTextFieldRect):
         return self._form_string((*value,))
 
     def set_log(self, values):
-        new_text = self.form_string(values)
-        if new_text in self._saves:
-            self._saves.remove(new_text)
-        self._saves.append(new_text)
-        if len(self._saves) > self.save_last_count:
-            self._saves.pop(0)
-        self.set_text_mainthread('\n\n'.join(self._saves).strip())
+        self.set_logs((values,))
+
+    def set_logs(self, values_list):
+        """Same as set_log for several headers, the text is rendered once"""
+        added = 0
+        for values in values_list:
+            new_text = self.form_string(values)
+            if not self._saves or self._saves[-1] != new_text:
+                if len(self._saves) == self._saves.maxlen:
+                    self._spill_entry(self._saves[0])
+                self._saves.append(new_text)
+                added += 1
+        if self.scrolled_back:  # the window stays on the entries being read
+            self.scrolled_back = min(self.scrolled_back + added, len(self._saves) - 1)
+        self._render_trigger()
+
+    @property
+    def visible_lines(self) -> int:
+        return max(1, int(self.height // max(self.line_height, 1)))
+
+    def visible_entries(self) -> list[str]:
+        """The window of entries that fits into the widget, ending scrolled_back entries before the newest one"""
+        end = len(self._saves) - int(self.scrolled_back)
+        lines_left = self.visible_lines
+        shown = []
+        for i in range(end - 1, -1, -1):
+            text = self._saves[i]
+            if shown and lines_left < text.count('\n') + 1:
+                break
+            shown.append(text)
+            lines_left -= text.count('\n') + 2
+        return shown[::-1]
+
+    def _render(self, _=None):
+        self.text = '\n\n'.join(self.visible_entries()).strip()
+
+    def scroll(self, entries: int):
+        """Scrolls the window [entries] back (to the older entries) or forward if negative"""
+        self.scrolled_back = min(max(self.scrolled_back + entries, 0), max(len(self._saves) - 1, 0))
+
+    def on_touch_down(self, touch):
+        if self.collide_point(*touch.pos) and touch.is_mouse_scrolling:
+            match touch.button:
+                case 'scrolldown':  # the wheel is turned up
+                    self.scroll(1)
+                case 'scrollup':
+                    self.scroll(-1)
+            return True
+        return super().on_touch_down(touch)
+
+    def dump(self, file: TextIO):
+        """Writes the whole log to [file]: the entries moved to the temporary file, then the ring buffer"""
+        if self._spill is not None:
+            self._spill.seek(0)
+            shutil.copyfileobj(self._spill, file)
+            self._spill.seek(0, 2)
+        for text in self._saves:
+            file.write(text)
+            file.write('\n\n')
 
     @mainthread
     def set_text_mainthread(self, text: str):
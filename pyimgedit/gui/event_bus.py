@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Callable, Hashable
+
+from kivy.clock import Clock
+
+DRAIN_RATE = 30.
+TAIL_SIZE = 64
+_MISSING = object()
+
+
+class EventBus:
+    """
+    Worker threads publish progress values and log items without locking,
+    the main thread drains them at a fixed frame rate: only the latest value of a topic
+    and a bounded tail of the appended items reach the subscribers
+    """
+    __slots__ = ('_latest', '_tails', '_latest_callbacks', '_tail_callbacks', '_event', 'tail_size')
+
+    def __init__(self, rate: float = DRAIN_RATE, tail_size: int = TAIL_SIZE):
+        self.tail_size = tail_size
+        self._latest: dict[Hashable, Any] = {}
+        self._tails: dict[Hashable, deque] = {}
+        self._latest_callbacks: dict[Hashable, Callable[[Any], None]] = {}
+        self._tail_callbacks: dict[Hashable, Callable[[list], None]] = {}
+        self._event = Clock.schedule_interval(self._drain, 1. / rate)
+
+    def subscribe_latest(self, topic: Hashable, callback: Callable[[Any], None]):
+        """[callback] gets the latest value published to [topic] since the previous frame"""
+        self._latest_callbacks[topic] = callback
+
+    def subscribe_tail(self, topic: Hashable, callback: Callable[[list], None], bounded: bool = True):
+        """
+        [callback] gets the items appended to [topic] since the previous frame:
+        at most tail_size last ones, or all of them if not [bounded] (nothing may be lost, e.g. the log)
+        """
+        self._tails.setdefault(topic, deque(maxlen=self.tail_size if bounded else None))
+        self._tail_callbacks[topic] = callback
+
+    def publish(self, topic: Hashable, value: Any):
+        """Replaces the value of [topic], can be called from any thread"""
+        self._latest[topic] = value
+
+    def append(self, topic: Hashable, item: Any):
+        """Appends [item] to the tail of [topic], can be called from any thread"""
+        self._tails[topic].append(item)
+
+    def _drain(self, _=None):
+        for topic, callback in self._latest_callbacks.items():
+            if (value := self._latest.pop(topic, _MISSING)) is not _MISSING:
+                callback(value)
+        for topic, callback in self._tail_callbacks.items():
+            tail = self._tails[topic]
+            items = []
+            try:
+                while True:
+                    items.append(tail.popleft())
+            except IndexError:
+                pass
+            if items:
+                callback(items)
+
+    def stop(self):
+        self._event.cancel()
+        self._drain()
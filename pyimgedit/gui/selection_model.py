@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from itertools import compress
+from typing import Iterable, Iterator, Sequence, TypeVar
+
+from kivy.clock import Clock
+from kivy.event import EventDispatcher
+
+T = TypeVar('T')
+_INVERT = bytes.maketrans(b'\0\1', b'\1\0')
+
+
+class RowSelection(EventDispatcher):
+    """
+    Selection of rows stored as one byte per row index.
+    All the changes made during one frame are reported by a single on_selection event
+    """
+    __events__ = ('on_selection',)
+
+    def __init__(self, size: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.bits = bytearray(size)
+        self._changed = Clock.create_trigger(lambda _: self.dispatch('on_selection'))
+
+    def on_selection(self):
+        pass
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    def __contains__(self, index: int) -> bool:
+        return 0 <= index < len(self.bits) and self.bits[index] == 1
+
+    @property
+    def count(self) -> int:
+        return self.bits.count(1)
+
+    def indices(self) -> Iterator[int]:
+        return compress(range(len(self.bits)), self.bits)
+
+    def selected(self, rows: Sequence[T]) -> Iterator[T]:
+        """Yields the selected [rows] without copying the selection"""
+        return compress(rows, self.bits)
+
+    def reset(self, size: int):
+        """Unselects everything and resizes the selection to [size] rows"""
+        self.bits = bytearray(size)
+        self._changed()
+
+    def extend(self, count: int):
+        """Adds [count] unselected rows at the end"""
+        self.bits.extend(bytes(count))
+
+    def set(self, index: int, value: bool = True):
+        if self.bits[index] != value:
+            self.bits[index] = value
+            self._changed()
+
+    def set_range(self, start: int, stop: int, value: bool = True):
+        """Selects (or unselects) the rows [start, stop)"""
+        start, stop = min(start, stop), max(start, stop)
+        self.bits[start:stop] = bytes((value,)) * (stop - start)
+        self._changed()
+
+    def set_indices(self, indices: Iterable[int], value: bool = True):
+        bits = self.bits
+        for i in indices:
+            bits[i] = value
+        self._changed()
+
+    def select_all(self, indices: Iterable[int] = None):
+        """Selects all the rows, or only [indices]"""
+        if indices is None:
+            self.bits = bytearray(b'\1') * len(self.bits)
+            self._changed()
+        else:
+            self.set_indices(indices)
+
+    def clear(self, indices: Iterable[int] = None):
+        """Unselects all the rows, or only [indices]"""
+        if indices is None:
+            self.reset(len(self.bits))
+        else:
+            self.set_indices(indices, False)
+
+    def invert(self, indices: Iterable[int] = None):
+        """Inverts the selection of all the rows, or only of [indices]"""
+        if indices is None:
+            self.bits = self.bits.translate(_INVERT)
+        else:
+            bits = self.bits
+            for i in indices:
+                bits[i] ^= 1
+        self._changed()
+
+    def permute(self, order: Sequence[int]):
+        """Reorders the selection as the rows were reordered: new row i is old row order[i]"""
+        self.bits = bytearray(map(self.bits.__getitem__, order))
+        self._changed()
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from kivy.clock import mainthread
+from kivy.graphics.texture import Texture
+from kivy.uix.image import Image
+
+from pyimgedit import ArchiveContent, IMGArchive
+from pyimgedit.textures import ThumbnailCache
+
+
+class TexturePreviewLoader:
+    """Makes the thumbnails of TXD files on a worker pool and shows them in Image widgets when they are ready"""
+    __slots__ = ('get_archive', 'thumbnails', '_pool', '_pending')
+
+    def __init__(self, get_archive: Callable[[], IMGArchive], thumbnails: ThumbnailCache = None,
+                 workers: int = None):
+        self.get_archive = get_archive
+        self.thumbnails = ThumbnailCache() if thumbnails is None else thumbnails
+        self._pool = ThreadPoolExecutor(workers or os.cpu_count(), thread_name_prefix='preview')
+        self._pending: list[Future] = []
+
+    def request(self, file: ArchiveContent, image: Image):
+        """Starts making the thumbnail of [file] for [image]"""
+        image.color = (1, 1, 1, 0)
+        future = self._pool.submit(self._thumbnail, self.get_archive(), file.name)
+        future.add_done_callback(lambda done: self._show(image, done))
+        self._pending.append(future)
+
+    def cancel(self):
+        """Cancels the thumbnails of the rows that are no longer shown"""
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def _thumbnail(self, archive: IMGArchive, name: str):
+        return self.thumbnails.get(archive.read(name))
+
+    @staticmethod
+    @mainthread
+    def _show(image: Image, future: Future):
+        if future.cancelled() or future.exception() is not None or (pixels := future.result()) is None:
+            return
+        height, width = pixels.shape[:2]
+        texture = Texture.create(size=(width, height), colorfmt='rgba')
+        texture.blit_buffer(pixels.tobytes(), colorfmt='rgba', bufferfmt='ubyte')
+        texture.flip_vertical()
+        image.texture = texture
+        image.color = (1, 1, 1, 1)
@@ -0,0 +1,429 @@
+from __future__ import annotations
+
+import os
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+from pyimgedit import ArchiveContent, BLOCK_SIZE, DirectoryChange
+from pyimgedit.fastcopy import COPY_BUFFER_SIZE, copy_range, write_all
+from pyimgedit.readplan import MAX_GAP, MAX_READ, plan_reads
+
+NAME_SIZE = 24
+V2_MAGIC = b'VER2'
+V2_HEADER = struct.Struct('<4sI')
+V1_ENTRY = struct.Struct(f'<II{NAME_SIZE}s')
+V2_ENTRY = struct.Struct(f'<IHH{NAME_SIZE}s')
+V2_MAX_BLOCKS = 0xFFFF
+
+
+def blocks_for(size: int) -> int:
+    """Returns the number of blocks needed to store [size] bytes"""
+    return -(-size // BLOCK_SIZE)
+
+
+def archive_paths(imgname: str | Path) -> tuple[Path, Path | None, int]:
+    """Returns the data file, the directory file (None for VER2 archives) and the archive version"""
+    path = Path(imgname)
+    if path.suffix.lower() == '.dir':
+        return path.with_suffix('.img'), path, 1
+    with open(path, 'rb') as img:
+        magic = img.read(len(V2_MAGIC))
+    if magic == V2_MAGIC:
+        return path, None, 2
+    if (dir_path := path.with_suffix('.dir')).is_file():
+        return path, dir_path, 1
+    raise ValueError(f'{path} is neither a VER2 archive nor has a .dir file next to it')
+
+
+def archive_signature(imgname: str | Path) -> tuple[int, int]:
+    """(mtime in ns, size) of the archive files, changes whenever the archive is changed"""
+    img_path, dir_path, _ = archive_paths(imgname)
+    stats = [os.stat(img_path)]
+    if dir_path is not None:
+        stats.append(os.stat(dir_path))
+    return max(s.st_mtime_ns for s in stats), sum(s.st_size for s in stats)
+
+
+def _decode_name(raw: bytes) -> str:
+    return raw.split(b'\0', 1)[0].decode('latin-1')
+
+
+def _encode_name(name: str) -> bytes:
+    raw = name.encode('latin-1')
+    if not raw or len(raw) >= NAME_SIZE or b'\0' in raw:
+        raise ValueError(f'Invalid entry name {name!r}: 1-{NAME_SIZE - 1} characters expected')
+    return raw
+
+
+def _iter_directory(img_file: BinaryIO, dir_path: Path | None, version: int) -> Iterator[ArchiveContent]:
+    if version == 2:
+        img_file.seek(0)
+        _, count = V2_HEADER.unpack(img_file.read(V2_HEADER.size))
+        raw = img_file.read(count * V2_ENTRY.size)
+        raw = raw[:len(raw) - len(raw) % V2_ENTRY.size]
+        records = ((offset, streaming or archived, name)
+                   for offset, streaming, archived, name in V2_ENTRY.iter_unpack(raw))
+    else:
+        raw = dir_path.read_bytes()
+        records = V1_ENTRY.iter_unpack(raw[:len(raw) - len(raw) % V1_ENTRY.size])
+    for offset, size, name in records:
+        yield ArchiveContent.from_blocks(offset, size, _decode_name(name))
+
+
+def iter_entries(imgname: str | Path) -> Iterator[ArchiveContent]:
+    """Yields the entries of archive [imgname] in the directory order, each one as soon as it is decoded"""
+    img_path, dir_path, version = archive_paths(imgname)
+    with open(img_path, 'rb') as img_file:
+        yield from _iter_directory(img_file, dir_path, version)
+
+
+def directory_bytes(version: int, count: int) -> int:
+    """Returns the size of the directory of [count] entries stored in the .img file (0 for version 1)"""
+    if version == 2:
+        return V2_HEADER.size + count * V2_ENTRY.size
+    return 0
+
+
+def pack_directory(version: int, entries: Iterable[ArchiveContent]) -> bytes:
+    """Returns the raw directory of [entries]: the VER2 header and entries, or the content of the .dir file"""
+    if version == 2:
+        entries = [*entries]
+        return V2_HEADER.pack(V2_MAGIC, len(entries)) + b''.join(
+            V2_ENTRY.pack(e.offset.blocks, e.size.blocks, 0, _encode_name(e.name)) for e in entries)
+    return b''.join(V1_ENTRY.pack(e.offset.blocks, e.size.blocks, _encode_name(e.name)) for e in entries)
+
+
+class IMGFile:
+    """Native reader/writer of GTA III / VC (.dir + .img) and SA (VER2) archives"""
+    copy_on_write = False  # never overwrite the data of the files in place (see snapshots.SnapshotWriter)
+
+    def __init__(self, imgname: str | Path, writable: bool = False):
+        self.img_path, self.dir_path, self.version = archive_paths(imgname)
+        self.writable = writable
+        self._entries: dict[str, ArchiveContent] = {}
+        self._dirty = False
+        self._buffer: bytearray | None = None
+        self.changes: list[DirectoryChange] = []
+        self._file = self._open_data()
+        try:
+            self._read_directory()
+        except BaseException:
+            self._file.close()
+            raise
+        self._directory_size = self._directory_bytes(len(self._entries))
+        self._data_start = min((e.offset.blocks for e in self._entries.values() if e.size.blocks), default=0)
+        self._end_block = max((e.offset.blocks + e.size.blocks for e in self._entries.values()),
+                              default=0)
+        self._end_block = max(self._end_block, blocks_for(self._directory_size))
+
+    def _open_data(self) -> BinaryIO:
+        return open(self.img_path, 'r+b' if self.writable else 'rb', buffering=0)
+
+    @property
+    def data_file(self) -> BinaryIO:
+        """The unbuffered .img file, to copy the entries by copy_range without reading them"""
+        return self._file
+
+    @property
+    def buffer(self) -> bytearray:
+        """Copy buffer reused by all the copy operations of this archive"""
+        if self._buffer is None:
+            self._buffer = bytearray(COPY_BUFFER_SIZE)
+        return self._buffer
+
+    def _read_directory(self):
+        for entry in _iter_directory(self._file, self.dir_path, self.version):
+            self._entries[entry.name.casefold()] = entry
+
+    def _directory_bytes(self, count: int) -> int:
+        return directory_bytes(self.version, count)
+
+    def __enter__(self) -> IMGFile:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[ArchiveContent]:
+        return iter(self._entries.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name.casefold() in self._entries
+
+    @property
+    def entries(self) -> list[ArchiveContent]:
+        return [*self._entries.values()]
+
+    def find(self, name: str) -> ArchiveContent:
+        """Returns the directory entry of file [name]"""
+        try:
+            return self._entries[name.casefold()]
+        except KeyError:
+            raise KeyError(name) from None
+
+    def _entry(self, entry: str | ArchiveContent) -> ArchiveContent:
+        return self.find(entry) if isinstance(entry, str) else entry
+
+    def read(self, entry: str | ArchiveContent) -> bytes:
+        """Returns the content of file [entry], padded to whole blocks"""
+        entry = self._entry(entry)
+        self._file.seek(entry.offset.bytes)
+        return self._file.read(entry.size.bytes)
+
+    def read_range(self, entry: str | ArchiveContent, start: int, size: int) -> bytes:
+        """Returns at most [size] bytes of file [entry] starting at [start], without reading the rest"""
+        entry = self._entry(entry)
+        size = min(size, entry.size.bytes - start)
+        if size <= 0:
+            return b''
+        self._file.seek(entry.offset.bytes + start)
+        return self._file.read(size)
+
+    def iter_chunks(self, entry: str | ArchiveContent, chunk_size: int = COPY_BUFFER_SIZE) -> Iterator[bytes]:
+        """Yields the content of file [entry] in chunks of at most [chunk_size] bytes"""
+        entry = self._entry(entry)
+        position, left = entry.offset.bytes, entry.size.bytes
+        while left > 0:
+            self._file.seek(position)
+            chunk = self._file.read(min(chunk_size, left))
+            if not chunk:
+                break
+            position += len(chunk)
+            left -= len(chunk)
+            yield chunk
+
+    def read_many(self, entries: Iterable[str | ArchiveContent], max_gap: int = MAX_GAP,
+                  max_read: int = MAX_READ) -> Iterator[tuple[ArchiveContent, memoryview]]:
+        """
+        Yields (entry, content) for every one of [entries] in the order of the archive,
+        reading adjacent or near-adjacent entries together (see readplan.plan_reads)
+        """
+        for span in plan_reads(map(self._entry, entries), max_gap, max_read):
+            buffer = bytearray(span.size)
+            self._file.seek(span.start)
+            view = memoryview(buffer)[:self._file.readinto(buffer)]
+            for entry in span.entries:
+                start = entry.offset.bytes - span.start
+                yield entry, view[start:start + entry.size.bytes]
+
+    def extract_many(self, entries: Iterable[str | ArchiveContent], directory: str | os.PathLike,
+                     max_gap: int = MAX_GAP, max_read: int = MAX_READ) -> Iterator[ArchiveContent]:
+        """Extracts [entries] into [directory] with coalesced reads, yields every extracted entry"""
+        for entry, content in self.read_many(entries, max_gap, max_read):
+            with open(os.path.join(directory, entry.name), 'wb', buffering=0) as out:
+                write_all(out, content)
+            yield entry
+
+    def _check_writable(self):
+        if not self.writable:
+            raise PermissionError(f'{self.img_path} is opened read-only')
+
+    def write(self, name: str, data: bytes | bytearray | memoryview) -> ArchiveContent:
+        """Adds or replaces file [name] with [data], overwritten in place when it fits into the old place of the file"""
+        data = memoryview(data).cast('B')
+        return self._write(name, (data,), data.nbytes, True)
+
+    def write_stream(self, name: str, chunks: Iterable[bytes], size: int = None) -> ArchiveContent:
+        """
+        Adds or replaces file [name] with the content of [chunks].
+        The content is written after the data of the archive and the directory points to it only once it is complete:
+        if [chunks] fail or give another [size], the old content of the file stays intact
+        """
+        return self._write(name, chunks, size, False)
+
+    def _write(self, name: str, chunks: Iterable[bytes], size: int | None, in_place: bool) -> ArchiveContent:
+        self._check_writable()
+        _encode_name(name)
+        if size is not None and self.version == 2 and blocks_for(size) > V2_MAX_BLOCKS:
+            raise ValueError(f'{name!r} is too big for a VER2 archive')
+        offset = self._allocate(name, size if in_place else None)
+        return self._commit(name, offset, self._write_at(offset * BLOCK_SIZE, chunks, size))
+
+    def write_file(self, name: str, source: str | os.PathLike | BinaryIO) -> ArchiveContent:
+        """Adds or replaces file [name] with the content of the loose file [source], copied by the kernel if possible"""
+        self._check_writable()
+        _encode_name(name)
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb', buffering=0) as source_file:
+                return self.write_file(name, source_file)
+        size = os.fstat(source.fileno()).st_size
+        if self.version == 2 and blocks_for(size) > V2_MAX_BLOCKS:
+            raise ValueError(f'{name!r} is too big for a VER2 archive')
+        offset = self._allocate(name, size)
+        written = copy_range(source, self._file, size, 0, offset * BLOCK_SIZE, self.buffer)
+        self._pad(offset * BLOCK_SIZE + written)
+        return self._commit(name, offset, written)
+
+    def extract(self, entry: str | ArchiveContent, destination: str | os.PathLike | BinaryIO) -> int:
+        """Copies file [entry] to the loose file [destination], by the kernel if possible"""
+        entry = self._entry(entry)
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, 'wb', buffering=0) as destination_file:
+                return self.extract(entry, destination_file)
+        return copy_range(self._file, destination, entry.size.bytes, entry.offset.bytes, 0, self.buffer)
+
+    def _allocate(self, name: str, size: int | None) -> int:
+        old = self._entries.get(name.casefold())
+        if not self.copy_on_write and size is not None and old is not None and blocks_for(size) <= old.size.blocks:
+            return old.offset.blocks
+        self._make_room(len(self._entries) + (old is None))
+        return self._end_block
+
+    def _commit(self, name: str, offset: int, size: int) -> ArchiveContent:
+        blocks = blocks_for(size)
+        if self.version == 2 and blocks > V2_MAX_BLOCKS:
+            raise ValueError(f'{name!r} is too big for a VER2 archive')
+        entry = ArchiveContent.from_blocks(offset, blocks, name)
+        self._set_entry(entry)
+        return entry
+
+    def _pad(self, position: int):
+        if tail := position % BLOCK_SIZE:
+            self._file.seek(position)
+            write_all(self._file, bytes(BLOCK_SIZE - tail))
+
+    def _write_at(self, position: int, chunks: Iterable[bytes], size: int = None) -> int:
+        self._file.seek(position)
+        written = 0
+        for chunk in chunks:
+            written += len(chunk)
+            if size is not None and written > size:
+                raise ValueError(f'More than the declared {size} bytes were given')
+            write_all(self._file, chunk)
+        if size is not None and written != size:
+            raise ValueError(f'{written} bytes were given instead of the declared {size}')
+        self._pad(position + written)
+        return written
+
+    def _set_entry(self, entry: ArchiveContent):
+        self.changes.append(DirectoryChange('update' if entry.name in self else 'add', entry))
+        self._entries[entry.name.casefold()] = entry
+        self._end_block = max(self._end_block, entry.offset.blocks + entry.size.blocks)
+        self._dirty = True
+
+    def _make_room(self, count: int):
+        """Moves the first files to the end of the archive until the directory for [count] entries fits"""
+        needed = blocks_for(self._directory_bytes(count))
+        if needed <= self._data_start:
+            return
+        for entry in sorted(self._entries.values(), key=lambda e: e.offset.blocks):
+            if not entry.size.blocks:
+                continue
+            if entry.offset.blocks >= needed:
+                self._data_start = entry.offset.blocks
+                break
+            self._move(entry, max(self._end_block, needed))
+        else:
+            self._data_start = max(self._end_block, needed)
+        self._end_block = max(self._end_block, needed)
+
+    def _move(self, entry: ArchiveContent, offset: int):
+        moved = ArchiveContent.from_blocks(offset, entry.size.blocks, entry.name)
+        copy_range(self._file, self._file, entry.size.bytes, entry.offset.bytes, moved.offset.bytes, self.buffer)
+        self._entries[entry.name.casefold()] = moved
+        self.changes.append(DirectoryChange('update', moved))
+        self._end_block = max(self._end_block, offset + entry.size.blocks)
+        self._dirty = True
+
+    def delete(self, name: str) -> ArchiveContent:
+        """Removes file [name] from the directory, its blocks are freed by rebuild"""
+        self._check_writable()
+        entry = self.find(name)
+        del self._entries[name.casefold()]
+        self.changes.append(DirectoryChange('remove', entry))
+        self._dirty = True
+        return entry
+
+    def rename(self, name: str, new_name: str) -> ArchiveContent:
+        """Renames file [name] to [new_name], keeping its place in the directory"""
+        self._check_writable()
+        _encode_name(new_name)
+        entry = self.find(name)
+        if new_name.casefold() != name.casefold() and new_name in self:
+            raise FileExistsError(new_name)
+        renamed = ArchiveContent.from_blocks(entry.offset.blocks, entry.size.blocks, new_name)
+        self._entries = {(renamed.name.casefold() if e is entry else k): (renamed if e is entry else e)
+                         for k, e in self._entries.items()}
+        self.changes.append(DirectoryChange('rename', renamed, entry.name))
+        self._dirty = True
+        return renamed
+
+    def _pack_directory(self) -> bytes:
+        return pack_directory(self.version, self._entries.values())
+
+    def _save_state(self) -> tuple:
+        """The directory as it is now, see _restore_state"""
+        return dict(self._entries), len(self.changes), self._dirty, self._data_start, self._directory_size
+
+    def _restore_state(self, state: tuple):
+        """
+        Drops the changes of the directory made after _save_state. Only for the writes after the data of the archive
+        (write_stream), the data written meanwhile stays unused until a rebuild
+        """
+        self._entries, changes, self._dirty, self._data_start, self._directory_size = state
+        del self.changes[changes:]
+
+    def flush(self):
+        """Writes the directory if it was changed"""
+        if not self._dirty:
+            return
+        raw = self._pack_directory()
+        if self.version == 2:
+            self._file.seek(0)
+            write_all(self._file, raw.ljust(self._directory_size, b'\0'))
+        else:  # replaced at once, the readers never see a half-written .dir
+            tmp_dir = self.dir_path.with_name(f'{self.dir_path.name}.tmp')
+            tmp_dir.write_bytes(raw)
+            os.replace(tmp_dir, self.dir_path)
+        self._directory_size = len(raw)
+        self._dirty = False
+
+    def rebuild(self) -> Iterator[tuple[str, str]]:
+        """
+        Compacts the archive into a new file without the free space and replaces the old one with it.
+        Yields the progress as (name, 'done/total')
+        """
+        self._check_writable()
+        entries = sorted(self._entries.values(), key=lambda e: e.offset.blocks)
+        total = len(entries)
+        position = blocks_for(self._directory_bytes(total))
+        rebuilt = {}
+        tmp_img = self.img_path.with_name(f'{self.img_path.name}.rebuild')
+        with open(tmp_img, 'w+b', buffering=0) as out:
+            for done, entry in enumerate(entries, 1):
+                copy_range(self._file, out, entry.size.bytes, entry.offset.bytes, position * BLOCK_SIZE, self.buffer)
+                rebuilt[entry.name.casefold()] = ArchiveContent.from_blocks(position, entry.size.blocks, entry.name)
+                position += entry.size.blocks
+                yield entry.name, f'{done}/{total}'
+            out.truncate(position * BLOCK_SIZE)
+            self._entries = {key: rebuilt[key] for key in self._entries}
+            raw = self._pack_directory()
+            if self.version == 2:
+                out.seek(0)
+                write_all(out, raw)
+        tmp_dir = None
+        if self.dir_path is not None:
+            tmp_dir = self.dir_path.with_name(f'{self.dir_path.name}.rebuild')
+            tmp_dir.write_bytes(raw)
+        self._file.close()
+        os.replace(tmp_img, self.img_path)
+        if tmp_dir is not None:
+            os.replace(tmp_dir, self.dir_path)
+        self._file = self._open_data()
+        self._directory_size = len(raw) if self.version == 2 else 0
+        self._data_start = blocks_for(self._directory_size)
+        self._end_block = position
+        self._dirty = False
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.writable:
+                self.flush()
+        finally:
+            self._file.close()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+from fsspec import AbstractFileSystem
+
+from pyimgedit import ArchiveContent, IMGArchive
+from pyimgedit.archive_path import ArchiveListing, EntryIO, open_entry
+
+
+class IMGFileSystem(AbstractFileSystem):
+    """
+    Read-only fsspec filesystem of the entries of an archive, read in place with ranged reads:
+    fsspec.filesystem('img', fo='gta3.img').open('infernus.dff')
+    """
+    protocol = 'img'
+    root_marker = ''
+
+    def __init__(self, fo: str | Path | IMGArchive = '', **kwargs):
+        super().__init__(**kwargs)
+        self.listing = ArchiveListing(fo)
+
+    @classmethod
+    def _strip_protocol(cls, path: str) -> str:
+        return super()._strip_protocol(path).lstrip('/')
+
+    def _info(self, entry: ArchiveContent) -> dict[str, Any]:
+        return {'name': entry.name, 'size': entry.size.bytes, 'type': 'file',
+                'offset': entry.offset.bytes, 'blocks': entry.size.blocks}
+
+    def info(self, path: str, **kwargs) -> dict[str, Any]:
+        if not (path := self._strip_protocol(path)):
+            return {'name': '', 'size': 0, 'type': 'directory'}
+        return self._info(self.listing.find(path))
+
+    def ls(self, path: str = '', detail: bool = True, **kwargs) -> list[dict[str, Any]] | list[str]:
+        if path := self._strip_protocol(path):
+            infos = [self.info(path)]
+        else:
+            infos = [self._info(entry) for entry in self.listing.entries.values()]
+        return infos if detail else [info['name'] for info in infos]
+
+    def exists(self, path: str, **kwargs) -> bool:
+        path = self._strip_protocol(path)
+        return not path or path.casefold() in self.listing.entries
+
+    def _open(self, path: str, mode: str = 'rb', block_size: int = None, autocommit: bool = True,
+              cache_options: dict = None, **kwargs):
+        if mode != 'rb':
+            raise PermissionError(f'{type(self).__name__} is read-only')
+        return open_entry(self.listing.img_path, self.listing.find(self._strip_protocol(path)),
+                          -1 if block_size is None else block_size)
+
+    def cat_file(self, path: str, start: int = None, end: int = None, **kwargs) -> bytes:
+        """Reads the bytes [start, end) of an entry (negative values count from its end)"""
+        with EntryIO(self.listing.img_path, self.listing.find(self._strip_protocol(path))) as f:
+            size = f.seek(0, 2)
+            start = 0 if start is None else start + size if start < 0 else start
+            end = size if end is None else end + size if end < 0 else min(end, size)
+            f.seek(start)
+            return f.read(max(0, end - start))
+
+    def ukey(self, path: str) -> str:
+        entry = self.listing.find(self._strip_protocol(path))
+        return f'{self.listing.archive.cache_identity}:{entry.offset.blocks}:{entry.size.blocks}'
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+from typing import BinaryIO, Callable, Hashable, Iterable, Iterator
+
+from pyimgedit import ArchiveContent, BLOCK_SIZE
+from pyimgedit.fastcopy import COPY_BUFFER_SIZE, copy_range, write_all
+from pyimgedit.imgfile import IMGFile, V2_MAX_BLOCKS, _encode_name, blocks_for, directory_bytes, pack_directory
+
+MAX_OPEN_SHARDS = 8
+
+
+def new_archive_paths(out_img: str | Path, version: int) -> tuple[Path, Path | None]:
+    """Returns the data file and the directory file (None for VER2) of a new archive [out_img]"""
+    if version not in (1, 2):
+        raise ValueError(f'Unknown archive version {version!r}: 1 (.dir + .img) or 2 (VER2) expected')
+    path = Path(out_img)
+    if version == 1:
+        return path.with_suffix('.img'), path.with_suffix('.dir')
+    return path.with_suffix('.img') if path.suffix.lower() == '.dir' else path, None
+
+
+class ArchiveWriter:
+    """
+    Writes a new archive whose layout is known beforehand:
+    the entries are placed one after another in the given order, the file is pre-sized
+    and the directory is written once, so the data can be written in any order
+    """
+    __slots__ = ('img_path', 'dir_path', 'version', 'entries', 'end_block', '_file', '_buffer')
+
+    def __init__(self, out_img: str | Path, version: int, files: Iterable[tuple[str, int]]):
+        self.img_path, self.dir_path = new_archive_paths(out_img, version)
+        self.version = version
+        self.entries: dict[str, ArchiveContent] = {}
+        self._buffer: bytearray | None = None
+        files = [*files]
+        position = blocks_for(directory_bytes(version, len(files)))
+        for name, size in files:
+            _encode_name(name)
+            if name.casefold() in self.entries:
+                raise ValueError(f'Duplicate entry name {name!r}')
+            if version == 2 and blocks_for(size) > V2_MAX_BLOCKS:
+                raise ValueError(f'{name!r} is too big for a VER2 archive')
+            self.entries[name.casefold()] = ArchiveContent.from_blocks(position, blocks_for(size), name)
+            position += blocks_for(size)
+        self.end_block = position
+        raw = pack_directory(version, self.entries.values())
+        self._file = open(self.img_path, 'w+b', buffering=0)
+        try:
+            self._file.truncate(position * BLOCK_SIZE)
+            if self.dir_path is None:
+                write_all(self._file, raw)
+            else:
+                with open(self.dir_path, 'wb') as dir_file:
+                    dir_file.write(raw)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __enter__(self) -> ArchiveWriter:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def buffer(self) -> bytearray:
+        if self._buffer is None:
+            self._buffer = bytearray(COPY_BUFFER_SIZE)
+        return self._buffer
+
+    def find(self, name: str) -> ArchiveContent:
+        return self.entries[name.casefold()]
+
+    def write(self, name: str, data: bytes | bytearray | memoryview):
+        """Writes [data] into the place of file [name]"""
+        entry = self.find(name)
+        data = memoryview(data).cast('B')
+        if data.nbytes > entry.size.bytes:
+            raise ValueError(f'{name!r} is bigger than its {entry.size.bytes} bytes')
+        self._file.seek(entry.offset.bytes)
+        write_all(self._file, data)
+
+    def copy(self, name: str, source: BinaryIO, source_offset: int = 0, size: int = None) -> int:
+        """Copies [size] bytes (the whole place of file [name] by default) from [source] at [source_offset]"""
+        entry = self.find(name)
+        size = entry.size.bytes if size is None else size
+        if size > entry.size.bytes:
+            raise ValueError(f'{name!r} is bigger than its {entry.size.bytes} bytes')
+        return copy_range(source, self._file, size, source_offset, entry.offset.bytes, self.buffer)
+
+    def close(self):
+        self._file.close()
+
+
+def _walk_files(directory: str | Path) -> Iterator[os.DirEntry]:
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
+
+def _source_files(src_dir: str | Path, workers: int = None) -> list[tuple[str, Path, int]]:
+    """
+    The files of the tree [src_dir] with their sizes, sorted by name. An archive has no folders:
+    the entries are named by the file names, two files with the same name (case-insensitive) are an error
+    """
+    paths: dict[str, Path] = {}
+    for entry in _walk_files(src_dir):
+        path = Path(entry.path)
+        if (other := paths.setdefault(entry.name.casefold(), path)) is not path:
+            first, second = sorted((other, path))
+            raise ValueError(f'{first} and {second} would both be the entry {entry.name!r}')
+    paths = sorted(paths.values(), key=lambda p: (p.name.casefold(), p.name))
+    with ThreadPoolExecutor(workers) as pool:
+        sizes = pool.map(os.path.getsize, paths)
+        return [(path.name, path, size) for path, size in zip(paths, sizes)]
+
+
+def pack(src_dir: str | Path, out_img: str | Path, version: int = 2, workers: int = None) -> list[ArchiveContent]:
+    """
+    Creates archive [out_img] from the loose files of the tree [src_dir] (flattened, sorted by name),
+    the same files always give the same bytes. Returns the directory of the new archive
+    """
+    files = _source_files(src_dir, workers)
+    with ArchiveWriter(out_img, version, ((name, size) for name, _, size in files)) as writer:
+        for name, path, size in files:
+            with open(path, 'rb', buffering=0) as source:
+                if writer.copy(name, source, 0, size) != size:
+                    raise OSError(f'{path} was changed while packing')
+        return [*writer.entries.values()]
+
+
+def convert(imgname: str | Path, version: int, out_img: str | Path = None) -> Path:
+    """
+    Converts archive [imgname] to [version] (1: .dir + .img, 2: VER2) into [out_img] or in place.
+    The entries keep their order and are copied in large chunks, only the directory is built anew.
+    Returns the .img file of the converted archive
+    """
+    with IMGFile(imgname) as img:
+        source_img, source_dir = img.img_path, img.dir_path
+        target_img, target_dir = new_archive_paths(source_img if out_img is None else out_img, version)
+        out_img = target_img
+        if os.path.abspath(target_img) == os.path.abspath(source_img):
+            if img.version == version:
+                return target_img
+            out_img = source_img.with_name(f'{source_img.stem}.convert.img')
+        entries = img.entries
+        with ArchiveWriter(out_img, version, ((e.name, e.size.bytes) for e in entries)) as writer:
+            for entry in entries:
+                writer.copy(entry.name, img.data_file, entry.offset.bytes)
+            written_img, written_dir = writer.img_path, writer.dir_path
+    if written_img != target_img:
+        os.replace(written_img, target_img)
+        if written_dir is not None:
+            os.replace(written_dir, target_dir)
+        elif source_dir is not None:
+            os.remove(source_dir)
+    return target_img
+
+
+def _extension_key(entry: ArchiveContent) -> str:
+    return os.path.splitext(entry.name)[1].casefold()
+
+
+def _prefix_key(entry: ArchiveContent) -> str:
+    return re.match(r'[^\W\d_]*', entry.name).group().casefold()
+
+
+SPLIT_KEYS: dict[str, Callable[[ArchiveContent], Hashable]] = {'extension': _extension_key, 'prefix': _prefix_key}
+
+
+def plan_shards(entries: Iterable[ArchiveContent], max_entries: int = None, max_bytes: int = None,
+                key: str | Callable[[ArchiveContent], Hashable] = None) -> list[list[ArchiveContent]]:
+    """
+    Distributes [entries] (in the order of the archive) into shards of at most [max_entries] entries
+    and [max_bytes] bytes. The entries with the same [key] go to the same shard unless the group is too big
+    """
+    key = SPLIT_KEYS[key] if isinstance(key, str) else key
+    groups: dict[Hashable, list[ArchiveContent]] = {}
+    for entry in sorted(entries, key=lambda e: e.offset.blocks):
+        groups.setdefault(None if key is None else key(entry), []).append(entry)
+    max_entries = max_entries or float('inf')
+    max_bytes = max_bytes or float('inf')
+    shards = [[]]
+    size = 0
+    for group in groups.values():
+        group_size = sum(e.size.bytes for e in group)
+        if shards[-1] and (len(shards[-1]) + len(group) > max_entries or size + group_size > max_bytes):
+            shards.append([])
+            size = 0
+        for entry in group:
+            if shards[-1] and (len(shards[-1]) >= max_entries or size + entry.size.bytes > max_bytes):
+                shards.append([])
+                size = 0
+            shards[-1].append(entry)
+            size += entry.size.bytes
+    return [shard for shard in shards if shard]
+
+
+def _write_shard(writer: ArchiveWriter, contents: Queue):
+    try:
+        with writer:
+            while (item := contents.get()) is not None:
+                writer.write(*item)
+    except BaseException:
+        while contents.get() is not None:  # don't block the reader
+            pass
+        raise
+
+
+def _write_shards(img: IMGFile, shards: list[list[ArchiveContent]], paths: list[Path], queue_size: int):
+    """Writes [shards] to [paths] at the same time, a thread per shard, reading their entries in one pass"""
+    writers = []
+    try:
+        for path, shard in zip(paths, shards):
+            writers.append(ArchiveWriter(path, img.version, ((e.name, e.size.bytes) for e in shard)))
+    except BaseException:
+        for writer in writers:
+            writer.close()
+        raise
+    queues = [Queue(queue_size) for _ in writers]
+    routes = {e.name.casefold(): contents for shard, contents in zip(shards, queues) for e in shard}
+    with ThreadPoolExecutor(len(writers)) as pool:
+        futures = [pool.submit(_write_shard, writer, contents) for writer, contents in zip(writers, queues)]
+        try:
+            for entry, content in img.read_many(entry for shard in shards for entry in shard):
+                routes[entry.name.casefold()].put((entry.name, content))
+        finally:
+            for contents in queues:
+                contents.put(None)
+        for future in futures:
+            future.result()
+
+
+def split(imgname: str | Path, max_entries: int = None, max_bytes: int = None,
+          key: str | Callable[[ArchiveContent], Hashable] = None, out_dir: str | Path = None,
+          queue_size: int = 16, max_open: int = MAX_OPEN_SHARDS) -> list[Path]:
+    """
+    Splits archive [imgname] into the shards planned by plan_shards, named <name>_<n>.img, in [out_dir].
+    At most [max_open] shards are written at a time, each by a thread of its own. Every entry is read once:
+    without [key] the shards are contiguous and the archive is read sequentially in one pass.
+    Returns the .img files of the shards
+    """
+    with IMGFile(imgname) as img:
+        shards = plan_shards(img, max_entries, max_bytes, key)
+        out_dir = img.img_path.parent if out_dir is None else Path(out_dir)
+        digits = len(str(len(shards)))
+        paths = [out_dir / f'{img.img_path.stem}_{i:0{digits}}.img' for i in range(1, len(shards) + 1)]
+        for start in range(0, len(shards), max_open):
+            _write_shards(img, shards[start:start + max_open], paths[start:start + max_open], queue_size)
+    return paths
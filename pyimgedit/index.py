@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import struct
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterator
+
+from pyimgedit import ArchiveContent, content_hash, user_cache_dir
+from pyimgedit.imgfile import IMGFile, archive_paths, archive_signature
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    archive_id INTEGER NOT NULL REFERENCES archives(id),
+    name TEXT NOT NULL,
+    name_folded TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_name_folded ON entries(name_folded);
+CREATE INDEX IF NOT EXISTS entries_archive ON entries(archive_id);
+CREATE INDEX IF NOT EXISTS entries_hash ON entries(hash);
+'''
+
+
+def default_database() -> Path:
+    return user_cache_dir() / 'index.sqlite'
+
+
+def find_archives(root: str | Path) -> Iterator[str]:
+    """Yields the .img files of all the III / VC / SA archives under [root]"""
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith('.img'):
+                path = os.path.join(directory, filename)
+                try:
+                    archive_paths(path)
+                except (OSError, ValueError):
+                    continue
+                yield path
+
+
+def scan_archive(img_path: str) -> tuple[str, tuple[int, int], int, list[tuple[str, int, int, str]]] | None:
+    """Reads the directory and hashes the contents of one archive (runs in the worker processes)"""
+    try:
+        signature = archive_signature(img_path)
+        with IMGFile(img_path) as img:
+            rows = [(entry.name, entry.offset.blocks, entry.size.blocks, content_hash(content))
+                    for entry, content in img.read_many(img)]
+            return img_path, signature, img.version, rows
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+class ArchiveIndex:
+    """SQLite index of the entries (name, archive, offset, size, content hash) of every archive of a game install"""
+
+    def __init__(self, database: str | Path = None):
+        self.database = Path(database) if database is not None else default_database()
+        self.database.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.database)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> ArchiveIndex:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def build(self, root: str | Path, workers: int = None) -> dict[str, int]:
+        """
+        Indexes all the archives under [root] in parallel processes,
+        only the ones that were added or changed since the previous build are scanned
+        """
+        root = os.path.realpath(root)
+        found = {os.path.realpath(path) for path in find_archives(root)}
+        known = {path: (mtime_ns, size)
+                 for path, mtime_ns, size in self.connection.execute('SELECT path, mtime_ns, size FROM archives')
+                 if path.startswith(os.path.join(root, ''))}
+        stale = [path for path in found if known.get(path) != archive_signature(path)]
+        removed = [path for path in known if path not in found]
+        with self.connection:
+            for path in removed:
+                self._remove(path)
+        failed = 0
+        if stale:
+            with ProcessPoolExecutor(workers) as pool:
+                for future in as_completed([pool.submit(scan_archive, path) for path in stale]):
+                    if (result := future.result()) is None:
+                        failed += 1
+                        continue
+                    with self.connection:
+                        self._store(*result)
+        return {'archives': len(found), 'scanned': len(stale) - failed, 'failed': failed,
+                'unchanged': len(found) - len(stale), 'removed': len(removed)}
+
+    def _remove(self, path: str):
+        self.connection.execute('DELETE FROM entries WHERE archive_id IN (SELECT id FROM archives WHERE path = ?)',
+                                (path,))
+        self.connection.execute('DELETE FROM archives WHERE path = ?', (path,))
+
+    def _store(self, path: str, signature: tuple[int, int], version: int, rows: list[tuple[str, int, int, str]]):
+        self._remove(path)
+        archive_id = self.connection.execute(
+            'INSERT INTO archives (path, mtime_ns, size, version) VALUES (?, ?, ?, ?)', (path, *signature, version)
+        ).lastrowid
+        self.connection.executemany(
+            'INSERT INTO entries (archive_id, name, name_folded, offset, size, hash) VALUES (?, ?, ?, ?, ?, ?)',
+            ((archive_id, name, name.casefold(), offset, size, digest) for name, offset, size, digest in rows)
+        )
+
+    def find(self, pattern: str, limit: int = None) -> list[tuple[str, ArchiveContent, str]]:
+        """
+        Returns (archive path, entry, content hash) of the entries whose name matches
+        the case-insensitive glob [pattern], e.g. 'vehicle*.txd'
+        """
+        rows = self.connection.execute(
+            'SELECT archives.path, entries.name, entries.offset, entries.size, entries.hash '
+            'FROM entries JOIN archives ON archives.id = entries.archive_id '
+            'WHERE entries.name_folded GLOB ? ORDER BY entries.name_folded, archives.path LIMIT ?',
+            (pattern.casefold(), -1 if limit is None else limit)
+        )
+        return [(path, ArchiveContent.from_blocks(offset, size, name), digest)
+                for path, name, offset, size, digest in rows]
+
+    def find_hash(self, digest: str) -> list[tuple[str, ArchiveContent]]:
+        """Returns (archive path, entry) of all the entries with the content hash [digest]"""
+        rows = self.connection.execute(
+            'SELECT archives.path, entries.name, entries.offset, entries.size '
+            'FROM entries JOIN archives ON archives.id = entries.archive_id WHERE entries.hash = ?', (digest,)
+        )
+        return [(path, ArchiveContent.from_blocks(offset, size, name)) for path, name, offset, size in rows]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from functools import partial
+from html.parser import HTMLParser
+from typing import Iterable, Iterator, TextIO
+
+from pyimgedit import ArchiveContent
+
+LISTING_READ_SIZE = 64 << 10
+
+
+class ListingParser(HTMLParser):
+    """
+    Incremental parser of the tables of the listing written by freimgedcs.exe (<img>.html).
+    Feed it the file in chunks, every completed <tr> is kept as (table number, cells) until rows() takes it
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.table = 0
+        self._in_cell = False
+        self._cell: list[str] = []
+        self._row: list[str] = []
+        self._rows: list[tuple[int, list[str]]] = []
+
+    def handle_starttag(self, tag: str, attrs: list):
+        if tag in ('td', 'th'):
+            self._in_cell = True
+
+    def handle_data(self, data: str):
+        if self._in_cell:
+            self._cell.append(data)  # the data of a cell may come in parts, split by the chunks
+
+    def handle_endtag(self, tag: str):
+        match tag:
+            case 'td' | 'th':
+                self._in_cell = False
+                self._row.append(''.join(self._cell).strip())
+                self._cell = []
+            case 'tr':
+                self._rows.append((self.table, self._row))
+                self._row = []
+            case 'table':
+                self.table += 1
+
+    def rows(self) -> list[tuple[int, list[str]]]:
+        """Takes the rows completed since the last call"""
+        rows, self._rows = self._rows, []
+        return rows
+
+
+def read_chunks(file: TextIO, size: int = LISTING_READ_SIZE) -> Iterator[str]:
+    return iter(partial(file.read, size), '')
+
+
+def iter_rows(chunks: Iterable[str]) -> Iterator[tuple[int, list[str]]]:
+    """Yields (table number, cells) of every row of the HTML [chunks] as soon as the row is complete"""
+    parser = ListingParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.rows()
+    parser.close()
+    yield from parser.rows()
+
+
+def parse_listing(chunks: Iterable[str]) -> Iterator[dict[str, str] | ArchiveContent]:
+    """
+    Yields the information about the archive (first table, as a dict) and then the files of the second table,
+    each one as soon as its row is parsed. Only the current row is kept in memory
+    """
+    info_rows = []
+    info = None
+    header_row = True
+    for table, row in iter_rows(chunks):
+        if not table:
+            info_rows.append(row)
+            continue
+        if info is None:
+            yield (info := dict(info_rows))
+        if table == 1:
+            if header_row:
+                header_row = False
+                continue
+            yield ArchiveContent(*row)
+    if info is None:
+        yield dict(info_rows)
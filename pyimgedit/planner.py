@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable
+
+from pyimgedit import ArchiveContent, BLOCK_SIZE, IMGArchive, OperationResult, bytes2units
+from pyimgedit.imgfile import V1_ENTRY, directory_bytes
+from pyimgedit.readplan import plan_reads
+
+
+class Operation:
+    """One operation given to the planner, in the terms of IMGArchive: add, delete, rename, extract or rebuild"""
+    __slots__ = ('kind', 'name', 'target')
+    KINDS = ('add', 'delete', 'rename', 'extract', 'rebuild')
+
+    def __init__(self, kind: str, name: str = '', target: str = ''):
+        if kind not in self.KINDS:
+            raise ValueError(f'Unknown operation {kind!r}, one of {", ".join(self.KINDS)} expected')
+        self.kind = kind
+        self.name = name
+        self.target = target
+
+    @classmethod
+    def add(cls, filename: str | Path, name: str = None) -> Operation:
+        return cls('add', name or Path(filename).name, str(filename))
+
+    @classmethod
+    def delete(cls, name: str) -> Operation:
+        return cls('delete', name)
+
+    @classmethod
+    def rename(cls, name: str, new_name: str) -> Operation:
+        return cls('rename', name, new_name)
+
+    @classmethod
+    def extract(cls, name: str, filename: str | Path) -> Operation:
+        return cls('extract', name, str(filename))
+
+    @classmethod
+    def rebuild(cls) -> Operation:
+        return cls('rebuild')
+
+    def __repr__(self) -> str:
+        return f'<{self.kind} {self.name!r} {self.target!r}>'
+
+
+class Step:
+    """One step of a plan with its estimated cost"""
+    __slots__ = ('kind', 'name', 'target', 'read', 'written', 'seeks')
+
+    def __init__(self, kind: str, name: str = '', target: str = '', read: int = 0, written: int = 0, seeks: int = 0):
+        self.kind = kind
+        self.name = name
+        self.target = target
+        self.read = read
+        self.written = written
+        self.seeks = seeks
+
+    def __str__(self) -> str:
+        what = f'{self.name} -> {self.target}' if self.target else self.name
+        return (f'{self.kind:<9} {what:<48} '
+                f'read {bytes2units(self.read)}, write {bytes2units(self.written)}, {self.seeks} seeks')
+
+    def __repr__(self) -> str:
+        return f'<Step {self}>'
+
+
+def _file_size(filename: str) -> int:
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+class Plan:
+    """
+    Operations on one archive reordered and fused: extracts first (from the original entries, with merged reads),
+    then the deletes, the renames (chains are merged, cycles go through a temporary name), the adds
+    (a delete followed by an add of the same name becomes a replace, in place when it fits),
+    the directory is written once, and at most one rebuild is made at the end
+    """
+
+    def __init__(self, archive: IMGArchive, operations: Iterable[Operation]):
+        self.archive = archive
+        self.operations = [*operations]
+        with archive.open() as img:
+            self.version = img.version
+            self.entries = {e.name.casefold(): e for e in img}
+        self.steps: list[Step] = []
+        self._extracts: list[tuple[ArchiveContent, str]] = []
+        self._plan()
+
+    def _simulate(self) -> tuple[dict[str, tuple[str, ArchiveContent | str]], bool]:
+        """Final directory: name key -> (name, original entry or the file to add), and if a rebuild was asked"""
+        state = {key: (entry.name, entry) for key, entry in self.entries.items()}
+        rebuild = False
+        for op in self.operations:
+            key = op.name.casefold()
+            match op.kind:
+                case 'add':
+                    state[key] = (op.name, op.target)
+                case 'delete':
+                    if state.pop(key, None) is None:
+                        raise KeyError(op.name)
+                case 'rename':
+                    if key not in state:
+                        raise KeyError(op.name)
+                    if op.target.casefold() != key and op.target.casefold() in state:
+                        raise FileExistsError(op.target)
+                    state[op.target.casefold()] = (op.target, state.pop(key)[1])
+                case 'extract':
+                    if key not in state:
+                        raise KeyError(op.name)
+                    source = state[key][1]
+                    if isinstance(source, ArchiveContent):
+                        self._extracts.append((source, op.target))
+                    else:
+                        self.steps.append(Step('copy', source, op.target, _file_size(source), _file_size(source), 1))
+                case 'rebuild':
+                    rebuild = True
+        return state, rebuild
+
+    def _plan(self):
+        state, rebuild = self._simulate()
+        copies, self.steps = self.steps, []
+        if self._extracts:
+            spans = plan_reads(entry for entry, _ in self._extracts)
+            for entry, filename in sorted(self._extracts, key=lambda item: item[0].offset.blocks):
+                self.steps.append(Step('extract', entry.name, filename, entry.size.bytes, entry.size.bytes))
+            self.steps[-len(self._extracts)].seeks = len(spans)
+        self.steps.extend(copies)
+
+        kept = {source.name.casefold(): name for name, source in state.values() if isinstance(source, ArchiveContent)}
+        added = {key: (name, source) for key, (name, source) in state.items() if isinstance(source, str)}
+        for key, entry in self.entries.items():
+            if key not in kept and key not in added:
+                self.steps.append(Step('delete', entry.name))
+
+        renames = {key: name for key, name in kept.items() if self.entries[key].name != name}
+        names = {key: self.entries[key].name for key in renames}
+        taken = self.entries.keys() | state.keys()
+        temporary = 0
+        while renames:
+            ready = [key for key, name in renames.items() if name.casefold() == key or name.casefold() not in renames]
+            if not ready:  # a cycle, one of the entries goes through a temporary name
+                key, name = next(iter(renames.items()))
+                while (tmp := f'~rename{temporary}.tmp').casefold() in taken:
+                    temporary += 1
+                taken |= {tmp.casefold()}
+                self.steps.append(Step('rename', names[key], tmp))
+                del renames[key]
+                renames[tmp.casefold()], names[tmp.casefold()] = name, tmp
+                continue
+            for key in ready:
+                self.steps.append(Step('rename', names[key], renames.pop(key)))
+
+        for key, (name, filename) in added.items():
+            size = _file_size(filename)
+            self.steps.append(Step('replace' if key in self.entries and key not in kept else 'add', name, filename,
+                                   size, size, 1))
+        if any(step.kind != 'extract' and step.kind != 'copy' for step in self.steps):
+            self.steps.append(Step('directory', written=self._directory_size(len(state)), seeks=1))
+        if rebuild:
+            size = (sum(self.entries[key].size.bytes for key in kept) +
+                    sum(step.read for step in self.steps if step.kind in ('add', 'replace')))
+            self.steps.append(Step('rebuild', read=size, written=size, seeks=len(state)))
+
+    def _directory_size(self, count: int) -> int:
+        return directory_bytes(self.version, count) or count * V1_ENTRY.size
+
+    def naive_cost(self) -> tuple[int, int, int]:
+        """(read, written, seeks) of running the operations one by one, as they were given"""
+        read = written = seeks = 0
+        count = len(self.entries)
+        data = sum(e.size.bytes for e in self.entries.values())
+        sizes = {key: e.size.bytes for key, e in self.entries.items()}
+        for op in self.operations:
+            key = op.name.casefold()
+            if op.kind == 'extract':
+                size = sizes.get(key, 0)
+                read, written, seeks = read + size, written + size, seeks + 1
+                continue
+            if op.kind == 'rebuild':
+                read, written, seeks = read + data, written + data, seeks + count
+                continue
+            if op.kind == 'add':
+                size = _file_size(op.target)
+                count += key not in sizes
+                data += size
+                sizes[key] = size
+                read, written, seeks = read + size, written + size, seeks + 1
+            elif op.kind == 'delete':
+                data -= sizes.pop(key, 0)
+                count -= 1
+            elif op.kind == 'rename':
+                sizes[op.target.casefold()] = sizes.pop(key, 0)
+            written, seeks = written + self._directory_size(count), seeks + 1
+        return read, written, seeks
+
+    def cost(self) -> tuple[int, int, int]:
+        """Estimated (read, written, seeks) of the plan"""
+        return (sum(s.read for s in self.steps), sum(s.written for s in self.steps), sum(s.seeks for s in self.steps))
+
+    def explain(self) -> str:
+        """Dry run: the steps with their estimated costs, compared to running the operations as given"""
+        read, written, seeks = self.cost()
+        naive_read, naive_written, naive_seeks = self.naive_cost()
+        return '\n'.join((
+            f'Plan for {self.archive.imgname}: {len(self.operations)} operations -> {len(self.steps)} steps',
+            *(f'  {step}' for step in self.steps),
+            f'Estimated: read {bytes2units(read)}, write {bytes2units(written)}, {seeks} seeks '
+            f'(as given: read {bytes2units(naive_read)}, write {bytes2units(naive_written)}, {naive_seeks} seeks)'
+        ))
+
+    def execute(self) -> OperationResult:
+        """Runs the plan in one session of the archive, returns the header with all the directory changes"""
+        header = {'Operation': 'Plan', 'Operations': str(len(self.operations)), 'Steps': str(len(self.steps))}
+        with self.archive._changing(), self.archive.open(True) as img:
+            destinations: dict[str, list[str]] = {}
+            for entry, filename in self._extracts:
+                destinations.setdefault(entry.name.casefold(), []).append(filename)
+            for entry, content in img.read_many(entry for entry, _ in self._extracts):
+                for filename in destinations.pop(entry.name.casefold(), ()):
+                    with open(filename, 'wb') as out:
+                        out.write(content)
+            for step in self.steps:
+                match step.kind:
+                    case 'copy':  # extract of a file added by the operations: padded as if it came from the archive
+                        shutil.copyfile(step.name, step.target)
+                        with open(step.target, 'ab') as out:
+                            out.write(bytes(-out.tell() % BLOCK_SIZE))
+                    case 'delete':
+                        img.delete(step.name)
+                    case 'rename':
+                        img.rename(step.name, step.target)
+                    case 'add' | 'replace':
+                        img.write_file(step.name, step.target)
+                    case 'rebuild':
+                        img.flush()
+                        for _ in img.rebuild():
+                            pass
+            changes = img.changes
+        return OperationResult(header, changes)
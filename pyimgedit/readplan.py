@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from pyimgedit import ArchiveContent
+
+MAX_GAP = 64 << 10
+MAX_READ = 8 << 20
+
+
+class ReadSpan:
+    """One sequential read of the archive that covers several entries"""
+    __slots__ = ('start', 'end', 'entries')
+
+    def __init__(self, entry: ArchiveContent):
+        self.start = entry.offset.bytes
+        self.end = self.start + entry.size.bytes
+        self.entries = [entry]
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f'<ReadSpan {self.start}:{self.end} ({len(self.entries)} entries)>'
+
+
+def plan_reads(entries: Iterable[ArchiveContent], max_gap: int = MAX_GAP, max_read: int = MAX_READ) -> list[ReadSpan]:
+    """
+    Sorts [entries] by offset and merges the ones that are at most [max_gap] bytes apart
+    into reads of at most [max_read] bytes. A bigger entry gets a read of its own
+    """
+    spans = []
+    span = None
+    for entry in sorted(entries, key=lambda e: e.offset.blocks):
+        start = entry.offset.bytes
+        end = start + entry.size.bytes
+        if span is not None and start - span.end <= max_gap and max(end, span.end) - span.start <= max_read:
+            span.end = max(end, span.end)
+            span.entries.append(entry)
+            continue
+        spans.append(span := ReadSpan(entry))
+    return spans
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import struct
+from threading import Lock
+from typing import Callable, Iterable
+
+from pyimgedit import ArchiveContent
+
+CHUNK_HEADER = struct.Struct('<III')
+STRUCT = 0x01
+STRING = 0x02
+EXTENSION = 0x03
+TEXTURE = 0x06
+MATERIAL = 0x07
+MATERIAL_LIST = 0x08
+FRAME_LIST = 0x0E
+GEOMETRY = 0x0F
+CLUMP = 0x10
+ATOMIC = 0x14
+TEXTURE_NATIVE = 0x15
+TEXTURE_DICTIONARY = 0x16
+GEOMETRY_LIST = 0x1A
+CHUNK_NAMES = {
+    STRUCT: 'Struct', STRING: 'String', EXTENSION: 'Extension', TEXTURE: 'Texture', MATERIAL: 'Material',
+    MATERIAL_LIST: 'Material List', FRAME_LIST: 'Frame List', GEOMETRY: 'Geometry', CLUMP: 'Clump',
+    ATOMIC: 'Atomic', TEXTURE_NATIVE: 'Texture Native', TEXTURE_DICTIONARY: 'Texture Dictionary',
+    GEOMETRY_LIST: 'Geometry List',
+}
+TEXTURE_NAME_OFFSET = 8
+TEXTURE_NAME_SIZE = 32
+PREFIX_SIZE = 4096
+_MAX_SIBLINGS = 16
+
+
+def unpack_version(library_stamp: int) -> int:
+    """Returns the RenderWare version (0x36003 for 3.6.0.3) stored in the library stamp of a chunk header"""
+    if library_stamp & 0xFFFF0000:
+        return ((library_stamp >> 14 & 0x3FF00) + 0x30000) | (library_stamp >> 16 & 0x3F)
+    return library_stamp << 8
+
+
+def version_game(version: int) -> str | None:
+    """Returns the game (III, VC or SA) that uses RenderWare [version]"""
+    if not 0x30000 <= version < 0x40000:
+        return None
+    if version < 0x33000:
+        return 'III'
+    if version < 0x35000:
+        return 'VC'
+    return 'SA'
+
+
+class RWInfo:
+    """RenderWare metadata of one entry, read from the chunk headers only"""
+    __slots__ = ('chunk_type', 'version', 'texture_count', 'texture_names', 'geometry_count', 'atomic_count')
+
+    def __init__(self, chunk_type: int, version: int):
+        self.chunk_type = chunk_type
+        self.version = version
+        self.texture_count = 0
+        self.texture_names: tuple[str, ...] = ()
+        self.geometry_count = 0
+        self.atomic_count = 0
+
+    @property
+    def type_name(self) -> str:
+        return CHUNK_NAMES.get(self.chunk_type, hex(self.chunk_type))
+
+    @property
+    def game(self) -> str | None:
+        return version_game(self.version)
+
+    @property
+    def version_string(self) -> str:
+        return '.'.join(str(i) for i in (self.version >> 16, self.version >> 12 & 0xF,
+                                         self.version >> 8 & 0xF, self.version & 0xFF))
+
+    def __repr__(self) -> str:
+        return f'<{self.type_name} RW {self.version_string} ({self.game})>'
+
+
+class _RangeReader:
+    __slots__ = ('prefix', 'read_range', 'size')
+
+    def __init__(self, prefix: bytes, read_range: Callable[[int, int], bytes], size: int):
+        self.prefix = prefix
+        self.read_range = read_range
+        self.size = size
+
+    def read(self, offset: int, size: int) -> bytes:
+        if offset + size <= len(self.prefix):
+            return self.prefix[offset:offset + size]
+        return self.read_range(offset, size)
+
+    def header(self, offset: int) -> tuple[int, int, int] | None:
+        if offset + CHUNK_HEADER.size > self.size:
+            return None
+        raw = self.read(offset, CHUNK_HEADER.size)
+        if len(raw) < CHUNK_HEADER.size:
+            return None
+        return CHUNK_HEADER.unpack(raw)
+
+    def uint(self, offset: int, fmt: str = '<I') -> int:
+        raw = self.read(offset, struct.calcsize(fmt))
+        return struct.unpack(fmt, raw)[0] if len(raw) == struct.calcsize(fmt) else 0
+
+
+def parse_chunks(prefix: bytes, read_range: Callable[[int, int], bytes], size: int) -> RWInfo | None:
+    """
+    Reads the metadata of a TXD or DFF of [size] bytes from its chunk headers.
+    [prefix] is the beginning of the entry, [read_range](offset, size) reads the headers beyond it.
+    Returns None if it is not a RenderWare file
+    """
+    reader = _RangeReader(prefix, read_range, size)
+    if (header := reader.header(0)) is None or header[0] not in (TEXTURE_DICTIONARY, CLUMP):
+        return None
+    chunk_type, _, stamp = header
+    info = RWInfo(chunk_type, unpack_version(stamp))
+    if (child := reader.header(CHUNK_HEADER.size)) is None or child[0] != STRUCT:
+        return info
+    position = 2 * CHUNK_HEADER.size
+    if chunk_type == TEXTURE_DICTIONARY:
+        info.texture_count = reader.uint(position, '<H')
+        position += child[1]
+        names = []
+        for _ in range(info.texture_count):
+            if (texture := reader.header(position)) is None or texture[0] != TEXTURE_NATIVE:
+                break
+            raw = reader.read(position + 2 * CHUNK_HEADER.size + TEXTURE_NAME_OFFSET, TEXTURE_NAME_SIZE)
+            names.append(raw.split(b'\0', 1)[0].decode('latin-1'))
+            position += CHUNK_HEADER.size + texture[1]
+        info.texture_names = (*names,)
+        return info
+    info.atomic_count = reader.uint(position, '<i')
+    position += child[1]
+    for _ in range(_MAX_SIBLINGS):
+        if (sibling := reader.header(position)) is None:
+            break
+        if sibling[0] == GEOMETRY_LIST:
+            info.geometry_count = reader.uint(position + 2 * CHUNK_HEADER.size)
+            break
+        position += CHUNK_HEADER.size + sibling[1]
+    return info
+
+
+class RWIndex:
+    """Lazily built cache of the RenderWare metadata of the entries of an IMGArchive"""
+
+    def __init__(self, archive, prefix_size: int = PREFIX_SIZE):
+        self.archive = archive
+        self.prefix_size = prefix_size
+        self._infos: dict[tuple[str, int, int], RWInfo | None] = {}
+        self._reader = None
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(entry: ArchiveContent) -> tuple[str, int, int]:
+        return entry.name.casefold(), entry.offset.blocks, entry.size.blocks
+
+    def _get_reader(self):
+        if self._reader is None:
+            self._reader = self.archive.open()
+        return self._reader
+
+    def _release_reader(self):
+        """Snapshots are not kept between the calls, they would keep the old blocks of the archive"""
+        if self._reader is not None and self.archive._snapshots is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _info(self, entry: ArchiveContent) -> RWInfo | None:
+        key = self._key(entry)
+        try:
+            return self._infos[key]
+        except KeyError:
+            pass
+        reader = self._get_reader()
+        prefix = reader.read_range(entry, 0, self.prefix_size)
+        info = self._infos[key] = parse_chunks(prefix, lambda start, size: reader.read_range(entry, start, size),
+                                               entry.size.bytes)
+        return info
+
+    def get(self, name: str) -> RWInfo | None:
+        """Returns the metadata of file [name], None if it is not a TXD or DFF"""
+        with self._lock:
+            try:
+                return self._info(self._get_reader().find(name))
+            finally:
+                self._release_reader()
+
+    def items(self) -> list[tuple[ArchiveContent, RWInfo]]:
+        """Returns (entry, metadata) of all the TXD and DFF files, reading the archive in offset order"""
+        with self._lock:
+            try:
+                entries = self._get_reader().entries
+                for entry in sorted(entries, key=lambda e: e.offset.blocks):
+                    self._info(entry)
+            finally:
+                self._release_reader()
+            return [(entry, info) for entry in entries if (info := self._infos[self._key(entry)]) is not None]
+
+    def filter(self, predicate: Callable[[ArchiveContent, RWInfo], bool]) -> list[tuple[ArchiveContent, RWInfo]]:
+        """
+        Returns (entry, metadata) of the files for which [predicate] is true, e.g. SA TXDs with more than 8 textures:
+        index.filter(lambda entry, info: info.game == 'SA' and info.texture_count > 8)
+        """
+        return [(entry, info) for entry, info in self.items() if predicate(entry, info)]
+
+    def invalidate(self, names: Iterable[str] = None):
+        """Closes the directory that became outdated and forgets the metadata of [names] (all if None)"""
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+            if names is None:
+                self._infos.clear()
+                return
+            names = {name.casefold() for name in names}
+            for key in [*self._infos]:
+                if key[0] in names:
+                    del self._infos[key]
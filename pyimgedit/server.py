@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock
+from urllib.parse import unquote, urlsplit
+
+from pyimgedit import ArchiveContent, IMGArchive, __version__, content_hash
+from pyimgedit.fastcopy import COPY_BUFFER_SIZE
+from pyimgedit.snapshots import Snapshot
+
+RANGE_TEMPLATE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+class EntryServer(ThreadingHTTPServer):
+    """
+    HTTP server of the entries of one III / VC / SA archive: GET /<name> (with Range, ETag / If-None-Match)
+    and GET / for the JSON listing. Every request reads a snapshot of the archive (IMGArchive.snapshot),
+    so the writes made meanwhile (also a rebuild) do not change a response that is being sent
+    """
+    daemon_threads = True
+
+    def __init__(self, archive: str | Path | IMGArchive, address: tuple[str, int] = ('127.0.0.1', 8000)):
+        self.archive = archive if isinstance(archive, IMGArchive) else IMGArchive(archive)
+        try:  # only the archives read natively have snapshots
+            self.snapshot().close()
+        except (OSError, ValueError) as e:
+            raise ValueError(f'{self.archive.imgname} is not a III / VC / SA archive, '
+                             f'it can only be handled by freimgedcs.exe') from e
+        super().__init__(address, EntryRequestHandler)
+        self._hashes: dict[tuple[int, int, int], str] = {}
+        self._hashes_generation = None
+        self._hashes_lock = Lock()
+
+    def snapshot(self) -> Snapshot:
+        """The committed version of the archive, release it when the response is sent"""
+        return self.archive.snapshot()
+
+    def etag(self, snapshot: Snapshot, entry: ArchiveContent) -> str:
+        """ETag from the place and the content hash of [entry], the hash is computed once per archive version"""
+        key = (entry.offset.blocks, entry.size.blocks, hash(entry.name.casefold()))
+        with self._hashes_lock:
+            if snapshot.generation != self._hashes_generation:
+                self._hashes.clear()
+                self._hashes_generation = snapshot.generation
+            digest = self._hashes.get(key)
+        if digest is None:
+            digest = content_hash(snapshot.read(entry))
+            with self._hashes_lock:
+                if snapshot.generation == self._hashes_generation:
+                    self._hashes[key] = digest
+        return f'"{entry.offset.blocks:x}-{entry.size.blocks:x}-{digest}"'
+
+
+class EntryRequestHandler(BaseHTTPRequestHandler):
+    server: EntryServer
+    server_version = f'UniversalIMG/{".".join(str(i) for i in __version__)}'
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head: bool = False):
+        path = unquote(urlsplit(self.path).path).lstrip('/')
+        with self.server.snapshot() as snapshot:
+            if path in ('', 'index.json'):
+                return self._send_listing(snapshot, head)
+            try:
+                entry = snapshot.find(path)
+            except KeyError:
+                return self.send_error(HTTPStatus.NOT_FOUND, f'No {path!r} in the archive')
+            self._send_entry(snapshot, entry, head)
+
+    def _send_listing(self, snapshot: Snapshot, head: bool):
+        body = json.dumps([{'name': e.name, 'offset': e.offset.bytes, 'size': e.size.bytes}
+                           for e in snapshot]).encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _range(self, size: int) -> tuple[int, int] | None:
+        """[start, end) of the Range header, None for the whole entry. Raises ValueError if not satisfiable"""
+        if (header := self.headers.get('Range')) is None or self.headers.get('If-Range', self._etag) != self._etag:
+            return None
+        if not (match := RANGE_TEMPLATE.fullmatch(header.strip())):
+            return None  # several ranges or another unit: the whole entry is sent
+        first, last = match.groups()
+        if not first:
+            if not last:
+                return None
+            start, end = max(0, size - int(last)), size
+        else:
+            start, end = int(first), size if not last else min(int(last) + 1, size)
+        if start >= size or start >= end:
+            raise ValueError(header)
+        return start, end
+
+    def _send_entry(self, snapshot: Snapshot, entry: ArchiveContent, head: bool):
+        size = entry.size.bytes
+        self._etag = self.server.etag(snapshot, entry)
+        if self._etag in (tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', self._etag)
+            return self.end_headers()
+        try:
+            requested = self._range(size)
+        except ValueError:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            return self.end_headers()
+        start, end = requested or (0, size)
+        self.send_response(HTTPStatus.OK if requested is None else HTTPStatus.PARTIAL_CONTENT)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', self._etag)
+        if requested is not None:
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{size}')
+        self.end_headers()
+        if head:
+            return
+        position = start  # positional reads of the snapshot, the file is shared by the threads of the requests
+        while position < end and (chunk := snapshot.read_range(entry, position, min(COPY_BUFFER_SIZE, end - position))):
+            self.wfile.write(chunk)
+            position += len(chunk)
+
+
+def serve(archive: str | Path | IMGArchive, host: str = '127.0.0.1', port: int = 8000):
+    with EntryServer(archive, (host, port)) as server:
+        print(f'Serving {server.archive.imgname} on http://{host}:{server.server_address[1]}/')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
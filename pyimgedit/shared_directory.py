@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import struct
+import sys
+from bisect import bisect_left
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from pyimgedit import ArchiveContent, IMGArchive
+from pyimgedit.imgfile import V1_ENTRY, _decode_name, _encode_name
+
+MAGIC = b'IMGD'
+HEADER = struct.Struct('<4sII')
+INDEX = struct.Struct('=I')  # memoryview.cast('I') reads it in place
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    return shared_memory.SharedMemory(name)  # the workers share the resource tracker of the owner
+
+
+class SharedDirectoryHandle:
+    """Picklable reference to a SharedDirectory, pass it to the worker processes and attach() there"""
+    __slots__ = ('name', 'img_path', 'count')
+
+    def __init__(self, name: str, img_path: str, count: int):
+        self.name = name
+        self.img_path = img_path
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f'<SharedDirectoryHandle {self.name} {self.img_path!r} ({self.count} entries)>'
+
+    def attach(self) -> SharedDirectoryView:
+        return SharedDirectoryView(self)
+
+
+class SharedDirectoryView:
+    """
+    Read-only view of a directory published in shared memory: nothing is parsed when attaching,
+    every entry is unpacked from its fixed-size record when it is accessed
+    """
+    __slots__ = ('handle', 'img_path', '_shm', '_records', '_index', '_count')
+
+    def __init__(self, handle: SharedDirectoryHandle):
+        self.handle = handle
+        self._shm = _attach(handle.name)
+        buffer = self._shm.buf
+        magic, self._count, path_size = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            self._shm.close()
+            raise ValueError(f'{handle.name} is not a shared archive directory')
+        start = HEADER.size + path_size
+        self.img_path = Path(bytes(buffer[HEADER.size:start]).decode())
+        end = start + self._count * V1_ENTRY.size
+        self._records = buffer[start:end]
+        self._index = buffer[end:end + self._count * INDEX.size].cast('I')
+
+    def __enter__(self) -> SharedDirectoryView:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _name(self, i: int) -> str:
+        return _decode_name(bytes(self._records[i * V1_ENTRY.size + 8:(i + 1) * V1_ENTRY.size]))
+
+    def __getitem__(self, i: int) -> ArchiveContent:
+        if not -self._count <= i < self._count:
+            raise IndexError(i)
+        offset, size, name = V1_ENTRY.unpack_from(self._records, i % self._count * V1_ENTRY.size)
+        return ArchiveContent.from_blocks(offset, size, _decode_name(name))
+
+    def __iter__(self) -> Iterator[ArchiveContent]:
+        return map(self.__getitem__, range(self._count))
+
+    def __contains__(self, name: str) -> bool:
+        try:
+            self.find(name)
+        except KeyError:
+            return False
+        return True
+
+    def find(self, name: str) -> ArchiveContent:
+        """Returns the entry of file [name] (binary search over the case-folded names)"""
+        key = name.casefold()
+        position = bisect_left(self._index, key, key=lambda i: self._name(i).casefold())
+        if position < self._count and self._name(i := self._index[position]).casefold() == key:
+            return self[i]
+        raise KeyError(name)
+
+    def open(self, name: str, buffering: int = -1) -> BinaryIO:
+        """Opens file [name] for reading in place (see archive_path.open_entry)"""
+        from pyimgedit.archive_path import open_entry
+        return open_entry(self.img_path, self.find(name), buffering)
+
+    def read(self, name: str) -> bytes:
+        with self.open(name, 0) as f:
+            return f.read()
+
+    def close(self):
+        self._records.release()
+        self._index.release()
+        self._shm.close()
+
+
+class SharedDirectory:
+    """
+    Directory of an archive (names, offsets, sizes) packed once into shared memory:
+    a header, the path of the .img, fixed-size records in the directory order and an index sorted by name.
+    The owner keeps it open while the workers use handle; close() frees the memory
+    """
+    __slots__ = ('_shm', 'handle')
+
+    def __init__(self, archive: str | Path | IMGArchive):
+        archive = archive if isinstance(archive, IMGArchive) else IMGArchive(archive)
+        try:
+            with archive.open() as img:
+                entries, img_path = img.entries, img.img_path
+        except (OSError, ValueError):
+            entries, img_path = archive.list()[2], archive.imgname
+        path = str(Path(img_path).resolve()).encode()
+        records = b''.join(V1_ENTRY.pack(e.offset.blocks, e.size.blocks, _encode_name(e.name)) for e in entries)
+        order = sorted(range(len(entries)), key=lambda i: entries[i].name.casefold())
+        index = b''.join(map(INDEX.pack, order))
+        raw = HEADER.pack(MAGIC, len(entries), len(path)) + path + records + index
+        self._shm = shared_memory.SharedMemory(create=True, size=max(len(raw), 1))
+        self._shm.buf[:len(raw)] = raw
+        self.handle = SharedDirectoryHandle(self._shm.name, path.decode(), len(entries))
+
+    def __enter__(self) -> SharedDirectory:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from threading import Condition, Lock
+from typing import BinaryIO, Iterable, Iterator
+
+from pyimgedit import ArchiveContent, IMGArchive
+from pyimgedit.fastcopy import COPY_BUFFER_SIZE, write_all
+from pyimgedit.imgfile import IMGFile, _iter_directory, archive_paths, archive_signature, blocks_for
+from pyimgedit.readplan import MAX_GAP, MAX_READ, plan_reads
+
+
+class _DataFile:
+    """The .img file read by the snapshots of one generation of the archive, closed with the last of them"""
+    __slots__ = ('file', '_lock')
+
+    def __init__(self, img_path: Path):
+        self.file = open(img_path, 'rb', buffering=0)
+        self._lock = Lock()
+
+    def readinto(self, view: memoryview, position: int) -> int:
+        """Positional read, the snapshots of several threads share the file"""
+        if hasattr(os, 'preadv'):
+            return os.preadv(self.file.fileno(), (view,), position)
+        with self._lock:
+            self.file.seek(position)
+            return self.file.readinto(view) or 0
+
+    def read(self, position: int, size: int) -> bytes:
+        buffer = bytearray(max(size, 0))
+        view = memoryview(buffer)
+        got = 0
+        while got < size and (done := self.readinto(view[got:], position + got)):
+            got += done
+        return bytes(view[:got])
+
+
+class _Version:
+    """One committed directory of the archive"""
+    __slots__ = ('number', 'entries', 'data', 'data_start', 'users')
+
+    def __init__(self, number: int, entries: dict[str, ArchiveContent], data: _DataFile):
+        self.number = number
+        self.entries = entries
+        self.data = data
+        self.data_start = min((e.offset.blocks for e in entries.values() if e.size.blocks), default=1 << 32)
+        self.users = 0
+
+
+class Snapshot:
+    """
+    Read-only view of the archive as it was committed when the snapshot was taken.
+    The writes made meanwhile do not change it: new data is appended and the old blocks stay in place
+    until the snapshot is released. Has the reading methods of IMGFile
+    """
+    __slots__ = ('img_path', 'dir_path', 'version', 'generation', '_store', '_version', '_entries', '_data')
+    writable = False
+
+    def __init__(self, store: SnapshotStore, version: _Version):
+        self.img_path = store.img_path
+        self.dir_path = store.dir_path
+        self.version = store.format_version
+        self.generation = version.number
+        self._store = store
+        self._version = version
+        self._entries = version.entries
+        self._data = version.data
+
+    def __enter__(self) -> Snapshot:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[ArchiveContent]:
+        return iter(self._entries.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name.casefold() in self._entries
+
+    def __repr__(self) -> str:
+        return f'<Snapshot {self.generation} of {self.img_path} ({len(self)} entries)>'
+
+    @property
+    def entries(self) -> list[ArchiveContent]:
+        return [*self._entries.values()]
+
+    @property
+    def closed(self) -> bool:
+        return self._version is None
+
+    def find(self, name: str) -> ArchiveContent:
+        """Returns the directory entry of file [name]"""
+        try:
+            return self._entries[name.casefold()]
+        except KeyError:
+            raise KeyError(name) from None
+
+    def _entry(self, entry: str | ArchiveContent) -> ArchiveContent:
+        return self.find(entry) if isinstance(entry, str) else entry
+
+    def read(self, entry: str | ArchiveContent) -> bytes:
+        """Returns the content of file [entry], padded to whole blocks"""
+        entry = self._entry(entry)
+        return self._data.read(entry.offset.bytes, entry.size.bytes)
+
+    def read_range(self, entry: str | ArchiveContent, start: int, size: int) -> bytes:
+        """Returns at most [size] bytes of file [entry] starting at [start], without reading the rest"""
+        entry = self._entry(entry)
+        return self._data.read(entry.offset.bytes + start, min(size, entry.size.bytes - start))
+
+    def iter_chunks(self, entry: str | ArchiveContent, chunk_size: int = COPY_BUFFER_SIZE) -> Iterator[bytes]:
+        """Yields the content of file [entry] in chunks of at most [chunk_size] bytes"""
+        entry = self._entry(entry)
+        position, left = entry.offset.bytes, entry.size.bytes
+        while left > 0 and (chunk := self._data.read(position, min(chunk_size, left))):
+            position += len(chunk)
+            left -= len(chunk)
+            yield chunk
+
+    def read_many(self, entries: Iterable[str | ArchiveContent], max_gap: int = MAX_GAP,
+                  max_read: int = MAX_READ) -> Iterator[tuple[ArchiveContent, memoryview]]:
+        """Same as IMGFile.read_many"""
+        for span in plan_reads(map(self._entry, entries), max_gap, max_read):
+            view = memoryview(self._data.read(span.start, span.size))
+            for entry in span.entries:
+                start = entry.offset.bytes - span.start
+                yield entry, view[start:start + entry.size.bytes]
+
+    def extract(self, entry: str | ArchiveContent, destination: str | os.PathLike | BinaryIO) -> int:
+        """Copies file [entry] to the loose file [destination]"""
+        entry = self._entry(entry)
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, 'wb', buffering=0) as destination_file:
+                return self.extract(entry, destination_file)
+        return sum(write_all(destination, chunk) for chunk in self.iter_chunks(entry))
+
+    def extract_many(self, entries: Iterable[str | ArchiveContent], directory: str | os.PathLike,
+                     max_gap: int = MAX_GAP, max_read: int = MAX_READ) -> Iterator[ArchiveContent]:
+        """Extracts [entries] into [directory] with coalesced reads, yields every extracted entry"""
+        for entry, content in self.read_many(entries, max_gap, max_read):
+            with open(os.path.join(directory, entry.name), 'wb', buffering=0) as out:
+                write_all(out, content)
+            yield entry
+
+    def close(self):
+        """Releases the snapshot, the blocks only it used can be reclaimed"""
+        if self._version is not None:
+            self._store._release(self._version)
+            self._version = None
+
+
+class SnapshotWriter(IMGFile):
+    """
+    Writable IMGFile of a SnapshotStore: the data is never overwritten in place (copy-on-write),
+    every flush publishes a new version of the directory to the readers
+    """
+    copy_on_write = True
+
+    def __init__(self, store: SnapshotStore):
+        self._store = store
+        super().__init__(store.archive.imgname, True)
+        # the blocks of the files deleted in an earlier session may still be read by snapshots, append after them
+        self._end_block = max(self._end_block, blocks_for(os.fstat(self._file.fileno()).st_size),
+                              store._data_end())
+
+    def flush(self):
+        if not self._dirty:
+            return
+        if self.version == 2:  # the directory grows over the first blocks, wait for the readers of their old data
+            self._store._wait_for_readers(blocks_for(self._directory_bytes(len(self._entries))))
+        super().flush()
+        self._store._publish(self._entries)
+
+    def rebuild(self) -> Iterator[tuple[str, str]]:
+        """
+        Same as IMGFile.rebuild, the snapshots taken before keep reading the old file until they are released.
+        On Windows the old file can not be replaced while it is opened, the rebuild waits for its readers
+        """
+        total = len(self._entries)
+        if not total and os.name == 'nt':
+            self._store._drain()
+        rebuild = super().rebuild()
+        for done, progress in enumerate(rebuild, 1):
+            if done == total and os.name == 'nt':
+                self._store._drain()
+            yield progress
+        self._store._publish(self._entries, replaced=True)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._store._end_write(self)
+
+
+class SnapshotStore:
+    """
+    Versioned directories of one archive for readers that run while a writer changes it (MVCC).
+    A reader takes a snapshot: the directory committed at that moment, read from the .img file it referred to.
+    The writer (one at a time) appends new data instead of overwriting it and publishes a new directory
+    on every flush. The old blocks are reclaimed by rebuild, which writes a new file: the snapshots taken before
+    keep the old one opened until they are released. When a VER2 directory grows over the first data blocks,
+    the flush waits until the snapshots that still read them are released: release your own snapshots before
+    writing from the same thread. Only the threads of this process are isolated: readers in other processes see
+    whole directories only with III / VC archives (the .dir is replaced at once), a VER2 directory is rewritten
+    in place at the start of the .img
+    """
+
+    def __init__(self, archive: IMGArchive):
+        self.archive = archive
+        self._lock = Lock()
+        self._changed = Condition(self._lock)
+        self._writer_lock = Lock()
+        self._writer: SnapshotWriter | None = None
+        self._draining = False
+        self._current: _Version | None = None
+        self._live: list[_Version] = []
+        self._signature = None
+        self.img_path: Path | None = None
+        self.dir_path: Path | None = None
+        self.format_version = 0
+
+    @property
+    def generation(self) -> int:
+        """Number of the last committed version"""
+        with self._lock:
+            return 0 if self._current is None else self._current.number
+
+    def _load(self):
+        """Reads the committed directory from the disk (first use, or the archive was changed by someone else)"""
+        img_path, dir_path, format_version = archive_paths(self.archive.imgname)
+        data = _DataFile(img_path)
+        try:
+            with data._lock:
+                entries = {e.name.casefold(): e for e in _iter_directory(data.file, dir_path, format_version)}
+            signature = archive_signature(self.archive.imgname)
+        except BaseException:
+            data.file.close()
+            raise
+        self.img_path, self.dir_path, self.format_version = img_path, dir_path, format_version
+        self._signature = signature
+        self._set_current(entries, data)
+
+    def _set_current(self, entries: dict[str, ArchiveContent], data: _DataFile):
+        old = self._current
+        self._current = _Version(0 if old is None else old.number + 1, entries, data)
+        self._live.append(self._current)
+        if old is not None:
+            self._forget(old)
+
+    def _forget(self, version: _Version):
+        """Drops [version] if it is not the current one and nobody reads it, closes its file if it was the last user"""
+        if version is self._current or version.users:
+            return
+        self._live.remove(version)
+        if version.data is not self._current.data and not any(v.data is version.data for v in self._live):
+            version.data.file.close()
+
+    def snapshot(self) -> Snapshot:
+        """Takes a snapshot of the last committed version"""
+        with self._lock:
+            while self._draining:
+                self._changed.wait()
+            if self._current is None or self._current.data.file.closed or (
+                    self._writer is None and archive_signature(self.archive.imgname) != self._signature):
+                self._load()
+            self._current.users += 1
+            return Snapshot(self, self._current)
+
+    def _release(self, version: _Version):
+        with self._lock:
+            version.users -= 1
+            self._forget(version)
+            self._changed.notify_all()
+
+    def writer(self) -> SnapshotWriter:
+        """Opens the archive for writing copy-on-write, waits for the writer of another thread to close"""
+        self._writer_lock.acquire()
+        try:
+            with self._lock:
+                if self._current is None:
+                    self._load()
+                self._writer = writer = SnapshotWriter(self)
+        except BaseException:
+            self._writer_lock.release()
+            raise
+        return writer
+
+    def _end_write(self, writer: SnapshotWriter):
+        with self._lock:
+            if self._writer is not writer:
+                return
+            self._writer = None
+            self._draining = False
+            self._changed.notify_all()
+        self._writer_lock.release()
+
+    def _wait_for_readers(self, blocks: int):
+        """
+        Waits until no snapshot reads data in the first [blocks] blocks of the current file,
+        no snapshots are given meanwhile
+        """
+        with self._lock:
+            data = self._current.data
+            while any(v.users and v.data is data and v.data_start < blocks for v in self._live):
+                self._draining = True
+                self._changed.wait()
+
+    def _data_end(self) -> int:
+        """The end of the data of all the live versions in the current file (called with the lock held)"""
+        data = self._current.data
+        return max((e.offset.blocks + e.size.blocks for v in self._live if v.data is data
+                    for e in v.entries.values()), default=0)
+
+    def _drain(self):
+        """
+        Stops giving snapshots, waits until all of them are released and closes the current file,
+        so it can be replaced (Windows). _publish(replaced=True) opens the new one
+        """
+        with self._lock:
+            self._draining = True
+            while any(v.users for v in self._live):
+                self._changed.wait()
+            self._current.data.file.close()
+
+    def _publish(self, entries: dict[str, ArchiveContent], replaced: bool = False):
+        """Makes the directory of the writer the current version, with the new file after a rebuild"""
+        with self._lock:
+            data = _DataFile(self.img_path) if replaced else self._current.data
+            self._set_current(dict(entries), data)
+            self._signature = archive_signature(self.archive.imgname)
+            self._draining = False
+            self._changed.notify_all()
+        self.archive._close_readers()
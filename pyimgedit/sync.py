@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from threading import Event
+from typing import Iterator
+
+from pyimgedit import IMGArchive, OperationResult, content_hash
+from pyimgedit.imgfile import _encode_name
+
+POLL_INTERVAL = 1.
+DEBOUNCE = .3
+
+
+def _valid_name(name: str) -> bool:
+    try:
+        _encode_name(name)
+    except (ValueError, UnicodeEncodeError):
+        return False
+    return True
+
+
+class PollingWatcher:
+    """Finds the changed files of a directory by comparing its listings every [interval] seconds"""
+    __slots__ = ('directory', 'interval', '_snapshot')
+
+    def __init__(self, directory: str | Path, interval: float = POLL_INTERVAL):
+        self.directory = Path(directory)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def __enter__(self) -> PollingWatcher:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                st = entry.stat()
+                snapshot[entry.name] = st.st_size, st.st_mtime_ns
+        return snapshot
+
+    def wait(self, timeout: float) -> set[str]:
+        """Waits at most [timeout] seconds and returns the names of the changed, added and removed files"""
+        time.sleep(min(timeout, self.interval))
+        old, self._snapshot = self._snapshot, self._scan()
+        return {name for name in old.keys() | self._snapshot.keys() if old.get(name) != self._snapshot.get(name)}
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Finds the changed files of a directory with inotify (Linux)"""
+    __slots__ = ('directory', '_fd')
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_DELETE = 0x200
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if (fd := libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)) < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(fd, os.fsencode(self.directory), self.MASK) < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), f'Can not watch {self.directory}')
+        self._fd = fd
+
+    def __enter__(self) -> InotifyWatcher:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def wait(self, timeout: float) -> set[str]:
+        """Waits at most [timeout] seconds and returns the names of the changed, added and removed files"""
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return set()
+        try:
+            raw = os.read(self._fd, 64 << 10)
+        except BlockingIOError:
+            return set()
+        names = set()
+        position = 0
+        while position < len(raw):
+            _, _, _, length = self.EVENT.unpack_from(raw, position)
+            position += self.EVENT.size
+            names.add(os.fsdecode(raw[position:position + length].rstrip(b'\0')))
+            position += length
+        names.discard('')
+        return names
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def make_watcher(directory: str | Path, interval: float = POLL_INTERVAL) -> InotifyWatcher | PollingWatcher:
+    """inotify on Linux if it is available, polling otherwise"""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(directory, interval)
+
+
+class DirectorySync:
+    """
+    Mirrors the loose files of [directory] into [archive].
+    The manifest (size, mtime, content hash of every synced file) is kept in <archive>.sync.json,
+    a file is hashed only when its size or mtime changed and added only when its content changed.
+    The archive, its .dir, the manifest and their temporary files are skipped when they are in [directory]
+    """
+    __slots__ = ('directory', 'archive', 'manifest_path', 'manifest', '_own_names')
+
+    def __init__(self, directory: str | Path, archive: str | Path | IMGArchive, manifest_path: str | Path = None):
+        self.directory = Path(directory)
+        self.archive = archive if isinstance(archive, IMGArchive) else IMGArchive(archive)
+        if manifest_path is None:
+            manifest_path = self.archive.imgname.with_name(f'{self.archive.imgname.name}.sync.json')
+        self.manifest_path = Path(manifest_path)
+        self.manifest: dict[str, list] = {}
+        if self.manifest_path.is_file():
+            with open(self.manifest_path, encoding='UTF-8') as f:
+                self.manifest = json.load(f)
+        directory = os.path.normcase(os.path.realpath(self.directory))
+        img = self.archive.imgname
+        self._own_names = tuple(
+            path.name.casefold() for path in (img.with_suffix('.img'), img.with_suffix('.dir'), self.manifest_path)
+            if os.path.normcase(os.path.realpath(path.parent)) == directory)
+
+    def _is_own(self, name: str) -> bool:
+        """Is [name] the archive, its .dir, the manifest or a temporary file of them"""
+        name = name.casefold()
+        return any(name == own or name.startswith(f'{own}.') for own in self._own_names)
+
+    def _save_manifest(self):
+        tmp = self.manifest_path.with_name(f'{self.manifest_path.name}.tmp')
+        with open(tmp, 'w', encoding='UTF-8') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def changes(self, names: set[str] = None) -> tuple[dict[str, list], list[str], dict[str, list]]:
+        """
+        Compares the files [names] (all the files by default) with the manifest.
+        Returns the new manifest records of the files to add, the names to delete
+        and the manifest to keep once they were applied (self.manifest is not changed)
+        """
+        if names is None:
+            names = {e.name for e in os.scandir(self.directory) if e.is_file()} | self.manifest.keys()
+        with self.archive.open() as img:
+            archived = {e.name.casefold() for e in img}
+        add, delete = {}, []
+        manifest = dict(self.manifest)
+        for name in sorted(names):
+            if self._is_own(name) or not _valid_name(name):
+                continue
+            path = self.directory / name
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                if name in manifest:
+                    del manifest[name]
+                    if name.casefold() in archived:
+                        delete.append(name)
+                continue
+            record = self.manifest.get(name)
+            in_archive = name.casefold() in archived
+            if record is not None and record[:2] == [st.st_size, st.st_mtime_ns] and in_archive:
+                continue
+            digest = content_hash(path.read_bytes())
+            if record is not None and record[2] == digest and in_archive:
+                manifest[name] = [st.st_size, st.st_mtime_ns, digest]
+                continue
+            add[name] = [st.st_size, st.st_mtime_ns, digest]
+        manifest.update(add)
+        return add, delete, manifest
+
+    def sync(self, names: set[str] = None) -> OperationResult | None:
+        """
+        Adds the new and changed files and deletes the removed ones in one batch, None if nothing changed.
+        The manifest is saved only after the archive was updated, so a failed batch is retried by the next sync
+        """
+        add, delete, manifest = self.changes(names)
+        result = None
+        if add or delete:
+            result = self.archive.update((self.directory / name for name in add), delete)
+        self.manifest = manifest
+        self._save_manifest()
+        return result
+
+    def watch(self, debounce: float = DEBOUNCE, interval: float = POLL_INTERVAL,
+              stop: Event = None) -> Iterator[OperationResult]:
+        """
+        Syncs everything, then waits for changes of the directory. A burst of changes is collected
+        until the directory is quiet for [debounce] seconds and synced as one batch. Yields the results
+        """
+        stop = Event() if stop is None else stop
+        with make_watcher(self.directory, interval) as watcher:  # before the first sync, so nothing is missed
+            if (result := self.sync()) is not None:
+                yield result
+            while not stop.is_set():
+                if not (names := watcher.wait(interval)):
+                    continue
+                while more := watcher.wait(debounce):
+                    names |= more
+                if (result := self.sync(names)) is not None:
+                    yield result
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from pyimgedit import content_hash, user_cache_dir
+from pyimgedit.renderware import CHUNK_HEADER, STRUCT, TEXTURE_DICTIONARY, TEXTURE_NATIVE
+
+TEXTURE_NATIVE_STRUCT = struct.Struct('<II32s32sI4sHHBBBB')
+PLATFORM_D3D8 = 8
+PLATFORM_D3D9 = 9
+PAL8 = 0x2000
+PAL4 = 0x4000
+RASTER_FORMATS = {0x100: '1555', 0x200: '565', 0x300: '4444', 0x400: 'LUM8', 0x500: '8888', 0x600: '888',
+                  0xA00: '555'}
+THUMBNAIL_SIZE = 128
+
+_DXT1_BLOCK = np.dtype([('c0', '<u2'), ('c1', '<u2'), ('codes', '<u4')])
+_DXT3_BLOCK = np.dtype([('alpha', '<u8'), ('c0', '<u2'), ('c1', '<u2'), ('codes', '<u4')])
+_DXT5_BLOCK = np.dtype([('a0', 'u1'), ('a1', 'u1'), ('alpha', 'u1', 6),
+                        ('c0', '<u2'), ('c1', '<u2'), ('codes', '<u4')])
+_SHIFTS2 = np.arange(16, dtype=np.uint32) * 2
+_SHIFTS3 = np.arange(16, dtype=np.uint64) * 3
+_SHIFTS4 = np.arange(16, dtype=np.uint64) * 4
+
+
+def _expand(value: np.ndarray, shift: int, bits: int) -> np.ndarray:
+    return ((value.astype(np.uint32) >> shift) & ((1 << bits) - 1)) * 255 // ((1 << bits) - 1)
+
+
+def _rgb565(color: np.ndarray) -> np.ndarray:
+    return np.stack((_expand(color, 11, 5), _expand(color, 5, 6), _expand(color, 0, 5)), axis=-1).astype(np.int32)
+
+
+def _color_blocks(blocks: np.ndarray, one_bit_alpha: bool) -> np.ndarray:
+    """Decodes the DXT color part of [blocks] into (blocks, 16, 4) RGBA pixels"""
+    c0, c1 = _rgb565(blocks['c0']), _rgb565(blocks['c1'])
+    four_colors = blocks['c0'] > blocks['c1'] if one_bit_alpha else np.ones(len(blocks), dtype=bool)
+    palette = np.full((len(blocks), 4, 4), 255, dtype=np.int32)
+    palette[:, 0, :3] = c0
+    palette[:, 1, :3] = c1
+    palette[:, 2, :3] = np.where(four_colors[:, None], (2 * c0 + c1) // 3, (c0 + c1) // 2)
+    palette[:, 3, :3] = np.where(four_colors[:, None], (c0 + 2 * c1) // 3, 0)
+    palette[:, 3, 3] = np.where(four_colors, 255, 0)
+    codes = (blocks['codes'][:, None] >> _SHIFTS2) & 3
+    return palette[np.arange(len(blocks))[:, None], codes].astype(np.uint8)
+
+
+def _blocks_to_image(pixels: np.ndarray, width: int, height: int) -> np.ndarray:
+    blocks_y, blocks_x = max(1, (height + 3) // 4), max(1, (width + 3) // 4)
+    image = pixels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+    return image.reshape(blocks_y * 4, blocks_x * 4, 4)[:height, :width]
+
+
+def _blocks(data: bytes, dtype: np.dtype, width: int, height: int) -> np.ndarray:
+    count = max(1, (width + 3) // 4) * max(1, (height + 3) // 4)
+    return np.frombuffer(data, dtype=dtype, count=count)
+
+
+def decode_dxt1(data: bytes, width: int, height: int) -> np.ndarray:
+    """Decodes DXT1 [data] into a (height, width, 4) RGBA array"""
+    return _blocks_to_image(_color_blocks(_blocks(data, _DXT1_BLOCK, width, height), True), width, height)
+
+
+def decode_dxt3(data: bytes, width: int, height: int) -> np.ndarray:
+    """Decodes DXT3 [data] into a (height, width, 4) RGBA array"""
+    blocks = _blocks(data, _DXT3_BLOCK, width, height)
+    pixels = _color_blocks(blocks, False)
+    pixels[..., 3] = ((blocks['alpha'][:, None] >> _SHIFTS4) & 15).astype(np.uint8) * 17
+    return _blocks_to_image(pixels, width, height)
+
+
+def decode_dxt5(data: bytes, width: int, height: int) -> np.ndarray:
+    """Decodes DXT5 [data] into a (height, width, 4) RGBA array"""
+    blocks = _blocks(data, _DXT5_BLOCK, width, height)
+    pixels = _color_blocks(blocks, False)
+    a0, a1 = blocks['a0'].astype(np.int32), blocks['a1'].astype(np.int32)
+    eight = (a0 > a1)[:, None]
+    steps = np.arange(1, 7, dtype=np.int32)
+    palette = np.empty((len(blocks), 8), dtype=np.int32)
+    palette[:, 0], palette[:, 1] = a0, a1
+    palette[:, 2:] = np.where(eight, ((7 - steps) * a0[:, None] + steps * a1[:, None]) // 7,
+                              np.concatenate((((5 - steps[:4]) * a0[:, None] + steps[:4] * a1[:, None]) // 5,
+                                              np.zeros((len(blocks), 1), np.int32),
+                                              np.full((len(blocks), 1), 255, np.int32)), axis=1))
+    bits = (blocks['alpha'].astype(np.uint64) << (np.arange(6, dtype=np.uint64) * 8)).sum(axis=1, dtype=np.uint64)
+    codes = ((bits[:, None] >> _SHIFTS3) & 7).astype(np.intp)
+    pixels[..., 3] = palette[np.arange(len(blocks))[:, None], codes]
+    return _blocks_to_image(pixels, width, height)
+
+
+def decode_raster(data: bytes, raster: str, width: int, height: int, palette: bytes = b'') -> np.ndarray:
+    """Decodes uncompressed or palettized [data] of the RenderWare [raster] format into a (height, width, 4) array"""
+    pixels = width * height
+    if raster in ('PAL8', 'PAL4'):
+        colors = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 4)
+        indices = np.frombuffer(data, dtype=np.uint8)
+        if raster == 'PAL4' and len(indices) < pixels:
+            indices = np.stack((indices & 15, indices >> 4), axis=-1).ravel()
+        return colors.take(indices[:pixels], axis=0, mode='clip').reshape(height, width, 4)
+    if raster in ('8888', '888'):
+        image = np.frombuffer(data, dtype=np.uint8, count=pixels * 4).reshape(height, width, 4)[..., [2, 1, 0, 3]]
+        if raster == '888':
+            image[..., 3] = 255
+        return image
+    if raster == 'LUM8':
+        gray = np.frombuffer(data, dtype=np.uint8, count=pixels).reshape(height, width)
+        return np.dstack((gray, gray, gray, np.full_like(gray, 255)))
+    value = np.frombuffer(data, dtype='<u2', count=pixels).reshape(height, width)
+    match raster:
+        case '565':
+            channels = _expand(value, 11, 5), _expand(value, 5, 6), _expand(value, 0, 5), np.full(value.shape, 255)
+        case '4444':
+            channels = _expand(value, 8, 4), _expand(value, 4, 4), _expand(value, 0, 4), _expand(value, 12, 4)
+        case '1555' | '555':
+            alpha = _expand(value, 15, 1) if raster == '1555' else np.full(value.shape, 255)
+            channels = _expand(value, 10, 5), _expand(value, 5, 5), _expand(value, 0, 5), alpha
+        case _:
+            raise ValueError(f'Unsupported raster format {raster!r}')
+    return np.dstack(channels).astype(np.uint8)
+
+
+_DXT_DECODERS = {'DXT1': decode_dxt1, 'DXT3': decode_dxt3, 'DXT5': decode_dxt5}
+
+
+class Texture:
+    """The first mipmap level of one texture of a PC TXD"""
+    __slots__ = ('name', 'raster', 'width', 'height', 'palette', 'data')
+
+    def __init__(self, name: str, raster: str, width: int, height: int, palette: bytes, data: bytes):
+        self.name = name
+        self.raster = raster
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.data = data
+
+    def to_rgba(self) -> np.ndarray:
+        """Decodes the texture into a (height, width, 4) RGBA array"""
+        if decoder := _DXT_DECODERS.get(self.raster):
+            return decoder(self.data, self.width, self.height)
+        return decode_raster(self.data, self.raster, self.width, self.height, self.palette)
+
+    def __repr__(self) -> str:
+        return f'<Texture {self.name!r} {self.raster} {self.width}x{self.height}>'
+
+
+def _texture_native(data: bytes, position: int) -> Texture | None:
+    (platform, _, name, _, raster_format, d3d_format, width, height, _, _, _,
+     flags) = TEXTURE_NATIVE_STRUCT.unpack_from(data, position)
+    if platform not in (PLATFORM_D3D8, PLATFORM_D3D9):
+        return None
+    raster = RASTER_FORMATS.get(raster_format & 0xF00, '8888')
+    if platform == PLATFORM_D3D8 and flags:
+        raster = f'DXT{flags}'
+    elif platform == PLATFORM_D3D9 and d3d_format.startswith(b'DXT'):
+        raster = d3d_format.decode('latin-1')
+    position += TEXTURE_NATIVE_STRUCT.size
+    palette = b''
+    if raster_format & (PAL8 | PAL4):
+        raster = 'PAL8' if raster_format & PAL8 else 'PAL4'
+        palette_size = (256 if raster == 'PAL8' else 32) * 4
+        palette = data[position:position + palette_size]
+        position += palette_size
+    size, = struct.unpack_from('<I', data, position)
+    position += 4
+    return Texture(name.split(b'\0', 1)[0].decode('latin-1'), raster, width, height, palette,
+                   data[position:position + size])
+
+
+def read_textures(data: bytes) -> list[Texture]:
+    """Returns the textures of the PC TXD [data]"""
+    chunk_type, _, _ = CHUNK_HEADER.unpack_from(data, 0)
+    if chunk_type != TEXTURE_DICTIONARY:
+        return []
+    child_type, child_size, _ = CHUNK_HEADER.unpack_from(data, CHUNK_HEADER.size)
+    if child_type != STRUCT:
+        return []
+    count, = struct.unpack_from('<H', data, 2 * CHUNK_HEADER.size)
+    position = 2 * CHUNK_HEADER.size + child_size
+    textures = []
+    for _ in range(count):
+        if position + 2 * CHUNK_HEADER.size > len(data):
+            break
+        chunk_type, chunk_size, _ = CHUNK_HEADER.unpack_from(data, position)
+        if chunk_type != TEXTURE_NATIVE:
+            break
+        if (texture := _texture_native(data, position + 2 * CHUNK_HEADER.size)) is not None:
+            textures.append(texture)
+        position += CHUNK_HEADER.size + chunk_size
+    return textures
+
+
+def thumbnail(image: np.ndarray, size: int = THUMBNAIL_SIZE) -> np.ndarray:
+    """Nearest-neighbour downscale of [image] so that its longest side is at most [size]"""
+    step = max(1, -(-max(image.shape[:2]) // size))
+    return np.ascontiguousarray(image[::step, ::step])
+
+
+class ThumbnailCache:
+    """On-disk cache of the thumbnails of the first texture of TXD files, keyed by the hash of the content"""
+
+    def __init__(self, directory: str | Path = None, size: int = THUMBNAIL_SIZE):
+        self.directory = Path(directory) if directory is not None else user_cache_dir() / 'thumbnails'
+        self.size = size
+
+    def path(self, content: bytes) -> Path:
+        digest = content_hash(content)
+        return self.directory / digest[:2] / f'{digest}-{self.size}.npy'
+
+    def get(self, content: bytes) -> np.ndarray | None:
+        """
+        Returns the (height, width, 4) RGBA thumbnail of the TXD [content], None if it has no PC textures.
+        Both results are cached, the same content is never decoded twice
+        """
+        path = self.path(content)
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            pass
+        none_path = path.with_suffix('.none')  # marks the contents without a decodable texture
+        if none_path.is_file():
+            return None
+        try:
+            textures = read_textures(content)
+            image = thumbnail(textures[0].to_rgba(), self.size) if textures else None
+        except (struct.error, ValueError):
+            image = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if image is None:
+            none_path.touch()
+            return None
+        fd, tmp_path = tempfile.mkstemp('.tmp', f'{path.stem}.', path.parent)  # a file per worker thread
+        with open(fd, 'wb') as file:
+            np.save(file, image)
+        os.replace(tmp_path, path)
+        return image
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from http.client import HTTPException, HTTPResponse
+from pathlib import Path
+from typing import Callable
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+PROGRESS_INTERVAL = .2
+ATTEMPTS = 5
+RETRY_DELAY = 2.
+
+
+def part_path(out_file: str | Path) -> Path:
+    """The partial download of [out_file], kept between the attempts"""
+    out_file = Path(out_file)
+    return out_file.with_name(f'{out_file.name}.part')
+
+
+def fetch_sha256(url: str, timeout: float = 30., attempts: int = ATTEMPTS,
+                 retry_delay: float = RETRY_DELAY) -> str | None:
+    """
+    Reads a published SHA-256 (the sha256sum format, '<hex digest>  <name>'), None only if it is not published (404).
+    The other errors are retried up to [attempts] times like in download and then raised, a malformed file is ValueError
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            with urlopen(url, timeout=timeout) as resp:
+                raw = resp.read(1024)
+            break
+        except HTTPError as e:
+            if e.code == 404:
+                return None
+            if e.code < 500 or attempt == attempts:
+                raise
+        except (HTTPException, OSError):
+            if attempt == attempts:
+                raise
+        time.sleep(retry_delay)
+    digest = (raw.split(maxsplit=1) or [b''])[0].decode('ascii', 'replace').lower()
+    if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+        raise ValueError(f'{url} does not start with a SHA-256')
+    return digest
+
+
+def _hash_file(path: Path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256
+
+
+def _total_size(resp: HTTPResponse) -> int:
+    """Size of the whole file from Content-Range (206) or Content-Length (200), 0 if unknown"""
+    if resp.status == 206:
+        _, _, total = (resp.getheader('Content-Range') or '').rpartition('/')
+        return int(total) if total.isdigit() else 0
+    return int(resp.getheader('Content-Length') or 0)
+
+
+def _range_start(resp: HTTPResponse) -> int | None:
+    """First byte of a 206 response (Content-Range: bytes <first>-<last>/<total>), None if it is malformed"""
+    unit, _, spec = (resp.getheader('Content-Range') or '').partition(' ')
+    first = spec.partition('-')[0]
+    return int(first) if unit == 'bytes' and first.isdigit() else None
+
+
+def _download_once(url: str, part: Path, progress: Callable[[int, int], None] | None,
+                   chunk_size: int, interval: float, timeout: float):
+    """Downloads the rest of [url] into [part], returns the SHA-256 of the whole part"""
+    start = part.stat().st_size if part.is_file() else 0
+    request = Request(url, headers={'Range': f'bytes={start}-'} if start else {})
+    try:
+        resp = urlopen(request, timeout=timeout)
+    except HTTPError as e:
+        if e.code == 416 and start:  # nothing after the end of the partial file: it is complete
+            return _hash_file(part)
+        raise
+    if resp.status == 206 and _range_start(resp) != start:
+        content_range = resp.getheader('Content-Range')
+        resp.close()
+        if not start:
+            raise HTTPException(f'Unexpected Content-Range {content_range!r} of {url}')
+        os.remove(part)  # another part of the file was sent, it may have changed: download it from the start
+        return _download_once(url, part, progress, chunk_size, interval, timeout)
+    with resp:
+        if resp.status != 206:  # the server ignored the range, download from the start
+            start = 0
+        sha256 = _hash_file(part) if start else hashlib.sha256()
+        total = _total_size(resp)
+        done = start
+        last = 0.
+        with open(part, 'r+b' if start else 'wb') as out:
+            out.seek(start)
+            buffer = memoryview(bytearray(chunk_size))
+            while size := resp.readinto(buffer):
+                out.write(buffer[:size])
+                sha256.update(buffer[:size])
+                done += size
+                if progress is not None and (now := time.monotonic()) - last >= interval:
+                    last = now
+                    progress(done, total)
+        if total and done < total:
+            raise HTTPException(f'Connection closed after {done} of {total} bytes')
+        if progress is not None:
+            progress(done, total or done)
+        return sha256
+
+
+def download(url: str, out_file: str | Path, sha256: str = None,
+             progress: Callable[[int, int], None] = None, *,
+             chunk_size: int = DOWNLOAD_CHUNK_SIZE, interval: float = PROGRESS_INTERVAL,
+             attempts: int = ATTEMPTS, retry_delay: float = RETRY_DELAY, timeout: float = 30.) -> Path:
+    """
+    Downloads [url] to [out_file] in chunks of [chunk_size] bytes through <out_file>.part:
+    an interrupted download is resumed with an HTTP Range request (also by the next call),
+    up to [attempts] times. [progress](downloaded, total) is called at most every [interval] seconds
+    (total is 0 if unknown). The file is checked against [sha256] before it replaces [out_file]
+    """
+    out_file = Path(out_file)
+    part = part_path(out_file)
+    for attempt in range(1, attempts + 1):
+        try:
+            digest = _download_once(url, part, progress, chunk_size, interval, timeout)
+            break
+        except (HTTPException, OSError) as e:
+            if isinstance(e, HTTPError) and e.code < 500 or attempt == attempts:
+                raise
+            time.sleep(retry_delay)
+    if sha256 is not None and digest.hexdigest() != sha256.lower():
+        os.remove(part)
+        raise ValueError(f'SHA-256 of {url} is {digest.hexdigest()}, {sha256.lower()} expected')
+    os.replace(part, out_file)
+    return out_file
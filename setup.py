@@ -12,7 +12,7 @@ with open('requirements.txt', encoding='UTF-8') as f:
 with open('requirements_gui.txt', encoding='UTF-8') as f:
     requires_gui = f.read().strip().splitlines()
 
-extras_require = {'gui': requires_gui, 'all': requires + requires_gui}
+extras_require = {'gui': requires_gui, 'fsspec': ['fsspec'], 'all': requires + requires_gui + ['fsspec']}
 
 setuptools.setup(
     name="UniversalIMG",
@@ -32,6 +32,8 @@ setuptools.setup(
     author_email='nikdissv@proton.me',
 
     packages=setuptools.find_packages(),
+    entry_points={'console_scripts': ['pyimgedit = pyimgedit.cli:main'],
+                  'fsspec.specs': ['img = pyimgedit.imgfs:IMGFileSystem']},
     license='MIT',
     python_requires='>=3.10',
     classifiers=[
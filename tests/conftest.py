@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+BLOCK_SIZE = 2048  # pyimgedit is imported by the fixtures: it patches logging, pytest configures it first
+FILES = {
+    'a.txd': b'A' * 3000,
+    'b.dff': b'B' * 100,
+    'c.col': bytes(range(256)) * 20,
+    'd.ifp': b'D' * BLOCK_SIZE,
+}
+
+
+def padded(data: bytes) -> bytes:
+    """[data] as it is read back from an archive: padded to whole blocks"""
+    return data.ljust(-(-len(data) // BLOCK_SIZE) * BLOCK_SIZE, b'\0')
+
+
+@pytest.fixture(params=(1, 2), ids=('v1', 'v2'))
+def version(request) -> int:
+    return request.param
+
+
+@pytest.fixture
+def loose_dir(tmp_path):
+    loose = tmp_path / 'loose'
+    loose.mkdir()
+    for name, data in FILES.items():
+        (loose / name).write_bytes(data)
+    return loose
+
+
+@pytest.fixture
+def img_path(tmp_path, loose_dir, version):
+    from pyimgedit.imgwriter import pack
+    path = tmp_path / 'test.img'
+    pack(loose_dir, path, version)
+    return path
+
+
+@pytest.fixture
+def archive(img_path):
+    from pyimgedit import IMGArchive
+    return IMGArchive(img_path, '')
+
+
+@pytest.fixture
+def gui_app():
+    """A KivyMD app for the GUI widgets, the clock is ticked by the tests to run the @mainthread callbacks"""
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    pytest.importorskip('kivymd')
+    from kivymd.app import MDApp
+    return MDApp.get_running_app() or MDApp()
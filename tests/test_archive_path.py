@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import FILES, padded
+
+
+@pytest.fixture
+def root(archive):
+    from pyimgedit.archive_path import ArchivePath
+    return ArchivePath(archive)
+
+
+def test_paths(root):
+    assert root.is_dir() and root.exists()
+    assert sorted(path.name for path in root.iterdir()) == sorted(FILES)
+    path = root / 'A.TXD'
+    assert path.is_file() and path.parent == root and path == root / 'a.txd'
+    assert (path.stem, path.suffix) == ('A', '.TXD')
+    assert [p.name for p in root.glob('**/*.dff')] == ['b.dff']
+    assert not (root / 'missing.txd').exists()
+    with pytest.raises(NotADirectoryError):
+        path / 'child'
+
+
+def test_read(root):
+    path = root / 'c.col'
+    assert path.read_bytes() == padded(FILES['c.col'])
+    assert path.stat().st_size == len(padded(FILES['c.col']))
+    with path.open('rb') as f:
+        f.seek(256)
+        assert f.read(4) == bytes(range(4))
+        f.seek(-1, 2)
+        assert f.read() == b'\0'
+    with pytest.raises(FileNotFoundError):
+        (root / 'missing.txd').read_bytes()
+
+
+@pytest.mark.parametrize('mode', ('wb', 'ab', 'r+b'))
+def test_read_only(root, mode):
+    with pytest.raises(PermissionError):
+        (root / 'a.txd').open(mode)
+
+
+def test_listing_follows_the_changes(root, archive):
+    archive.add_bytes('new.txd', b'new')
+    assert (root / 'new.txd').read_bytes() == padded(b'new')
+
+
+def test_fsspec(img_path):
+    fsspec = pytest.importorskip('fsspec')
+    from pyimgedit.imgfs import IMGFileSystem
+    fsspec.register_implementation('img', IMGFileSystem, clobber=True)  # the entry point of an installed package
+    fs = IMGFileSystem(img_path)
+    assert sorted(fs.ls('', detail=False)) == sorted(FILES)
+    assert fs.info('a.txd')['size'] == len(padded(FILES['a.txd']))
+    assert fs.cat_file('c.col', 256, 260) == bytes(range(4))
+    assert fs.cat_file('c.col', -2) == b'\0\0'
+    with fs.open('img://b.dff') as f:
+        assert f.read(100) == FILES['b.dff']
+    with fsspec.open('img://d.ifp', fo=str(img_path)) as f:
+        assert f.read() == padded(FILES['d.ifp'])
+    for mode in ('wb', 'ab'):
+        with pytest.raises(PermissionError):
+            fs.open('a.txd', mode)
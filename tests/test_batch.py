@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+import shutil
+
+import pytest
+
+from conftest import FILES, padded
+
+
+@pytest.fixture
+def two_archives(img_path, tmp_path):
+    paths = []
+    for name in ('one', 'two'):
+        path = tmp_path / f'{name}.img'
+        shutil.copy(img_path, path)
+        if img_path.with_suffix('.dir').is_file():
+            shutil.copy(img_path.with_suffix('.dir'), path.with_suffix('.dir'))
+        paths.append(path)
+    return paths
+
+
+def test_manifest(tmp_path):
+    from pyimgedit.batch import load_manifest
+    manifest = tmp_path / 'jobs.json'
+    manifest.write_text(json.dumps({'jobs': [{'archive': 'a.img', 'op': 'delete', 'args': ['x.txd']}]}))
+    [job] = load_manifest(manifest)
+    assert (job.index, job.archive, job.op, job.args, job.kwargs) == (0, 'a.img', 'delete', ['x.txd'], {})
+    manifest.write_text(json.dumps([{'archive': 'a.img', 'op': 'format'}]))
+    with pytest.raises(ValueError, match='unknown operation'):
+        load_manifest(manifest)
+    manifest.write_text(json.dumps([{'op': 'delete'}]))
+    with pytest.raises(ValueError, match="'archive' is required"):
+        load_manifest(manifest)
+
+
+def test_run_batch(two_archives, tmp_path):
+    from pyimgedit import IMGArchive
+    from pyimgedit.batch import Job, run_batch
+    out = tmp_path / 'out'
+    out.mkdir()
+    jobs = [
+        Job(0, 'one.img', 'rename', ['a.txd', 'z.txd']),
+        Job(1, 'two.img', 'delete', ['missing.txd']),
+        Job(2, 'one.img', 'extract', ['z.txd', str(out / 'z.txd')]),
+        Job(3, 'two.img', 'delete', ['b.dff']),
+        Job(4, 'one.img', 'rebuild'),
+    ]
+    results = run_batch(jobs, workers=2, retries=1, base_dir=tmp_path)
+    assert [(r.job.index, r.ok, r.attempts) for r in results] == [(0, True, 1), (1, False, 2), (2, True, 1),
+                                                                  (3, False, 0), (4, True, 1)]
+    assert results[1].error.startswith('KeyError')
+    assert results[3].error == 'job 1 failed'
+    assert (out / 'z.txd').read_bytes() == padded(FILES['a.txd'])
+    with IMGArchive(two_archives[1], '').open() as img:
+        assert 'b.dff' in img
+
+
+def test_keep_going(two_archives, tmp_path):
+    from pyimgedit.batch import Job, run_batch
+    results = run_batch([Job(0, str(two_archives[0]), 'delete', ['missing.txd']),
+                         Job(1, str(two_archives[0]), 'delete', ['b.dff'])], workers=1, keep_going=True)
+    assert [r.ok for r in results] == [False, True]
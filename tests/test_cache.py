@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from conftest import FILES, padded
+
+
+def test_lru_budget():
+    from pyimgedit.cache import EntryCache
+    cache = EntryCache(max_bytes=10)
+    cache.put(('img', 'a', 0, 1), b'aaaa')
+    cache.put(('img', 'b', 1, 1), b'bbbb')
+    assert cache.get(('img', 'a', 0, 1)) == b'aaaa'
+    cache.put(('img', 'c', 2, 1), b'cccc')  # evicts b, the least recently used
+    assert cache.get(('img', 'b', 1, 1)) is None
+    assert cache.size == 8
+    cache.put(('img', 'big', 3, 1), b'x' * 11)  # over the whole budget, not cached
+    assert cache.get(('img', 'big', 3, 1)) is None
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'entries': 2, 'bytes': 8}
+
+
+def test_invalidate():
+    from pyimgedit.cache import EntryCache
+    cache = EntryCache()
+    cache.put(('one', 'a', 0, 1), b'a')
+    cache.put(('one', 'b', 1, 1), b'b')
+    cache.put(('two', 'a', 0, 1), b'a')
+    cache.invalidate('one', ['A'])
+    assert len(cache) == 2
+    cache.invalidate('one')
+    assert [*cache._items] == [('two', 'a', 0, 1)]
+
+
+def test_archive_read_is_cached(archive):
+    assert archive.read('a.txd') == padded(FILES['a.txd'])
+    assert archive.read('A.TXD') == padded(FILES['a.txd'])
+    assert archive.entry_cache.hits == 1
+    archive.add_bytes('a.txd', b'new')
+    assert archive.read('a.txd') == padded(b'new')
+
+
+def test_read_during_write_is_not_cached(archive, monkeypatch):
+    from pyimgedit.imgfile import IMGFile
+    write_at = IMGFile._write_at
+    during_write = []
+
+    def read_then_write(img, *args):
+        during_write.append(archive.read('a.txd'))
+        return write_at(img, *args)
+
+    monkeypatch.setattr(IMGFile, '_write_at', read_then_write)
+    archive.add_bytes('a.txd', b'N' * 3000)  # same size: overwritten in place, the cache key does not change
+    assert during_write == [padded(FILES['a.txd'])]
+    assert archive.read('a.txd') == padded(b'N' * 3000)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from conftest import FILES, padded
+
+
+class Unseekable(io.RawIOBase):
+    """A pipe-like stream: write only, no seek or tell"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self.buffer.write(data)
+
+
+@pytest.mark.parametrize('compression', ['', 'gz', 'xz'])
+def test_export_tar(archive, compression):
+    out = Unseekable()
+    assert archive.export_tar(out, compression) == len(FILES)
+    with tarfile.open(fileobj=io.BytesIO(out.buffer.getvalue()), mode='r:*') as tar:
+        assert {m.name: tar.extractfile(m).read() for m in tar} == {k: padded(v) for k, v in FILES.items()}
+
+
+@pytest.mark.parametrize('compression', [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_export_zip(archive, compression):
+    out = Unseekable()
+    assert archive.export_zip(out, compression) == len(FILES)
+    with zipfile.ZipFile(io.BytesIO(out.buffer.getvalue())) as zip_file:
+        assert [i.filename for i in zip_file.infolist()] == [*FILES]
+        assert {n: zip_file.read(n) for n in zip_file.namelist()} == {k: padded(v) for k, v in FILES.items()}
+
+
+def test_import_tar(archive):
+    raw = io.BytesIO()
+    with tarfile.open(fileobj=raw, mode='w:gz') as tar:
+        for name, data in {'sub/new.txd': b'N' * 5000, 'a.txd': b'replaced'}.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        tar.addfile(_directory('folder'))
+    raw.seek(0)
+    result = archive.import_tar(raw)
+    assert result['Files'] == '2'
+    assert archive.read('new.txd') == padded(b'N' * 5000)
+    assert archive.read('a.txd') == padded(b'replaced')
+    assert archive.read('b.dff') == padded(FILES['b.dff'])
+
+
+def _directory(name: str) -> tarfile.TarInfo:
+    info = tarfile.TarInfo(name)
+    info.type = tarfile.DIRTYPE
+    return info
+
+
+def test_import_zip(archive):
+    raw = io.BytesIO()
+    with zipfile.ZipFile(raw, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr('folder/', b'')
+        zip_file.writestr('folder/new.dff', b'Z' * 3000)
+        zip_file.writestr('c.col', b'replaced')
+    raw.seek(0)
+    assert archive.import_zip(raw)['Files'] == '2'
+    assert archive.read('new.dff') == padded(b'Z' * 3000)
+    assert archive.read('c.col') == padded(b'replaced')
+
+
+def test_round_trip(archive, tmp_path, version):
+    from pyimgedit import IMGArchive
+    raw = io.BytesIO()
+    archive.export_zip(raw)
+    (tmp_path / 'empty').mkdir()
+    IMGArchive.pack(tmp_path / 'empty', tmp_path / 'copy.img', version)
+    copy = IMGArchive(tmp_path / 'copy.img', '')
+    raw.seek(0)
+    copy.import_zip(raw)
+    with copy.open() as img:
+        assert [e.name for e in img] == [*FILES]
+    assert {name: copy.read(name) for name in FILES} == {k: padded(v) for k, v in FILES.items()}
+
+
+def _zip(members: dict[str, bytes]) -> io.BytesIO:
+    raw = io.BytesIO()
+    with zipfile.ZipFile(raw, 'w') as zip_file:
+        for name, data in members.items():
+            zip_file.writestr(name, data)
+    raw.seek(0)
+    return raw
+
+
+def _tar(members: dict[str, bytes]) -> io.BytesIO:
+    raw = io.BytesIO()
+    with tarfile.open(fileobj=raw, mode='w') as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    raw.seek(0)
+    return raw
+
+
+def assert_unchanged(archive):
+    with archive.open() as img:
+        assert [e.name for e in img] == [*FILES]
+    assert {name: archive.read(name) for name in FILES} == {k: padded(v) for k, v in FILES.items()}
+
+
+@pytest.mark.parametrize('members, error', [
+    ({'new.txd': b'N', 'a/x.txd': b'1', 'b/X.TXD': b'2'}, "would both be the entry 'X.TXD'"),
+    ({'new.txd': b'N', 'a.txd': b'A', 'x' * 30 + '.txd': b'L'}, 'Invalid entry name'),
+])
+@pytest.mark.parametrize('container', ['tar', 'zip'])
+def test_import_is_all_or_nothing(archive, container, members, error):
+    with pytest.raises(ValueError, match=error):
+        getattr(archive, f'import_{container}')((_tar if container == 'tar' else _zip)(members))
+    assert_unchanged(archive)
+
+
+def test_broken_tar_stream_is_not_imported(archive):
+    raw = _tar({'new.txd': b'N' * 5000, 'a.txd': b'A' * 5000})
+    broken = io.BytesIO(raw.getvalue()[:2048])  # the header and a part of new.txd
+    with pytest.raises(tarfile.TarError):
+        archive.import_tar(broken)
+    assert_unchanged(archive)
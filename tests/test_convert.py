@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from conftest import FILES, padded
+
+
+def test_convert_in_place(archive, img_path, version):
+    from pyimgedit.imgfile import IMGFile
+    target = 3 - version
+    converted = archive.convert(target)
+    assert converted is archive
+    with IMGFile(archive.imgname) as img:
+        assert img.version == target
+        assert [e.name for e in img] == [*FILES]
+        for name, data in FILES.items():
+            assert img.read(name) == padded(data)
+    assert img_path.with_suffix('.dir').is_file() == (target == 1)
+    assert not [*img_path.parent.glob('*.convert.*')]
+
+
+def test_convert_to_another_file(archive, tmp_path, version):
+    from pyimgedit.imgfile import IMGFile
+    other = archive.convert(3 - version, tmp_path / 'other.img')
+    assert other.read('c.col') == padded(FILES['c.col'])
+    with IMGFile(archive.imgname) as img:
+        assert img.version == version
+
+
+def test_convert_to_the_same_version(archive, img_path, version):
+    before = img_path.read_bytes()
+    archive.convert(version)
+    assert img_path.read_bytes() == before
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import FILES, padded
+
+
+@pytest.fixture(params=(True, False), ids=('kernel', 'buffer'))
+def kernel_copy(request, monkeypatch):
+    from pyimgedit import fastcopy
+    monkeypatch.setattr(fastcopy, 'KERNEL_COPY', request.param and fastcopy.KERNEL_COPY)
+    return request.param
+
+
+def test_copy_range(tmp_path, kernel_copy):
+    from pyimgedit.fastcopy import copy_range
+    source = tmp_path / 'source'
+    data = bytes(range(256)) * 100
+    source.write_bytes(data)
+    destination = tmp_path / 'destination'
+    destination.write_bytes(b'-' * 10)
+    with open(source, 'rb', buffering=0) as src, open(destination, 'r+b', buffering=0) as dst:
+        assert copy_range(src, dst, 5000, 300, 5, bytearray(1000)) == 5000
+        assert copy_range(src, dst, 1000, 25500, 0) == 100  # the source ends
+    assert destination.read_bytes() == data[25500:] + data[395:5300]
+
+
+def test_write_file_and_extract(img_path, tmp_path, kernel_copy):
+    from pyimgedit.imgfile import IMGFile
+    loose = tmp_path / 'new.dff'
+    loose.write_bytes(b'n' * 7000)
+    with IMGFile(img_path, True) as img:
+        assert img.write_file('new.dff', loose).size.bytes == len(padded(b'n' * 7000))
+    with IMGFile(img_path) as img:
+        img.extract('new.dff', tmp_path / 'out.dff')
+        img.extract('c.col', tmp_path / 'out.col')
+    assert (tmp_path / 'out.dff').read_bytes() == padded(b'n' * 7000)
+    assert (tmp_path / 'out.col').read_bytes() == padded(FILES['c.col'])
+
+
+def test_rebuild_copies_the_data(img_path, kernel_copy):
+    from pyimgedit.imgfile import IMGFile
+    with IMGFile(img_path, True) as img:
+        img.delete('a.txd')
+        [*img.rebuild()]
+    with IMGFile(img_path) as img:
+        for name in ('b.dff', 'c.col', 'd.ifp'):
+            assert img.read(name) == padded(FILES[name])
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import pytest
+
+
+def _entry(offset: int, name: str):
+    from pyimgedit import ArchiveContent
+    return ArchiveContent.from_blocks(offset, 1, name)
+
+
+@pytest.fixture
+def view(gui_app):
+    from pyimgedit.gui.archive_data_view import ArchiveDataView
+    view = ArchiveDataView()
+    view.update_data([_entry(i, name) for i, name in enumerate(('a.txd', 'b.dff', 'c.col', 'd.ifp'))])
+    return view
+
+
+def _tick():
+    from kivy.clock import Clock
+    Clock.tick()
+
+
+def test_apply_changes_moves_the_selection_with_a_rename(view):
+    from pyimgedit import DirectoryChange
+    view.selection.set(0)
+    renamed = _entry(0, 'z.txd')
+    view.apply_changes([DirectoryChange('rename', renamed, 'a.txd'), DirectoryChange('add', _entry(9, 'a.txd'))])
+    _tick()
+    assert [row.name for row in view.rows] == ['z.txd', 'b.dff', 'c.col', 'd.ifp', 'a.txd']
+    assert view.selected_filenames == ['z.txd']
+
+
+def test_apply_changes_keeps_the_sort(view):
+    from pyimgedit import DirectoryChange
+    view.sort_by(view._COLUMN_LABELS[0], 'name')
+    view.sort_by(view._COLUMN_LABELS[0], 'name')  # descending
+    view.selection.set(0)  # d.ifp
+    view.apply_changes([DirectoryChange('remove', _entry(2, 'c.col')), DirectoryChange('add', _entry(9, 'e.txd'))])
+    _tick()
+    assert [row.name for row in view.rows] == ['e.txd', 'd.ifp', 'b.dff', 'a.txd']
+    assert view.selected_filenames == ['d.ifp']
+
+
+def test_progressive_listing(view):
+    view.sort_by(view._COLUMN_LABELS[0], 'name')
+    view.sort_by(view._COLUMN_LABELS[0], 'name')  # descending
+    view.set_page_size(2)
+    view.begin_data()
+    assert view.rows == []
+    view.extend_data([_entry(0, 'b.dff')])
+    assert [row.name for row in view.showed_rows] == ['b.dff']
+    view.extend_data([_entry(1, 'a.txd'), _entry(2, 'd.ifp')])
+    view.selection.set(2)  # d.ifp
+    view.extend_data([_entry(3, 'c.col')])
+    assert [row.name for row in view.rows] == ['b.dff', 'a.txd', 'd.ifp', 'c.col']
+    assert len(view.selection) == 4
+    view.end_data()
+    _tick()
+    assert [row.name for row in view.rows] == ['d.ifp', 'c.col', 'b.dff', 'a.txd']
+    assert view.selected_filenames == ['d.ifp']
+
+
+def test_progressive_listing_with_a_search(view):
+    view.search_field.text = '.txd'
+    view.begin_data()
+    view.extend_data([_entry(0, 'b.dff'), _entry(1, 'a.txd')])
+    view.extend_data([_entry(2, 'e.txd')])
+    view.end_data()
+    assert [row.name for row in view.showed_rows] == ['a.txd', 'e.txd']
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from threading import Thread
+
+import pytest
+
+
+@pytest.fixture
+def bus(gui_app):
+    from pyimgedit.gui.event_bus import EventBus
+    bus = EventBus(tail_size=4)
+    yield bus
+    bus.stop()
+
+
+def test_latest_value_only(bus):
+    values = []
+    bus.subscribe_latest('progress', values.append)
+    for i in range(100):
+        bus.publish('progress', i)
+    bus._drain()
+    bus._drain()
+    assert values == [99]
+
+
+def test_bounded_tail(bus):
+    batches = []
+    bus.subscribe_tail('log', batches.append)
+    for i in range(10):
+        bus.append('log', i)
+    bus._drain()
+    bus.append('log', 'next')
+    bus._drain()
+    assert batches == [[6, 7, 8, 9], ['next']]
+
+
+def test_unbounded_tail(bus):
+    batches = []
+    bus.subscribe_tail('log', batches.append, bounded=False)
+    for i in range(10):
+        bus.append('log', i)
+    bus._drain()
+    assert batches == [[*range(10)]]
+
+
+def test_publish_from_threads(gui_app):
+    from pyimgedit.gui.event_bus import EventBus
+    bus = EventBus(tail_size=10000)
+    items = []
+    bus.subscribe_tail('log', items.extend)
+    threads = [Thread(target=lambda: [bus.append('log', i) for i in range(500)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    bus.stop()
+    assert len(items) == 2000
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import io
+
+import pytest
+
+
+@pytest.fixture
+def log_view(gui_app):
+    from kivy.clock import Clock
+    from pyimgedit.gui.archive_log_view import ArchiveLogView
+    view = ArchiveLogView(capacity=50)
+    view.size_hint_y = None
+    view.set_logs({'Operation': 'Add', 'File name': f'{i}.txd'} for i in range(100))
+    Clock.tick()
+    view.height = view.line_height * 10  # 3 entries of 2 lines and the blank lines between them
+    Clock.tick()
+    return view
+
+
+def test_ring_buffer(log_view):
+    assert len(log_view._saves) == 50
+    assert log_view._saves[0] == 'Operation: Add\nFile name: 50.txd'
+
+
+def test_dump_writes_the_whole_log(log_view):
+    log_view.capacity = 20
+    log_view.set_log({'Operation': 'Delete', 'File name': '0.txd'})
+    log_view.dump(io.StringIO())
+    log_view.dump(out := io.StringIO())  # the temporary file is kept for the next dumps
+    entries = out.getvalue().strip().split('\n\n')
+    assert entries[:100] == [f'Operation: Add\nFile name: {i}.txd' for i in range(100)]
+    assert entries[100:] == ['Operation: Delete\nFile name: 0.txd']
+    assert len(log_view._saves) == 20
+
+
+def test_renders_the_visible_window(log_view):
+    assert log_view.visible_entries() == [f'Operation: Add\nFile name: {i}.txd' for i in (97, 98, 99)]
+    assert log_view.text.endswith('99.txd')
+
+
+def test_scroll(log_view):
+    from kivy.clock import Clock
+    log_view.scroll(10)
+    Clock.tick()
+    assert log_view.text.endswith('89.txd')
+    log_view.set_log({'Operation': 'Add', 'File name': 'new.txd'})  # the window stays on the same entries
+    Clock.tick()
+    assert log_view.text.endswith('89.txd')
+    log_view.scroll(-100)
+    Clock.tick()
+    assert log_view.text.endswith('new.txd')
+    log_view.scroll(1000)
+    assert log_view.visible_entries() == ['Operation: Add\nFile name: 51.txd']
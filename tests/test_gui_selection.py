@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture
+def selection(gui_app):
+    from pyimgedit.gui.selection_model import RowSelection
+    return RowSelection(6)
+
+
+def test_set_and_ranges(selection):
+    selection.set(1)
+    selection.set_range(3, 5)
+    assert [*selection.indices()] == [1, 3, 4]
+    assert 4 in selection and 5 not in selection and 99 not in selection
+    selection.set_range(4, 3, False)
+    assert selection.count == 2
+    assert [*selection.selected('abcdef')] == ['b', 'e']
+
+
+def test_select_invert_clear(selection):
+    selection.select_all([0, 2])
+    selection.invert()
+    assert [*selection.indices()] == [1, 3, 4, 5]
+    selection.invert([1, 2])
+    assert [*selection.indices()] == [2, 3, 4, 5]
+    selection.clear([3])
+    assert selection.count == 3
+    selection.select_all()
+    assert selection.count == 6
+    selection.clear()
+    assert selection.count == 0
+
+
+def test_permute_and_extend(selection):
+    selection.set_indices([0, 5])
+    selection.permute([5, 4, 3, 2, 1, 0])
+    assert [*selection.indices()] == [0, 5]
+    selection.permute([1, 2, 3, 4, 5, 0])
+    assert [*selection.indices()] == [4, 5]
+    selection.extend(2)
+    assert len(selection) == 8 and selection.count == 2
+
+
+def test_changes_are_coalesced(selection):
+    from kivy.clock import Clock
+    events = []
+    selection.bind(on_selection=lambda _: events.append(1))
+    for i in range(6):
+        selection.set(i)
+    selection.invert()
+    Clock.tick()
+    assert events == [1]
+
+
+def test_selected_filenames_is_a_copy(gui_app):
+    from pyimgedit import ArchiveContent
+    from pyimgedit.gui.archive_data_view import ArchiveDataView
+    view = ArchiveDataView()
+    view.update_data([ArchiveContent.from_blocks(i, 1, f'{i}.txd') for i in range(3)])
+    view.selection.set_indices([0, 2])
+    filenames = view.selected_filenames
+    view.selection.set(1)  # a click while the operation runs
+    view.selection.set(2, False)
+    assert filenames == ['0.txd', '2.txd']
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import FILES, padded
+from pyimgedit.imgfile import IMGFile
+
+
+def test_read(img_path):
+    with IMGFile(img_path) as img:
+        assert len(img) == len(FILES)
+        for name, data in FILES.items():
+            assert img.read(name) == padded(data)
+            assert img.read_range(name, 10, 5) == data[10:15]
+
+
+def test_write_bytes_in_place(img_path):
+    with IMGFile(img_path, True) as img:
+        offset = img.find('a.txd').offset.blocks
+        img.write('a.txd', b'x' * 10)
+    with IMGFile(img_path) as img:
+        assert img.find('a.txd').offset.blocks == offset
+        assert img.read('a.txd') == padded(b'x' * 10)
+
+
+def test_write_stream(img_path):
+    with IMGFile(img_path, True) as img:
+        img.write_stream('new.txd', (b'1' * 1000, b'2' * 2000), 3000)
+        img.write_stream('a.txd', iter((b'3' * 5000,)))
+    with IMGFile(img_path) as img:
+        assert img.read('new.txd') == padded(b'1' * 1000 + b'2' * 2000)
+        assert img.read('a.txd') == padded(b'3' * 5000)
+        for name in ('b.dff', 'c.col', 'd.ifp'):
+            assert img.read(name) == padded(FILES[name])
+
+
+def _failing_chunks():
+    yield b'y' * 1000
+    raise OSError('source lost')
+
+
+@pytest.mark.parametrize('chunks, size, error', [
+    (_failing_chunks, 2000, OSError),
+    (lambda: (b'y' * 1000,), 2000, ValueError),
+    (lambda: (b'y' * 3000,), 2000, ValueError),
+])
+def test_failed_write_stream_keeps_old_content(img_path, chunks, size, error):
+    with IMGFile(img_path, True) as img:
+        with pytest.raises(error):
+            img.write_stream('a.txd', chunks(), size)
+        assert img.read('a.txd') == padded(FILES['a.txd'])
+    with IMGFile(img_path) as img:
+        assert img.read('a.txd') == padded(FILES['a.txd'])
+
+
+def test_read_only(img_path):
+    with IMGFile(img_path) as img, pytest.raises(PermissionError):
+        img.write('a.txd', b'')
+
+
+def test_delete_rename_rebuild(img_path):
+    with IMGFile(img_path, True) as img:
+        img.delete('b.dff')
+        img.rename('a.txd', 'z.txd')
+        with pytest.raises(FileExistsError):
+            img.rename('z.txd', 'c.col')
+        [*img.rebuild()]
+    with IMGFile(img_path) as img:
+        assert [e.name for e in img] == ['z.txd', 'c.col', 'd.ifp']
+        assert img.read('z.txd') == padded(FILES['a.txd'])
+        assert img.read('d.ifp') == padded(FILES['d.ifp'])
+
+
+def test_archive_add_bytes_and_stream(archive):
+    archive.add_bytes('x.txd', b'x' * 10)
+    archive.add_stream('y.txd', (b'y' * 10, b'z' * 10), 20)
+    assert archive.read('x.txd') == padded(b'x' * 10)
+    assert archive.read('y.txd') == padded(b'y' * 10 + b'z' * 10)
+
+
+def test_add_and_delete_many_in_one_session(archive, loose_dir, monkeypatch):
+    sessions = []
+    read_directory = IMGFile._read_directory
+    monkeypatch.setattr(IMGFile, '_read_directory', lambda img: (sessions.append(1), read_directory(img)))
+    new = [loose_dir / 'e.txd', loose_dir / 'a.txd']
+    new[0].write_bytes(b'E' * 5000)
+    new[1].write_bytes(b'replaced')
+    headers = [*archive.add_many(new)]
+    assert [(h['Operation'], h['File name']) for h in headers] == [('Add', 'e.txd'), ('Add', 'a.txd')]
+    assert [[c.kind for c in h.changes] for h in headers] == [['add'], ['update']]
+    headers = [*archive.delete_many(['b.dff', 'C.COL', 'd.ifp'])]
+    assert [h['File name'] for h in headers] == ['b.dff', 'c.col', 'd.ifp']
+    assert [c.entry.name for h in headers for c in h.changes] == ['b.dff', 'c.col', 'd.ifp']
+    assert len(sessions) == 2
+    assert archive.read('a.txd') == padded(b'replaced')
+    with IMGFile(archive.imgname) as img:
+        assert sorted(e.name for e in img) == ['a.txd', 'e.txd']
+
+
+def test_entry_from_blocks():
+    from pyimgedit import ArchiveContent, BlocksBytes
+    entry = ArchiveContent.from_blocks(3, 2, 'a.txd')
+    assert (entry.offset.blocks, entry.offset.bytes, entry.size.blocks, entry.size.bytes) == (3, 6144, 2, 4096)
+    assert str(entry.size) == str(BlocksBytes('2/4096'))
+    entry.size.blocks = 5
+    assert str(entry.size).startswith('5 / ')
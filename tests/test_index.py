@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import os
+import shutil
+
+from conftest import FILES, padded
+
+
+def test_build_find_and_update(img_path, tmp_path):
+    from pyimgedit import IMGArchive, content_hash
+    from pyimgedit.index import ArchiveIndex
+    game = tmp_path / 'game'
+    (game / 'models').mkdir(parents=True)
+    shutil.copy(img_path, game / 'models' / 'one.img')
+    if img_path.with_suffix('.dir').is_file():
+        shutil.copy(img_path.with_suffix('.dir'), game / 'models' / 'one.dir')
+    (game / 'not_an_archive.img').write_bytes(b'nothing')
+    with ArchiveIndex(tmp_path / 'index.sqlite') as index:
+        assert index.build(game, 1) == {'archives': 1, 'scanned': 1, 'failed': 0, 'unchanged': 0, 'removed': 0}
+        [(path, entry, digest)] = index.find('A.*')
+        assert (os.path.basename(path), entry.name) == ('one.img', 'a.txd')
+        assert digest == content_hash(padded(FILES['a.txd']))
+        assert [e.name for _, e in index.find_hash(digest)] == ['a.txd']
+        assert len(index.find('*', limit=2)) == 2
+        assert index.build(game, 1)['unchanged'] == 1
+
+        IMGArchive(game / 'models' / 'one.img', '').add_bytes('new.dff', b'new')
+        assert index.build(game, 1)['scanned'] == 1
+        assert [e.name for _, e, _ in index.find('new.dff')] == ['new.dff']
+
+        shutil.rmtree(game / 'models')
+        assert index.build(game, 1)['removed'] == 1
+        assert index.find('*') == []
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import FILES
+
+
+@pytest.mark.parametrize('chunk_size, sizes', [(1, [1, 1, 1, 1]), (3, [3, 1]), (4, [4]), (500, [4])])
+def test_chunks(archive, version, chunk_size, sizes):
+    listing = archive.iter_list(chunk_size)
+    header, info = next(listing)
+    assert header['Operation'] == 'List'
+    assert info['Version'] == ('VER2 (SA)' if version == 2 else '.dir + .img (III / VC)')
+    chunks = [*listing]
+    assert [len(chunk) for chunk in chunks] == sizes
+    assert [e.name for chunk in chunks for e in chunk] == [*FILES]
+
+
+def test_snapshot_listing(archive):
+    archive.use_snapshots()
+    listing = archive.iter_list(2)
+    next(listing)
+    first = next(listing)
+    archive.delete('d.ifp')
+    assert [e.name for e in first + next(listing)] == [*FILES]
+    listing = archive.iter_list(2)
+    next(listing)
+    assert [e.name for chunk in listing for e in chunk] == [*FILES][:3]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import io
+import os
+
+import pytest
+
+HTML = '''<html><body>
+<table><tr><td>File name</td><td>test.img</td></tr><tr><td>Version</td><td>VER2</td></tr></table>
+<table>
+<tr><th>Offset</th><th>Size</th><th>Name</th></tr>
+<tr><td>1/2048</td><td>2/4096</td><td>a.txd</td></tr>
+<tr><td>3/6144</td><td>1/2048</td><td>b&amp;c.dff</td></tr>
+<tr><td>4/8192</td><td>10/20480</td><td>long_model_name.dff</td></tr>
+</table></body></html>'''
+
+
+def chunked(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('size', [1, 7, 64, len(HTML)])
+def test_parse_listing(size):
+    from pyimgedit.listing import parse_listing
+    info, *files = parse_listing(chunked(HTML, size))
+    assert info == {'File name': 'test.img', 'Version': 'VER2'}
+    assert [(f.offset.blocks, f.size.bytes, f.name) for f in files] == [
+        (1, 4096, 'a.txd'), (3, 2048, 'b&c.dff'), (4, 20480, 'long_model_name.dff')]
+
+
+def test_info_without_files():
+    from pyimgedit.listing import parse_listing
+    assert [*parse_listing([HTML[:HTML.index('</table>') + 8]])] == [{'File name': 'test.img', 'Version': 'VER2'}]
+
+
+def test_rows_are_yielded_as_soon_as_complete():
+    from pyimgedit.listing import iter_rows
+    rows = iter_rows(iter(['<table><tr><td>a</td><td>b</td></tr>', '<tr><td>c', '</td></tr></table>']))
+    assert next(rows) == (0, ['a', 'b'])
+    assert next(rows) == (0, ['c'])
+
+
+def test_read_chunks():
+    from pyimgedit.listing import read_chunks
+    assert [*read_chunks(io.StringIO(HTML), 100)] == chunked(HTML, 100)
+
+
+class FakeProcess:
+    def __init__(self, command, **kwargs):
+        FakeProcess.command, FakeProcess.kwargs = command, kwargs
+        self.stdout = io.StringIO('> Operation .... List\n\n')
+
+    def wait(self):
+        return 0
+
+
+def test_call_keeps_the_working_directory(tmp_path, monkeypatch):
+    from pyimgedit import IMGArchive
+    monkeypatch.setattr('subprocess.Popen', FakeProcess)
+    (tmp_path / 'models').mkdir()
+    monkeypatch.chdir(tmp_path)
+    cwd = os.getcwd()
+    archive = IMGArchive('models/gta3.img', 'freimgedcs.exe')
+    header = archive.check_call('xtr', 'models/a.txd', 'out/a.txd')
+    assert header == {'Operation': 'List'}
+    assert os.getcwd() == cwd
+    assert FakeProcess.kwargs['cwd'] == tmp_path / 'models'
+    assert FakeProcess.command == ['freimgedcs.exe', '-xtr', 'gta3.img', 'a.txd', str(tmp_path / 'out' / 'a.txd')]
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import FILES, padded
+
+
+@pytest.fixture
+def tree(loose_dir):
+    (loose_dir / 'models' / 'cars').mkdir(parents=True)
+    (loose_dir / 'models' / 'cars' / 'infernus.dff').write_bytes(b'I' * 5000)
+    (loose_dir / 'models' / 'Bank.TXD').write_bytes(b'bank')
+    return loose_dir
+
+
+def test_pack_tree(tree, tmp_path, version):
+    from pyimgedit.imgfile import IMGFile
+    from pyimgedit.imgwriter import pack
+    entries = pack(tree, tmp_path / 'packed.img', version)
+    assert [e.name for e in entries] == ['a.txd', 'b.dff', 'Bank.TXD', 'c.col', 'd.ifp', 'infernus.dff']
+    with IMGFile(tmp_path / 'packed.img') as img:
+        assert img.version == version
+        assert img.read('infernus.dff') == padded(b'I' * 5000)
+        for name, data in FILES.items():
+            assert img.read(name) == padded(data)
+
+
+def test_pack_is_reproducible(tree, tmp_path, version):
+    from pyimgedit.imgwriter import pack
+    pack(tree, tmp_path / 'one.img', version, workers=1)
+    pack(tree, tmp_path / 'two.img', version, workers=8)
+    assert (tmp_path / 'one.img').read_bytes() == (tmp_path / 'two.img').read_bytes()
+    if version == 1:
+        assert (tmp_path / 'one.dir').read_bytes() == (tmp_path / 'two.dir').read_bytes()
+
+
+def test_pack_rejects_name_collisions(tree, tmp_path):
+    from pyimgedit.imgwriter import pack
+    (tree / 'models' / 'A.TXD').write_bytes(b'other')
+    with pytest.raises(ValueError, match='A.TXD'):
+        pack(tree, tmp_path / 'packed.img')
+
+
+def test_archive_pack(tree, tmp_path):
+    from pyimgedit import IMGArchive
+    archive = IMGArchive.pack(tree, tmp_path / 'packed.img', 1)
+    assert archive.read('bank.txd') == padded(b'bank')
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import FILES, padded
+
+
+@pytest.fixture
+def new_file(tmp_path):
+    path = tmp_path / 'new.txd'
+    path.write_bytes(b'N' * 5000)
+    return path
+
+
+def names(archive) -> list[str]:
+    with archive.open() as img:
+        return [e.name for e in img]
+
+
+def test_steps_are_fused(archive, new_file, tmp_path):
+    from pyimgedit.planner import Operation
+    plan = archive.plan([
+        Operation.rename('a.txd', 'x.txd'),
+        Operation.extract('b.dff', tmp_path / 'b.dff'),
+        Operation.rename('x.txd', 'y.txd'),
+        Operation.delete('c.col'),
+        Operation.add(new_file, 'c.col'),
+        Operation.add(new_file),
+        Operation.rebuild(),
+        Operation.rebuild(),
+    ])
+    assert [(s.kind, s.name, s.target) for s in plan.steps] == [
+        ('extract', 'b.dff', str(tmp_path / 'b.dff')),
+        ('rename', 'a.txd', 'y.txd'),
+        ('replace', 'c.col', str(new_file)),
+        ('add', 'new.txd', str(new_file)),
+        ('directory', '', ''),
+        ('rebuild', '', ''),
+    ]
+    assert plan.cost() < plan.naive_cost()
+    assert 'Plan for' in plan.explain() and '8 operations -> 6 steps' in plan.explain()
+
+
+def test_rename_cycle(archive):
+    from pyimgedit.planner import Operation
+    plan = archive.plan([Operation.rename('a.txd', 'tmp.txd'), Operation.rename('b.dff', 'a.txd'),
+                         Operation.rename('tmp.txd', 'b.dff')])
+    plan.execute()
+    assert archive.read('a.txd') == padded(FILES['b.dff'])
+    assert archive.read('b.dff') == padded(FILES['a.txd'])
+
+
+def test_execute(archive, new_file, tmp_path):
+    from pyimgedit.planner import Operation
+    result = archive.plan([
+        Operation.extract('a.txd', tmp_path / 'a.out'),
+        Operation.delete('a.txd'),
+        Operation.add(new_file),
+        Operation.extract('new.txd', tmp_path / 'new.out'),
+        Operation.rename('d.ifp', 'e.ifp'),
+        Operation.rebuild(),
+    ]).execute()
+    assert result['Operation'] == 'Plan' and result.changes
+    assert (tmp_path / 'a.out').read_bytes() == padded(FILES['a.txd'])
+    assert (tmp_path / 'new.out').read_bytes() == padded(b'N' * 5000)
+    assert sorted(names(archive)) == ['b.dff', 'c.col', 'e.ifp', 'new.txd']
+    assert archive.read('e.ifp') == padded(FILES['d.ifp'])
+
+
+@pytest.mark.parametrize('operations, error', [
+    ([('delete', 'missing.txd')], KeyError),
+    ([('rename', 'missing.txd', 'x.txd')], KeyError),
+    ([('rename', 'a.txd', 'B.DFF')], FileExistsError),
+    ([('extract', 'missing.txd', 'out')], KeyError),
+])
+def test_invalid_operations(archive, operations, error):
+    from pyimgedit.planner import Operation
+    with pytest.raises(error):
+        archive.plan([Operation(*op) for op in operations])
+    assert names(archive) == [*FILES]
+
+
+def test_unknown_kind():
+    from pyimgedit.planner import Operation
+    with pytest.raises(ValueError, match='Unknown operation'):
+        Operation('copy', 'a.txd')
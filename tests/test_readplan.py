@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from conftest import FILES, padded
+
+
+def _entry(offset: int, size: int, name: str):
+    from pyimgedit import ArchiveContent
+    return ArchiveContent.from_blocks(offset, size, name)
+
+
+def test_plan_reads_merges_near_entries():
+    from pyimgedit.readplan import plan_reads
+    entries = [_entry(10, 2, 'c'), _entry(0, 4, 'a'), _entry(4, 1, 'b'), _entry(1000, 1, 'far')]
+    spans = plan_reads(entries, max_gap=2048 * 5, max_read=1 << 20)
+    assert [[e.name for e in span.entries] for span in spans] == [['a', 'b', 'c'], ['far']]
+    assert (spans[0].start, spans[0].size) == (0, 12 * 2048)
+
+
+def test_plan_reads_limits():
+    from pyimgedit.readplan import plan_reads
+    entries = [_entry(0, 1, 'a'), _entry(2, 1, 'b'), _entry(3, 10, 'big')]
+    assert len(plan_reads(entries, max_gap=0)) == 2
+    assert [len(span.entries) for span in plan_reads(entries, max_read=4 * 2048)] == [2, 1]
+
+
+def test_read_many_and_extract_many(img_path, tmp_path):
+    from pyimgedit.imgfile import IMGFile
+    with IMGFile(img_path) as img:
+        contents = {entry.name: bytes(content) for entry, content in img.read_many(['d.ifp', 'a.txd', 'c.col'])}
+        assert contents == {name: padded(FILES[name]) for name in ('a.txd', 'c.col', 'd.ifp')}
+        extracted = [entry.name for entry in img.extract_many(FILES, tmp_path)]
+    assert sorted(extracted) == sorted(FILES)
+    for name, data in FILES.items():
+        assert (tmp_path / name).read_bytes() == padded(data)
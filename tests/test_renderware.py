@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import struct
+
+SA_STAMP = 0x1803FFFF  # RenderWare 3.6.0.3
+VC_STAMP = 0x0C02FFFF  # RenderWare 3.4.0.3
+
+
+def chunk(chunk_type: int, payload: bytes, stamp: int = SA_STAMP) -> bytes:
+    return struct.pack('<III', chunk_type, len(payload), stamp) + payload
+
+
+def txd(*names: str, stamp: int = SA_STAMP) -> bytes:
+    textures = b''.join(
+        chunk(0x15, chunk(0x01, struct.pack('<II', 9, 0) + name.encode().ljust(32, b'\0') + bytes(100), stamp), stamp)
+        for name in names)
+    return chunk(0x16, chunk(0x01, struct.pack('<HH', len(names), 0), stamp) + textures, stamp)
+
+
+def dff(atomics: int, geometries: int, stamp: int = VC_STAMP) -> bytes:
+    return chunk(0x10, chunk(0x01, struct.pack('<iii', atomics, 0, 0), stamp)
+                 + chunk(0x0E, bytes(40), stamp)
+                 + chunk(0x1A, chunk(0x01, struct.pack('<I', geometries), stamp), stamp), stamp)
+
+
+def test_unpack_version():
+    from pyimgedit.renderware import unpack_version, version_game
+    assert unpack_version(SA_STAMP) == 0x36003
+    assert version_game(unpack_version(VC_STAMP)) == 'VC'
+    assert unpack_version(0x310) == 0x31000
+    assert version_game(0x31000) == 'III'
+
+
+def test_parse_txd_reads_beyond_the_prefix():
+    from pyimgedit.renderware import TEXTURE_DICTIONARY, parse_chunks
+    data = txd('grass', 'road', 'wall')
+    reads = []
+
+    def read_range(start: int, size: int) -> bytes:
+        reads.append((start, size))
+        return data[start:start + size]
+
+    info = parse_chunks(data[:64], read_range, len(data))
+    assert info.chunk_type == TEXTURE_DICTIONARY
+    assert info.game == 'SA'
+    assert info.texture_count == 3
+    assert info.texture_names == ('grass', 'road', 'wall')
+    assert reads and all(size <= 32 for _, size in reads)  # only the headers and names are read
+
+
+def test_parse_dff():
+    from pyimgedit.renderware import CLUMP, parse_chunks
+    data = dff(2, 3)
+    info = parse_chunks(data, lambda start, size: data[start:start + size], len(data))
+    assert (info.chunk_type, info.atomic_count, info.geometry_count, info.game) == (CLUMP, 2, 3, 'VC')
+
+
+def test_not_renderware():
+    from pyimgedit.renderware import parse_chunks
+    assert parse_chunks(b'COLL' + bytes(20), lambda start, size: b'', 24) is None
+
+
+def test_archive_index(archive):
+    archive.add_bytes('trees.txd', txd('oak', 'pine'))
+    archive.add_bytes('car.dff', dff(1, 1))
+    index = archive.rw_index
+    assert index.get('trees.txd').texture_names == ('oak', 'pine')
+    assert index.get('a.txd') is None
+    assert sorted(entry.name for entry, _ in index.items()) == ['car.dff', 'trees.txd']
+    assert [entry.name for entry, _ in index.filter(lambda entry, info: info.texture_count > 1)] == ['trees.txd']
+    archive.add_bytes('trees.txd', txd('birch'))
+    assert index.get('trees.txd').texture_names == ('birch',)
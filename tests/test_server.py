@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import json
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from conftest import FILES, padded
+
+C_COL = padded(FILES['c.col'])
+
+
+@pytest.fixture
+def base_url(archive):
+    from pyimgedit.server import EntryServer
+    server = EntryServer(archive, ('127.0.0.1', 0))
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def get(url: str, method: str = 'GET', **headers):
+    try:
+        with urlopen(Request(url, headers=headers, method=method)) as resp:
+            return resp.status, resp.headers, resp.read()
+    except HTTPError as e:
+        with e:
+            return e.code, e.headers, e.read()
+
+
+def test_listing(base_url):
+    status, _, body = get(f'{base_url}/')
+    assert status == 200
+    assert [e['name'] for e in json.loads(body)] == [*FILES]
+
+
+def test_entry_and_etag(base_url):
+    status, headers, body = get(f'{base_url}/C.COL')
+    assert (status, body, headers['Accept-Ranges']) == (200, C_COL, 'bytes')
+    etag = headers['ETag']
+    assert get(f'{base_url}/c.col', **{'If-None-Match': f'"other", {etag}'})[0] == 304
+    assert get(f'{base_url}/c.col', 'HEAD')[1]['Content-Length'] == str(len(C_COL))
+    assert get(f'{base_url}/missing.txd')[0] == 404
+
+
+@pytest.mark.parametrize('header, expected, content_range', [
+    ('bytes=256-259', C_COL[256:260], f'bytes 256-259/{len(C_COL)}'),
+    ('bytes=6000-', C_COL[6000:], f'bytes 6000-{len(C_COL) - 1}/{len(C_COL)}'),
+    ('bytes=-10', C_COL[-10:], f'bytes {len(C_COL) - 10}-{len(C_COL) - 1}/{len(C_COL)}'),
+    ('bytes=100-99999', C_COL[100:], f'bytes 100-{len(C_COL) - 1}/{len(C_COL)}'),
+])
+def test_range(base_url, header, expected, content_range):
+    status, headers, body = get(f'{base_url}/c.col', Range=header)
+    assert (status, body, headers['Content-Range']) == (206, expected, content_range)
+
+
+def test_unsatisfiable_and_ignored_ranges(base_url):
+    status, headers, _ = get(f'{base_url}/c.col', Range=f'bytes={len(C_COL)}-')
+    assert (status, headers['Content-Range']) == (416, f'bytes */{len(C_COL)}')
+    assert get(f'{base_url}/c.col', Range='bytes=0-1,5-6')[:3:2] == (200, C_COL)
+    assert get(f'{base_url}/c.col', Range='bytes=0-1', **{'If-Range': '"old"'})[:3:2] == (200, C_COL)
+
+
+def test_etag_changes_with_the_content(archive, base_url):
+    etag = get(f'{base_url}/a.txd')[1]['ETag']
+    archive.add_bytes('a.txd', b'new')
+    status, headers, body = get(f'{base_url}/a.txd', **{'If-None-Match': etag})
+    assert (status, body) == (200, padded(b'new'))
+    assert headers['ETag'] != etag
+
+
+def test_only_native_archives(tmp_path):
+    from pyimgedit.server import EntryServer
+    (tmp_path / 'other.img').write_bytes(b'not an archive')
+    with pytest.raises(ValueError, match='freimgedcs'):
+        EntryServer(tmp_path / 'other.img', ('127.0.0.1', 0))
+
+
+def test_response_is_not_changed_by_the_writes(archive, base_url, monkeypatch):
+    """The directory grows over the first blocks and the archive is rebuilt while a.txd is being sent"""
+    from pyimgedit.server import EntryRequestHandler
+    send_entry = EntryRequestHandler._send_entry
+    writers = []
+
+    def write():
+        archive.delete('a.txd')
+        for i in range(100):
+            archive.add_bytes(f'new{i}.txd', b'N' * 3000)
+        [*archive.rebuild()[2]]
+
+    def send_during_writes(self, snapshot, entry, head):
+        writers.append(writer := Thread(target=write))
+        writer.start()
+        writer.join(.5)  # done, or waits for the snapshot of this response
+        send_entry(self, snapshot, entry, head)
+
+    monkeypatch.setattr(EntryRequestHandler, '_send_entry', send_during_writes)
+    status, _, body = get(f'{base_url}/a.txd')
+    writers[0].join()
+    assert (status, body) == (200, padded(FILES['a.txd']))
+    monkeypatch.undo()
+    assert get(f'{base_url}/a.txd')[0] == 404
+    assert get(f'{base_url}/new99.txd')[2] == padded(b'N' * 3000)
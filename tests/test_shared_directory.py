@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from conftest import FILES, padded
+
+
+def _read_in_worker(handle, name: str) -> bytes:
+    with handle.attach() as view:
+        return view.read(name)
+
+
+def test_view(archive):
+    with archive.share() as shared, shared.handle.attach() as view:
+        assert len(view) == len(FILES)
+        assert [e.name for e in view] == [*FILES]
+        assert view[-1].name == 'd.ifp'
+        with pytest.raises(IndexError):
+            view[len(FILES)]
+        with archive.open() as img:
+            assert [(e.offset.blocks, e.size.blocks) for e in view] == [(e.offset.blocks, e.size.blocks) for e in img]
+        assert 'C.COL' in view and 'missing.txd' not in view
+        with pytest.raises(KeyError):
+            view.find('missing.txd')
+        assert view.read('c.col') == padded(FILES['c.col'])
+
+
+def test_handle_is_picklable(archive):
+    with archive.share() as shared:
+        handle = pickle.loads(pickle.dumps(shared.handle))
+        assert (handle.name, handle.count) == (shared.handle.name, len(FILES))
+        with handle.attach() as view:
+            assert view.find('b.dff').name == 'b.dff'
+
+
+def test_workers(archive):
+    with archive.share() as shared, ProcessPoolExecutor(2) as pool:
+        contents = pool.map(_read_in_worker, [shared.handle] * len(FILES), FILES)
+        assert dict(zip(FILES, contents)) == {k: padded(v) for k, v in FILES.items()}
+
+
+def test_closed_directory_can_not_be_attached(archive):
+    shared = archive.share()
+    handle = shared.handle
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        handle.attach()
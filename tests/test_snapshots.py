@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from threading import Event, Thread
+
+import pytest
+
+from conftest import FILES, padded
+
+
+@pytest.fixture
+def archive(archive):
+    archive.use_snapshots()
+    return archive
+
+
+def test_snapshot_does_not_see_the_writes(archive):
+    with archive.snapshot() as snapshot:
+        archive.add_bytes('a.txd', b'new')
+        archive.rename('b.dff', 'e.dff')
+        archive.delete('c.col')
+        assert [e.name for e in snapshot] == [*FILES]
+        assert {name: snapshot.read(name) for name in FILES} == {k: padded(v) for k, v in FILES.items()}
+    with archive.snapshot() as snapshot:
+        assert sorted(e.name for e in snapshot) == ['a.txd', 'd.ifp', 'e.dff']
+        assert snapshot.read('a.txd') == padded(b'new')
+
+
+def test_deleted_blocks_are_not_reused_by_the_next_session(archive):
+    """Each call is a writer session of its own, the new data must go after the blocks the snapshot still reads"""
+    with archive.snapshot() as snapshot:
+        last = max(snapshot, key=lambda e: e.offset.blocks).name
+        archive.delete(last)
+        archive.add_bytes('new.txd', b'N' * len(FILES[last]))
+        archive.add_bytes('other.txd', b'O' * 10000)
+        assert snapshot.read(last) == padded(FILES[last])
+    assert archive.read('new.txd') == padded(b'N' * len(FILES[last]))
+
+
+def test_replace_in_a_new_session_is_copy_on_write(archive):
+    with archive.snapshot() as snapshot:
+        archive.add_bytes('c.col', b'C' * 10)
+        with archive.snapshot() as second:
+            archive.delete('c.col')
+            archive.add_bytes('e.txd', b'E' * 6000)
+            assert second.read('c.col') == padded(b'C' * 10)
+        assert snapshot.read('c.col') == padded(FILES['c.col'])
+
+
+def test_rebuild_keeps_the_old_file_for_the_snapshots(archive):
+    with archive.snapshot() as snapshot:
+        archive.delete('a.txd')
+        _, _, progress = archive.rebuild()
+        [*progress]
+        assert snapshot.read('a.txd') == padded(FILES['a.txd'])
+    with archive.snapshot() as snapshot:
+        assert 'a.txd' not in snapshot
+        assert snapshot.read('d.ifp') == padded(FILES['d.ifp'])
+
+
+def test_drain_closes_the_file(archive):
+    store = archive.use_snapshots()
+    drained = Event()
+    snapshot = archive.snapshot()
+    data = snapshot._data
+    with archive.open(True) as writer:
+        thread = Thread(target=lambda: (store._drain(), drained.set()))
+        thread.start()
+        assert not drained.wait(.2)
+        assert snapshot.read('b.dff') == padded(FILES['b.dff'])
+        snapshot.close()
+        thread.join()
+        assert data.file.closed
+        store._publish(writer._entries, replaced=True)
+    with archive.snapshot() as snapshot:
+        assert not snapshot._data.file.closed
+        assert snapshot.read('b.dff') == padded(FILES['b.dff'])
+
+
+def test_failed_rebuild_after_drain(archive):
+    store = archive.use_snapshots()
+    with archive.open(True):
+        store._drain()
+    with archive.snapshot() as snapshot:
+        assert snapshot.read('a.txd') == padded(FILES['a.txd'])
+
+
+def _content(name: str, generation: int) -> bytes:
+    return f'{name}:{generation};'.encode() * (generation % 7 * 300 + 1)
+
+
+def test_readers_during_writes(archive):
+    stop = Event()
+    errors = []
+
+    def read():
+        try:
+            while not stop.is_set():
+                with archive.snapshot() as snapshot:
+                    for entry, content in snapshot.read_many(snapshot.entries):
+                        content = bytes(content).rstrip(b'\0')
+                        if entry.name in FILES:
+                            assert content == FILES[entry.name].rstrip(b'\0'), entry.name
+                            continue
+                        unit = content[:content.index(b';') + 1]
+                        assert unit.startswith(entry.name.encode()) and content == unit * (len(content) // len(unit))
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    readers = [Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for generation in range(60):
+            name = f'f{generation % 5}.txd'
+            archive.add_bytes(name, _content(name, generation))
+            if generation % 10 == 9:
+                archive.delete(name)
+            if generation % 20 == 19:
+                [*archive.rebuild()[2]]
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+    assert not errors, errors[0]
+    with archive.snapshot() as snapshot:
+        assert snapshot.read('f3.txd').rstrip(b'\0') == _content('f3.txd', 58)
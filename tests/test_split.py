@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import padded
+
+
+@pytest.fixture
+def many_files(tmp_path, version):
+    from pyimgedit.imgwriter import pack
+    loose = tmp_path / 'many'
+    loose.mkdir()
+    contents = {f'{prefix}{i:02}.{extension}': bytes([i]) * (i * 300 + 1)
+                for i in range(20) for prefix, extension in (('car', 'dff'), ('tree', 'txd'))}
+    for name, data in contents.items():
+        (loose / name).write_bytes(data)
+    pack(loose, tmp_path / 'many.img', version)
+    return tmp_path / 'many.img', contents
+
+
+def _read_shards(paths):
+    from pyimgedit.imgfile import IMGFile
+    shards = []
+    for path in paths:
+        with IMGFile(path) as img:
+            shards.append({entry.name: img.read(entry) for entry in img})
+    return shards
+
+
+def test_plan_shards():
+    from pyimgedit import ArchiveContent
+    from pyimgedit.imgwriter import plan_shards
+    entries = [ArchiveContent.from_blocks(i, 1, name) for i, name in enumerate(('a.dff', 'b.txd', 'c.dff', 'd.txd'))]
+    assert [[e.name for e in s] for s in plan_shards(entries, max_entries=3)] == [['a.dff', 'b.txd', 'c.dff'],
+                                                                                 ['d.txd']]
+    assert [[e.name for e in s] for s in plan_shards(entries, key='extension')] == [['a.dff', 'c.dff', 'b.txd',
+                                                                                     'd.txd']]
+    assert [[e.name for e in s] for s in plan_shards(entries, max_entries=2, key='extension')] == [
+        ['a.dff', 'c.dff'], ['b.txd', 'd.txd']]
+    assert len(plan_shards(entries, max_bytes=2048 * 2)) == 2
+
+
+@pytest.mark.parametrize('key', (None, 'prefix'))
+def test_split_with_bounded_writers(many_files, tmp_path, monkeypatch, key):
+    from pyimgedit import imgwriter
+    img_path, contents = many_files
+    opened = []
+    open_now = 0
+
+    class CountingWriter(imgwriter.ArchiveWriter):
+        __slots__ = ()
+
+        def __init__(self, *args):
+            nonlocal open_now
+            super().__init__(*args)
+            open_now += 1
+            opened.append(open_now)
+
+        def close(self):
+            nonlocal open_now
+            open_now -= 1
+            super().close()
+
+    monkeypatch.setattr(imgwriter, 'ArchiveWriter', CountingWriter)
+    paths = imgwriter.split(img_path, max_entries=3, key=key, out_dir=tmp_path, max_open=2)
+    assert len(paths) == 14
+    assert max(opened) == 2 and open_now == 0
+    shards = _read_shards(paths)
+    assert all(len(shard) <= 3 for shard in shards)
+    merged = {name: data for shard in shards for name, data in shard.items()}
+    assert merged == {name: padded(data) for name, data in contents.items()}
+    if key == 'prefix':
+        assert all(len({name[:3] for name in shard}) == 1 for shard in shards)
+
+
+def test_archive_split(archive, tmp_path):
+    shards = archive.split(max_entries=2, out_dir=tmp_path)
+    assert [shard.imgname.name for shard in shards] == ['test_1.img', 'test_2.img']
+    assert shards[1].read('d.ifp') == padded(b'D' * 2048)
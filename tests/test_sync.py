@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+from threading import Event, Thread
+
+import pytest
+
+from conftest import FILES, padded
+
+
+@pytest.fixture
+def synced(tmp_path, version):
+    from pyimgedit import IMGArchive
+    from pyimgedit.sync import DirectorySync
+    (tmp_path / 'empty').mkdir()
+    IMGArchive.pack(tmp_path / 'empty', tmp_path / 'test.img', version)
+    src = tmp_path / 'src'
+    src.mkdir()
+    for name, data in FILES.items():
+        (src / name).write_bytes(data)
+    return DirectorySync(src, IMGArchive(tmp_path / 'test.img', ''))
+
+
+def names(sync) -> set[str]:
+    with sync.archive.open() as img:
+        return {e.name for e in img}
+
+
+def test_sync_adds_changes_and_deletes(synced):
+    assert synced.sync() is not None
+    assert names(synced) == {*FILES}
+    assert json.loads(synced.manifest_path.read_text(encoding='UTF-8')).keys() == FILES.keys()
+    assert synced.sync() is None
+    (synced.directory / 'a.txd').write_bytes(b'changed')
+    (synced.directory / 'b.dff').unlink()
+    synced.sync()
+    assert names(synced) == {*FILES} - {'b.dff'}
+    assert synced.archive.read('a.txd') == padded(b'changed')
+    assert 'b.dff' not in synced.manifest
+
+
+def test_failed_update_keeps_the_manifest(synced, monkeypatch):
+    def fail(*_):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(synced.archive, 'update', fail)
+    with pytest.raises(OSError):
+        synced.sync()
+    assert synced.manifest == {}
+    assert not synced.manifest_path.exists()
+    monkeypatch.undo()
+    synced.sync()
+    assert names(synced) == {*FILES}
+
+
+def test_failed_delete_is_retried(synced, monkeypatch):
+    synced.sync()
+    (synced.directory / 'b.dff').unlink()
+    monkeypatch.setattr(synced.archive, 'update', lambda *_: (_ for _ in ()).throw(OSError('locked')))
+    with pytest.raises(OSError):
+        synced.sync()
+    assert 'b.dff' in synced.manifest
+    monkeypatch.undo()
+    synced.sync()
+    assert 'b.dff' not in names(synced)
+
+
+def test_own_files_are_skipped(tmp_path, version):
+    from pyimgedit import IMGArchive
+    from pyimgedit.sync import DirectorySync
+    (tmp_path / 'empty').mkdir()
+    IMGArchive.pack(tmp_path / 'empty', tmp_path / 'test.img', version)
+    (tmp_path / 'loose.txd').write_bytes(b'L' * 10)
+    sync = DirectorySync(tmp_path, IMGArchive(tmp_path / 'test.img', ''))
+    sync.sync()
+    (tmp_path / 'test.img.rebuild').write_bytes(b'partial')
+    sync.sync({'test.img', 'test.dir', 'test.img.sync.json', 'test.img.sync.json.tmp', 'test.img.rebuild'})
+    assert names(sync) == {'loose.txd'}
+
+
+def test_watch(synced):
+    stop = Event()
+    results = []
+    watching = synced.watch(debounce=.05, interval=.05, stop=stop)
+    results.append(next(watching))
+    thread = Thread(target=lambda: results.extend(watching))
+    thread.start()
+    try:
+        (synced.directory / 'e.txd').write_bytes(b'E')
+        for _ in range(100):
+            if len(results) > 1:
+                break
+            stop.wait(.05)
+    finally:
+        stop.set()
+        thread.join()
+    assert 'e.txd' in names(synced)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from test_renderware import chunk  # noqa: E402
+
+
+def texture_native(name: str, d3d_format: bytes, raster_format: int, width: int, height: int, data: bytes) -> bytes:
+    from pyimgedit.textures import TEXTURE_NATIVE_STRUCT
+    header = TEXTURE_NATIVE_STRUCT.pack(9, 0, name.encode(), b'', raster_format, d3d_format, width, height,
+                                        16, 1, 4, 0)
+    return chunk(0x15, chunk(0x01, header + struct.pack('<I', len(data)) + data))
+
+
+def txd(*textures: bytes) -> bytes:
+    return chunk(0x16, chunk(0x01, struct.pack('<HH', len(textures), 0)) + b''.join(textures))
+
+
+RED_DXT1 = struct.pack('<HHI', 0xF800, 0xF800, 0) * 4  # 8x8, every pixel the first color
+BLUE_8888 = bytes((255, 0, 0, 128)) * 4  # BGRA
+
+
+def test_decode_dxt1():
+    from pyimgedit.textures import decode_dxt1
+    image = decode_dxt1(RED_DXT1, 8, 8)
+    assert image.shape == (8, 8, 4)
+    assert (image == (255, 0, 0, 255)).all()
+
+
+def test_decode_dxt5_alpha():
+    from pyimgedit.textures import decode_dxt5
+    block = struct.pack('<BB6sHHI', 200, 100, bytes(6), 0x001F, 0x001F, 0)
+    image = decode_dxt5(block, 4, 4)
+    assert (image == (0, 0, 255, 200)).all()
+
+
+def test_read_textures():
+    from pyimgedit.textures import read_textures
+    textures = read_textures(txd(texture_native('red', b'DXT1', 0x200, 8, 8, RED_DXT1),
+                                 texture_native('blue', b'\x15\0\0\0', 0x500, 2, 2, BLUE_8888)))
+    assert [(t.name, t.raster, t.width, t.height) for t in textures] == [('red', 'DXT1', 8, 8), ('blue', '8888', 2, 2)]
+    assert (textures[1].to_rgba() == (0, 0, 255, 128)).all()
+
+
+def test_thumbnail():
+    from pyimgedit.textures import thumbnail
+    assert thumbnail(np.zeros((512, 256, 4), np.uint8), 128).shape == (128, 64, 4)
+
+
+def test_thumbnail_cache(tmp_path, monkeypatch):
+    from pyimgedit import textures
+    cache = textures.ThumbnailCache(tmp_path)
+    content = txd(texture_native('red', b'DXT1', 0x200, 8, 8, RED_DXT1))
+    decoded = []
+    read_textures = textures.read_textures
+    monkeypatch.setattr(textures, 'read_textures', lambda data: decoded.append(data) or read_textures(data))
+    assert (cache.get(content) == (255, 0, 0, 255)).all()
+    assert (cache.get(content) == (255, 0, 0, 255)).all()
+    assert cache.get(b'not a txd') is None
+    assert cache.get(b'not a txd') is None
+    assert decoded == [content, b'not a txd']  # the negative result is cached too
+
+
+def test_thumbnail_cache_threads(tmp_path):
+    from pyimgedit.textures import ThumbnailCache
+    cache = ThumbnailCache(tmp_path)
+    content = txd(texture_native('red', b'DXT1', 0x200, 8, 8, RED_DXT1))
+    with ThreadPoolExecutor(8) as pool:
+        images = [*pool.map(lambda _: cache.get(content), range(64))]
+    assert all((image == (255, 0, 0, 255)).all() for image in images)
+    assert not [*tmp_path.rglob('*.tmp')]
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+
+CONTENT = bytes(range(256)) * 400
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+class Handler(BaseHTTPRequestHandler):
+    mode = 'ranges'
+    ranges: list[str | None] = []
+
+    def log_message(self, *_):
+        pass
+
+    def do_GET(self):
+        if self.path == '/file.sha256':
+            return self._send(200, f'{SHA256.upper()}  file\n'.encode())
+        if self.path in ('/flaky.sha256', '/down.sha256'):
+            Handler.ranges.append(None)
+            if self.path == '/down.sha256' or len(Handler.ranges) < 3:
+                return self._send(503, b'')
+            return self._send(200, f'{SHA256}  file\n'.encode())
+        if self.path != '/file':
+            return self._send(404, b'')
+        header = self.headers.get('Range')
+        Handler.ranges.append(header)
+        if header is None or self.mode == 'ignore':
+            if self.mode == 'cut' and len(Handler.ranges) == 1:
+                return self._send(200, CONTENT[:1000], len(CONTENT))
+            return self._send(200, CONTENT)
+        start = int(header.removeprefix('bytes=').removesuffix('-'))
+        if start >= len(CONTENT):
+            return self._send(416, b'', headers={'Content-Range': f'bytes */{len(CONTENT)}'})
+        if self.mode == 'wrong':
+            start = start // 2
+        self._send(206, CONTENT[start:], headers={'Content-Range': f'bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}'})
+
+    def _send(self, status: int, body: bytes, length: int = None, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body) if length is None else length))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+
+@pytest.fixture
+def url():
+    Handler.mode, Handler.ranges = 'ranges', []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def download(url, out, **kwargs):
+    from pyimgedit.updater import download
+    return download(f'{url}/file', out, SHA256, retry_delay=0, **kwargs)
+
+
+def test_download(url, tmp_path):
+    progress = []
+    out = download(url, tmp_path / 'file', progress=lambda done, total: progress.append((done, total)),
+                   chunk_size=4096, interval=0)
+    assert out.read_bytes() == CONTENT
+    assert progress[-1] == (len(CONTENT), len(CONTENT))
+    assert not (tmp_path / 'file.part').exists()
+
+
+@pytest.mark.parametrize('mode', ['ranges', 'ignore', 'wrong'])
+def test_resume(url, tmp_path, mode):
+    Handler.mode = mode
+    (tmp_path / 'file.part').write_bytes(CONTENT[:10000])
+    assert download(url, tmp_path / 'file').read_bytes() == CONTENT
+    assert Handler.ranges[0] == 'bytes=10000-'
+    assert Handler.ranges[1:] == ([None] if mode == 'wrong' else [])
+
+
+def test_complete_part(url, tmp_path):
+    (tmp_path / 'file.part').write_bytes(CONTENT)
+    assert download(url, tmp_path / 'file').read_bytes() == CONTENT
+    assert Handler.ranges == [f'bytes={len(CONTENT)}-']
+
+
+def test_interrupted_download_is_resumed(url, tmp_path):
+    Handler.mode = 'cut'
+    assert download(url, tmp_path / 'file').read_bytes() == CONTENT
+    assert Handler.ranges == [None, 'bytes=1000-']
+
+
+def test_checksum_mismatch(url, tmp_path):
+    from pyimgedit.updater import download
+    with pytest.raises(ValueError, match='SHA-256'):
+        download(f'{url}/file', tmp_path / 'file', '0' * 64)
+    assert not (tmp_path / 'file').exists() and not (tmp_path / 'file.part').exists()
+
+
+def test_fetch_sha256(url):
+    from pyimgedit.updater import fetch_sha256
+    assert fetch_sha256(f'{url}/file.sha256') == SHA256
+    assert fetch_sha256(f'{url}/missing.sha256') is None
+    with pytest.raises(ValueError, match='SHA-256'):
+        fetch_sha256(f'{url}/file')
+
+
+def test_fetch_sha256_fails_closed(url):
+    from urllib.error import HTTPError, URLError
+    from pyimgedit.updater import fetch_sha256
+    assert fetch_sha256(f'{url}/flaky.sha256', retry_delay=0) == SHA256
+    assert len(Handler.ranges) == 3
+    with pytest.raises(HTTPError):
+        fetch_sha256(f'{url}/down.sha256', attempts=2, retry_delay=0)
+    with pytest.raises(URLError):
+        fetch_sha256('http://127.0.0.1:9/file.sha256', attempts=1)